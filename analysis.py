@@ -0,0 +1,537 @@
+"""语法树分析
+
+遍历工具、常量求值、调用图，以及执行前的静态开销估算 estimate_cost()。
+这些函数只读取 Parser 生成的字典，不修改语法树。
+
+    python analysis.py tests/test1.txt
+"""
+from __future__ import annotations
+from typing import Any, Iterator, Optional
+
+# 循环边界不是常量时假定的迭代次数
+DEFAULT_TRIP_COUNT = 100
+# 每个数组元素占用的字节数（列表中的一个指针）
+ELEMENT_BYTES = 8
+HEAVY_ITERATIONS = 10**7
+INFEASIBLE_ITERATIONS = 10**9
+HEAVY_MEMORY = 100 * 1024 * 1024
+INFEASIBLE_MEMORY = 1024 * 1024 * 1024
+
+LOOP_TYPES = ("ForLoop", "WhileLoop", "RepeatLoop")
+DECLARATION_TYPES = ("ProcedureDeclaration", "FunctionDeclaration")
+
+
+def iter_children(node: Any) -> Iterator[dict]:
+    """依次产出 node 的直接子节点（跳过 CASE 分支、数组维度等不带 type 的中间字典）"""
+    values = node.values() if isinstance(node, dict) else node
+    for value in values:
+        if isinstance(value, dict):
+            if "type" in value:
+                yield value
+            else:
+                yield from iter_children(value)
+        elif isinstance(value, list):
+            yield from iter_children(value)
+
+
+def walk(node: dict) -> Iterator[dict]:
+    """前序遍历"""
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        yield current
+        stack.extend(reversed(list(iter_children(current))))
+
+
+def assignment(stmt: dict) -> Optional[tuple[dict, dict]]:
+    """赋值语句 -> (目标, 值)；赋值在语法树中是 ASSIGN 运算符的 BinaryExpression"""
+    expr = stmt.get("expression") if stmt.get("type") == "ExpressionStatement" else stmt
+    if (
+        expr
+        and expr.get("type") == "BinaryExpression"
+        and expr["operator"] == "ASSIGN"
+    ):
+        return expr["left"], expr["right"]
+    return None
+
+
+def target_name(target: dict) -> Optional[str]:
+    """赋值目标对应的变量名（数组元素取数组名）"""
+    if target.get("type") == "Identifier":
+        return target["name"]
+    if target.get("type") == "ArrayAccess" and target["array"] != "-":
+        return target["array"]
+    return None
+
+
+def written_names(node: Any) -> set[str]:
+    """node（语句或语句列表）中所有被写入的变量名"""
+    names = set()
+    nodes = node if isinstance(node, list) else [node]
+    for root in nodes:
+        for child in walk(root):
+            child_type = child["type"]
+            if child_type == "BinaryExpression" and child["operator"] == "ASSIGN":
+                name = target_name(child["left"])
+                if name:
+                    names.add(name)
+            elif child_type == "InputStatement":
+                for element in child["elements"]:
+                    name = target_name(element["identifier"])
+                    if name:
+                        names.add(name)
+            elif child_type == "ReadFile":
+                name = target_name(child["target"])
+                if name:
+                    names.add(name)
+            elif child_type in ("ForLoop", "CountedLoop"):
+                names.add(child["variable"])
+            elif child_type in ("SimpleVariableDeclaration", "ArrayDeclaration"):
+                # DECLARE 会把变量重置为默认值
+                if child.get("identifier"):
+                    names.add(child["identifier"])
+    return names
+
+
+def read_names(expr: dict) -> set[str]:
+    """表达式读取的变量名（含数组名）"""
+    names = set()
+    for child in walk(expr):
+        if child["type"] == "Identifier":
+            names.add(child["name"])
+        elif child["type"] == "ArrayAccess" and child["array"] != "-":
+            names.add(child["array"])
+    return names
+
+
+def const_value(expr: Optional[dict], constants: dict[str, Any]) -> Optional[float]:
+    """对只含字面量与已知常量的算术表达式求值，无法确定时返回 None"""
+    if not expr:
+        return None
+    expr_type = expr["type"]
+    if expr_type == "Literal":
+        value = expr["value"]
+        return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+    if expr_type == "Identifier":
+        return constants.get(expr["name"])
+    if expr_type == "UnaryExpression":
+        value = const_value(expr["operand"], constants)
+        if value is None:
+            return None
+        return -value if expr["operator"] == "SUB" else value
+    if expr_type == "FunctionCall":
+        args = [const_value(arg, constants) for arg in expr["arguments"]]
+        if None in args:
+            return None
+        if expr["function"] == "-" and len(args) == 1:
+            return args[0]
+        if expr["function"] in ("DIV", "MOD") and len(args) == 2 and args[1]:
+            return args[0] // args[1] if expr["function"] == "DIV" else args[0] % args[1]
+        return None
+    if expr_type == "BinaryExpression":
+        left = const_value(expr["left"], constants)
+        right = const_value(expr["right"], constants)
+        if left is None or right is None:
+            return None
+        operator = expr["operator"]
+        try:
+            if operator == "ADD":
+                return left + right
+            if operator == "SUB":
+                return left - right
+            if operator == "MUL":
+                return left * right
+            if operator == "DIW":
+                return left / right
+            if operator == "POW":
+                return left**right
+        except (ZeroDivisionError, OverflowError):
+            return None
+    return None
+
+
+def program_constants(program: dict) -> dict[str, Any]:
+    """CONSTANT 声明，以及全程序只在顶层被赋值一次常量值的变量"""
+    constants = {}
+    for stmt in program["statements"]:
+        if stmt.get("type") == "ConstantDeclaration":
+            value = stmt["value"]
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                constants[stmt["identifier"]] = value
+    assign_counts: dict[str, int] = {}
+    other_writes: set[str] = set()
+    for node in walk(program):
+        if node["type"] == "BinaryExpression" and node["operator"] == "ASSIGN":
+            name = target_name(node["left"])
+            if name:
+                assign_counts[name] = assign_counts.get(name, 0) + 1
+        elif node["type"] in ("InputStatement", "ReadFile", "ForLoop"):
+            other_writes |= written_names(node)
+    for stmt in program["statements"]:
+        pair = assignment(stmt)
+        if pair and pair[0]["type"] == "Identifier":
+            name = pair[0]["name"]
+            if assign_counts.get(name) != 1 or name in other_writes:
+                continue
+            value = const_value(pair[1], constants)
+            if value is not None:
+                constants[name] = value
+    return constants
+
+
+def declared_types(program: dict) -> dict[str, Optional[str]]:
+    """变量名 -> DECLARE 的数据类型（数组为 "ARRAY OF <元素类型>"）
+
+    同名变量在不同位置声明为不同类型时为 None。
+    """
+    types: dict[str, Optional[str]] = {}
+    for node in walk(program):
+        if node["type"] == "SimpleVariableDeclaration":
+            kind = node["data_type"]
+        elif node["type"] == "ArrayDeclaration":
+            kind = f"ARRAY OF {node['data_type']}"
+        else:
+            continue
+        name = node.get("identifier")
+        if name:
+            types[name] = kind if types.get(name, kind) == kind else None
+    return types
+
+
+def names_read_outside_loops(program: dict) -> set[str]:
+    """在以该名字为循环变量的 FOR 循环之外被读取的变量名"""
+    names: set[str] = set()
+    stack: list[tuple[dict, frozenset[str]]] = [(program, frozenset())]
+    while stack:
+        node, bound = stack.pop()
+        node_type = node["type"]
+        if node_type == "Identifier" and node["name"] not in bound:
+            names.add(node["name"])
+        elif node_type == "ArrayAccess" and node["array"] not in bound:
+            names.add(node["array"])
+        if node_type == "ForLoop":
+            for field in ("start", "end", "step"):
+                if node.get(field):
+                    stack.append((node[field], bound))
+            inner = bound | {node["variable"]}
+            stack.extend((stmt, inner) for stmt in node["body"])
+        else:
+            stack.extend((child, bound) for child in iter_children(node))
+    return names
+
+
+def call_graph(program: dict) -> dict[str, set[str]]:
+    """PROCEDURE / FUNCTION 之间的调用关系 {名称: 被调用的名称}"""
+    declarations = {
+        stmt["name"]: stmt
+        for stmt in program["statements"]
+        if stmt.get("type") in DECLARATION_TYPES
+    }
+    graph = {}
+    for name, declaration in declarations.items():
+        callees = set()
+        for node in walk({"type": "Block", "body": declaration["body"]}):
+            if node["type"] in ("FunctionCall", "ProcedureCall"):
+                if node["function"] in declarations:
+                    callees.add(node["function"])
+        graph[name] = callees
+    return graph
+
+
+def recursive_names(graph: dict[str, set[str]]) -> set[str]:
+    """处于调用环上的过程/函数（Tarjan 强连通分量）"""
+    index: dict[str, int] = {}
+    lowlink: dict[str, int] = {}
+    stack: list[str] = []
+    on_stack: set[str] = set()
+    result: set[str] = set()
+
+    def visit(name: str) -> None:
+        index[name] = lowlink[name] = len(index)
+        stack.append(name)
+        on_stack.add(name)
+        for callee in graph.get(name, ()):
+            if callee not in index:
+                visit(callee)
+                lowlink[name] = min(lowlink[name], lowlink[callee])
+            elif callee in on_stack:
+                lowlink[name] = min(lowlink[name], index[callee])
+        if lowlink[name] == index[name]:
+            component = []
+            while True:
+                member = stack.pop()
+                on_stack.discard(member)
+                component.append(member)
+                if member == name:
+                    break
+            if len(component) > 1 or name in graph.get(name, ()):
+                result.update(component)
+
+    for name in graph:
+        if name not in index:
+            visit(name)
+    return result
+
+
+BUILTIN_PURE_FUNCTIONS = {"-", "DIV", "MOD", "LENGTH", "LCASE", "UCASE", "SUBSTRING", "ROUND"}
+IMPURE_STATEMENTS = {
+    "OutputStatement",
+    "InputStatement",
+    "OpenFile",
+    "ReadFile",
+    "WriteFile",
+    "CloseFile",
+    "ProcedureCall",
+}
+
+
+def local_names(declaration: dict) -> set[str]:
+    """过程/函数内部的局部名：参数、内部声明与 FOR 循环变量"""
+    names = {param["identifier"] for param in declaration["parameters"]}
+    for node in walk({"type": "Block", "body": declaration["body"]}):
+        if node["type"] in ("SimpleVariableDeclaration", "ArrayDeclaration"):
+            names.add(node.get("identifier", ""))
+        elif node["type"] == "ForLoop":
+            names.add(node["variable"])
+    return names
+
+
+def pure_functions(program: dict) -> set[str]:
+    """可以安全缓存结果的 FUNCTION
+
+    纯函数只有标量参数、返回标量，函数体中没有 OUTPUT / INPUT / 文件操作 /
+    过程调用 / RANDOM，只写局部变量，只读局部变量与 CONSTANT，并且只调用
+    内置函数或其他纯函数（递归调用按不动点迭代判定）。
+    """
+    constants = {
+        stmt["identifier"]
+        for stmt in program["statements"]
+        if stmt.get("type") == "ConstantDeclaration"
+    }
+    functions = {
+        stmt["name"]: stmt
+        for stmt in program["statements"]
+        if stmt.get("type") == "FunctionDeclaration"
+    }
+    candidates = {}
+    for name, declaration in functions.items():
+        if declaration["return_type"]["is_array"] or any(
+            param["is_array"] for param in declaration["parameters"]
+        ):
+            continue
+        locals_ = local_names(declaration)
+        callees = set()
+        pure = True
+        for node in walk({"type": "Block", "body": declaration["body"]}):
+            node_type = node["type"]
+            if node_type in IMPURE_STATEMENTS:
+                pure = False
+            elif node_type == "FunctionCall":
+                if node["function"] in functions:
+                    callees.add(node["function"])
+                elif node["function"] not in BUILTIN_PURE_FUNCTIONS:
+                    pure = False
+            elif node_type == "Identifier":
+                # 读写全局变量都会让缓存结果失效
+                if node["name"] not in locals_ and node["name"] not in constants:
+                    pure = False
+            elif node_type == "ArrayAccess":
+                if node["array"] not in locals_ and node["array"] != "-":
+                    pure = False
+            if not pure:
+                break
+        if pure:
+            candidates[name] = callees
+    # 调用了非纯函数的函数同样不纯，反复剔除直到稳定
+    changed = True
+    while changed:
+        changed = False
+        for name, callees in list(candidates.items()):
+            if not callees <= candidates.keys():
+                del candidates[name]
+                changed = True
+    return set(candidates)
+
+
+class CostEstimator:
+    """按语句执行次数估算程序开销
+
+    次数用 (常数, 次数多项式的阶) 表示：边界为常量的 FOR 循环乘以实际次数，
+    其余循环与递归乘以 DEFAULT_TRIP_COUNT 并把阶数加一。
+    """
+
+    def __init__(self, program: dict, default_trip_count: int = DEFAULT_TRIP_COUNT) -> None:
+        self.program = program
+        self.default_trip_count = default_trip_count
+        self.constants = program_constants(program)
+        self.declarations = {
+            stmt["name"]: stmt
+            for stmt in program["statements"]
+            if stmt.get("type") in DECLARATION_TYPES
+        }
+        self.graph = call_graph(program)
+        self.recursive = recursive_names(self.graph)
+        self.unbounded_loops: list[dict] = []
+        self.exponential: set[str] = set()
+        self.memory_bytes = 0
+        self.symbolic_arrays: list[str] = []
+        self._call_costs: dict[str, tuple[float, int]] = {}
+        self._visiting: set[str] = set()
+
+    def estimate(self) -> dict:
+        top_level = [
+            stmt
+            for stmt in self.program["statements"]
+            if stmt.get("type") not in DECLARATION_TYPES
+        ]
+        iterations, degree = self.block_cost(top_level)
+        # 过程内部的数组在调用时才分配，这里按每个声明计入一次
+        for node in walk(self.program):
+            if node["type"] == "ArrayDeclaration":
+                self.array_memory(node)
+        if self.exponential:
+            complexity = "O(2^n)"
+        elif degree == 0:
+            complexity = "O(1)"
+        elif degree == 1:
+            complexity = "O(n)"
+        else:
+            complexity = f"O(n^{degree})"
+        if iterations > INFEASIBLE_ITERATIONS or self.memory_bytes > INFEASIBLE_MEMORY:
+            verdict = "infeasible"
+        elif (
+            iterations > HEAVY_ITERATIONS
+            or self.memory_bytes > HEAVY_MEMORY
+            or self.exponential
+        ):
+            verdict = "heavy"
+        else:
+            verdict = "light"
+        return {
+            "estimated_iterations": int(iterations),
+            "memory_bytes": self.memory_bytes,
+            "complexity": complexity,
+            "verdict": verdict,
+            "unbounded_loops": self.unbounded_loops,
+            "recursive": sorted(self.recursive),
+            "exponential_recursion": sorted(self.exponential),
+            "symbolic_arrays": self.symbolic_arrays,
+            "default_trip_count": self.default_trip_count,
+        }
+
+    def block_cost(self, statements: list[dict]) -> tuple[float, int]:
+        total, degree = 0.0, 0
+        for stmt in statements:
+            cost, stmt_degree = self.statement_cost(stmt)
+            total += cost
+            degree = max(degree, stmt_degree)
+        return total, degree
+
+    def trip_count(self, loop: dict) -> tuple[float, int]:
+        if loop["type"] == "ForLoop":
+            start = const_value(loop["start"], self.constants)
+            end = const_value(loop["end"], self.constants)
+            step = const_value(loop["step"], self.constants) if loop["step"] else 1
+            if None not in (start, end, step) and step:
+                return max(0, (end - start) // step + 1), 0
+            return self.default_trip_count, 1
+        self.unbounded_loops.append(
+            {"type": loop["type"], "line": loop.get("line"), "column": loop.get("column")}
+        )
+        return self.default_trip_count, 1
+
+    def statement_cost(self, stmt: dict) -> tuple[float, int]:
+        stmt_type = stmt.get("type")
+        if stmt_type in LOOP_TYPES:
+            trips, trip_degree = self.trip_count(stmt)
+            body, body_degree = self.block_cost(stmt["body"])
+            condition, condition_degree = self.expression_cost(stmt.get("condition"))
+            return trips * (1 + body + condition), trip_degree + max(body_degree, condition_degree)
+        if stmt_type == "IfStatement":
+            then_cost, then_degree = self.block_cost(stmt["then_block"])
+            else_cost, else_degree = self.block_cost(stmt["else_block"])
+            condition, condition_degree = self.expression_cost(stmt["condition"])
+            return 1 + condition + max(then_cost, else_cost), max(
+                then_degree, else_degree, condition_degree
+            )
+        if stmt_type == "CaseStatement":
+            branches = [self.block_cost([case["body"]]) for case in stmt["cases"]]
+            branches.append(self.block_cost(stmt.get("otherwise") or []))
+            return 1 + len(stmt["cases"]) + max(cost for cost, _ in branches), max(
+                degree for _, degree in branches
+            )
+        cost, degree = self.expression_cost(stmt)
+        return 1 + cost, degree
+
+    def expression_cost(self, expr: Optional[dict]) -> tuple[float, int]:
+        """表达式中用户过程/函数调用的开销"""
+        if not expr:
+            return 0, 0
+        total, degree = 0.0, 0
+        for node in walk(expr):
+            if node["type"] in ("FunctionCall", "ProcedureCall"):
+                cost, call_degree = self.call_cost(node["function"])
+                total += cost
+                degree = max(degree, call_degree)
+        return total, degree
+
+    def call_cost(self, name: str) -> tuple[float, int]:
+        declaration = self.declarations.get(name)
+        if declaration is None:
+            return 0, 0
+        if name in self._call_costs:
+            return self._call_costs[name]
+        if name in self._visiting:
+            # 递归调用在调用方按递归深度统一计入
+            return 0, 0
+        self._visiting.add(name)
+        cost, degree = self.block_cost(declaration["body"])
+        self._visiting.discard(name)
+        if name in self.recursive:
+            recursive_calls = sum(
+                1
+                for node in walk({"type": "Block", "body": declaration["body"]})
+                if node["type"] in ("FunctionCall", "ProcedureCall")
+                and node["function"] in self.recursive
+            )
+            if recursive_calls > 1:
+                self.exponential.add(name)
+            cost, degree = (1 + cost) * self.default_trip_count, degree + 1
+        self._call_costs[name] = (1 + cost, degree)
+        return self._call_costs[name]
+
+    def array_memory(self, declaration: dict) -> None:
+        elements = 1
+        symbolic = False
+        for dimension in declaration["dimensions"]:
+            lower = const_value(dimension["lower"], self.constants)
+            upper = const_value(dimension["upper"], self.constants)
+            if lower is None or upper is None:
+                symbolic = True
+                size = self.default_trip_count
+            else:
+                size = max(0, int(upper - lower + 1))
+            elements *= size
+        if symbolic:
+            self.symbolic_arrays.append(declaration.get("identifier", ""))
+        self.memory_bytes += elements * ELEMENT_BYTES
+
+
+def estimate_cost(program: dict, default_trip_count: int = DEFAULT_TRIP_COUNT) -> dict:
+    """执行前的静态开销估算：迭代次数、内存占用、复杂度等级与无界循环"""
+    return CostEstimator(program, default_trip_count).estimate()
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    from pseudocode import Tokenizer, Parser
+
+    arg_parser = argparse.ArgumentParser(description="伪代码静态开销估算")
+    arg_parser.add_argument("file")
+    arg_parser.add_argument("--trip-count", type=int, default=DEFAULT_TRIP_COUNT)
+    args = arg_parser.parse_args()
+    with open(args.file, "r", encoding="utf8") as fp:
+        ast = Parser(Tokenizer(fp.read()).tokenize()).parse_program()
+    print(json.dumps(estimate_cost(ast, args.trip_count), indent=2))
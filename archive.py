@@ -0,0 +1,159 @@
+"""直接转换 zip / tar 归档中的提交
+
+从输入归档中逐个读出 .txt 成员（tar 以流的方式读取，.tar.gz 等压缩格式
+同样支持），不解压到磁盘，分批交给进程池转换，生成的 Python 代码按原来的
+顺序写入输出归档（<成员名>.py，保留成员的修改时间）。同时在途的最多两批，
+内存占用与归档大小无关。
+
+    python archive.py submissions.zip generated.zip
+    python archive.py submissions.tar.gz generated.tar.gz --workers 8
+"""
+from __future__ import annotations
+import io
+import os
+import tarfile
+import time
+import zipfile
+from itertools import islice
+from multiprocessing import Pool
+from typing import Any, Iterator, Optional
+
+from pseudocode import LineTokenCache, Tokenizer, transpile
+
+SOURCE_SUFFIX = ".txt"
+OUTPUT_SUFFIX = ".py"
+# 每个进程同时在途的成员数
+BATCH_PER_WORKER = 64
+
+# 进程之间传递的成员：(名称, 内容, 修改时间)
+Member = tuple[str, bytes, float]
+
+
+def read_members(path: str) -> Iterator[Member]:
+    """依次产出归档中的 .txt 成员"""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not info.filename.endswith(SOURCE_SUFFIX):
+                    continue
+                mtime = time.mktime(info.date_time + (0, 0, -1))
+                yield info.filename, archive.read(info), mtime
+        return
+    # "r|*"：按顺序读取，不需要随机访问，压缩的 tar 也不会先解压到临时文件
+    with tarfile.open(path, "r|*") as archive:
+        for info in archive:
+            if not info.isfile() or not info.name.endswith(SOURCE_SUFFIX):
+                continue
+            fp = archive.extractfile(info)
+            yield info.name, fp.read() if fp else b"", float(info.mtime)
+
+
+class ArchiveWriter:
+    """按输出文件名的后缀写 zip 或 tar（.tar、.tar.gz / .tgz、.tar.bz2、.tar.xz）"""
+
+    tar_modes = {
+        ".tar": "w",
+        ".tar.gz": "w:gz",
+        ".tgz": "w:gz",
+        ".tar.bz2": "w:bz2",
+        ".tar.xz": "w:xz",
+    }
+
+    def __init__(self, path: str) -> None:
+        self.zip: Optional[zipfile.ZipFile] = None
+        self.tar: Optional[tarfile.TarFile] = None
+        if path.endswith(".zip"):
+            self.zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+            return
+        for suffix, mode in self.tar_modes.items():
+            if path.endswith(suffix):
+                self.tar = tarfile.open(path, mode)
+                return
+        raise ValueError(f"Unsupported archive type: {path}")
+
+    def add(self, name: str, data: bytes, mtime: float) -> None:
+        if self.zip is not None:
+            date_time = time.localtime(max(mtime, 315532800))[:6]  # zip 不能表示 1980 年之前
+            self.zip.writestr(zipfile.ZipInfo(name, date_time), data, zipfile.ZIP_DEFLATED)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(mtime)
+            info.mode = 0o644
+            self.tar.addfile(info, io.BytesIO(data))
+
+    def close(self) -> None:
+        (self.zip or self.tar).close()
+
+    def __enter__(self) -> ArchiveWriter:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _enable_line_cache() -> None:
+    """工作进程初始化：同一作业的提交共享大量相同的行"""
+    Tokenizer.line_cache = LineTokenCache()
+
+
+def _transpile_member(job: tuple[Member, dict[str, Any]]) -> tuple[Member, Optional[str]]:
+    """工作进程：转换一个成员，返回 ((输出名称, 代码, 修改时间), 错误信息)"""
+    (name, data, mtime), options = job
+    try:
+        code = transpile(data.decode("utf-8"), **options)
+    except Exception as error:
+        return (name, b"", mtime), f"{type(error).__name__}: {error}"
+    return (name + OUTPUT_SUFFIX, code.encode("utf-8"), mtime), None
+
+
+def convert_archive(
+    source: str, target: str, workers: Optional[int] = None, **options: Any
+) -> tuple[int, list[tuple[str, str]]]:
+    """转换 source 中的全部 .txt 成员写入 target，返回 (成功数, [(成员名, 错误信息)])"""
+    workers = workers or os.cpu_count() or 1
+    members = read_members(source)
+    converted = 0
+    failed = []
+    with ArchiveWriter(target) as writer, Pool(workers, _enable_line_cache) as pool:
+        # 分批提交（Pool.imap 会一次取完整个输入迭代器）；写出一批的结果之前
+        # 先提交下一批，进程池不会因为读写归档而空闲
+        pending = None
+        while True:
+            batch = [(member, options) for member in islice(members, workers * BATCH_PER_WORKER)]
+            current = pool.imap(_transpile_member, batch, BATCH_PER_WORKER // 4) if batch else None
+            for (name, data, mtime), error in pending or ():
+                if error is None:
+                    writer.add(name, data, mtime)
+                    converted += 1
+                else:
+                    failed.append((name, error))
+            if current is None:
+                break
+            pending = current
+    return converted, failed
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    arg_parser = argparse.ArgumentParser(description="转换 zip / tar 归档中的伪代码，写入新的归档")
+    arg_parser.add_argument("source", help="输入归档（zip 或 tar，可压缩）")
+    arg_parser.add_argument("target", help="输出归档：.zip、.tar、.tar.gz、.tar.bz2 或 .tar.xz")
+    arg_parser.add_argument("--workers", type=int, help="转换进程数（默认 CPU 核数）")
+    arg_parser.add_argument(
+        "--tail-calls", action="store_true", help="把过程/函数的自身尾调用改写为循环"
+    )
+    args = arg_parser.parse_args()
+
+    started = time.perf_counter()
+    options = {"tail_calls": True} if args.tail_calls else {}
+    count, errors = convert_archive(args.source, args.target, args.workers, **options)
+    for name, error in errors:
+        print(f"failed {name}: {error}", file=sys.stderr)
+    print(
+        f"converted {count}, failed {len(errors)} in {(time.perf_counter() - started) * 1000:.0f} ms",
+        file=sys.stderr,
+    )
+    sys.exit(1 if errors else 0)
@@ -0,0 +1,313 @@
+"""语法树的序列化
+
+JSON：可读的调试输出，dump_json 边编码边写文件，不在内存中拼出整个字符串。
+二进制：用于把解析与代码生成分开（不同时间或不同机器）执行。格式自描述，
+与 Python 版本无关，只能还原出 dict / list / str / int / float / bool / None，
+损坏或伪造的文件只会得到 ValueError。
+
+二进制格式按列存储，解码时逐组而不是逐个节点执行 Python 代码，比 json.loads
+快。所有值放在一张值表里，先是标量，然后是容器（dict / list）：
+
+    MAGIC  版本(1 字节)  头部（HEADER，uint32）
+    标量：字符串的字符数与拼接后的 UTF-8、int64 整数、超出 int64 的整数
+          （字符串编号）、float64 浮点数；值表以 None、False、True 开头
+    布局表：每种字典键序列一项，[键数, 键的字符串编号...]
+    分组：[种类, 布局编号或列表长度, 个数]，按深度（到根的层数）从深到浅排序
+    引用：每组依次写出各容器的子值在值表中的编号
+
+同一组的容器键序列（或长度）相同，子值都在之前的组或标量中，解码时把该组
+的引用按行切分，一次建好整组（字典用按布局生成的列表推导，见 _dict_builder），
+追加到值表；值表的最后一项是根节点。整数都按小端序存储，由 array.frombytes
+整段读取。
+
+编码仍要在 Python 中逐个容器遍历，比 json.dumps 慢约三倍；这一格式面向
+一次写出、多次读取（--emit-ast 之后反复 --ast-in）的用法。
+
+    python pseudocode.py prog.txt --emit-ast prog.ast    # 解析并保存二进制语法树
+    python pseudocode.py --ast-in prog.ast               # 跳过词法/语法分析，直接生成代码
+    python pseudocode.py prog.txt --dump-ast prog.json   # 写出 JSON 格式的语法树
+"""
+from __future__ import annotations
+import functools
+import json
+import struct
+import sys
+from array import array
+from itertools import accumulate, chain, count, repeat
+from typing import Any, Callable, Iterable, TextIO
+
+MAGIC = b"PCAST"
+FORMAT_VERSION = 3
+# 字符串数、字符串字节数、整数个数、大整数个数、浮点数个数、布局表字数、分组数、引用数
+HEADER = struct.Struct("<8I")
+CONSTANTS = [None, False, True]
+GROUP_DICT = 0
+GROUP_LIST = 1
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+UINT32 = "I" if array("I").itemsize == 4 else "L"
+CONTAINER_TYPES = {dict, list, tuple}
+SCALAR_TYPES = {str, int, float, bool, type(None)}
+
+
+def dump_json(ast: dict, fp: TextIO, indent: int = 2) -> None:
+    """把语法树以 JSON 流式写入 fp"""
+    fp.writelines(json.JSONEncoder(indent=indent).iterencode(ast))
+
+
+def _pack(typecode: str, values: Any) -> bytes:
+    packed = array(typecode, values)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+@functools.lru_cache(maxsize=256)
+def _dict_builder(keys: tuple[str, ...]) -> Callable[[Iterable[tuple]], list[dict]]:
+    """按键序列生成建一组 dict 的列表推导
+
+    字典字面量比 dict(zip(键, 值)) 快一倍以上。键经 repr 写入代码，任何字符串
+    的 repr 都是与它相等的字符串字面量，文件内容不会成为代码。
+    """
+    names = [f"v{index}" for index in range(len(keys))]
+    items = ", ".join(f"{key!r}: {name}" for key, name in zip(keys, names))
+    code = f"lambda rows: [{{{items}}} for {', '.join(names)}, in rows]"
+    try:
+        return eval(code, {"__builtins__": {}})
+    except (SyntaxError, RecursionError, MemoryError) as error:
+        raise ValueError("Binary AST shape table is corrupt") from error
+
+
+def _unpack(typecode: str, data: bytes) -> list:
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tolist()
+
+
+def _children(container: Any) -> Iterable[Any]:
+    return container.values() if type(container) is dict else container
+
+
+def _group(root: dict) -> list[tuple[tuple, list]] | None:
+    """把全部容器按 (深度, 种类, 布局) 分组，组按深度从深到浅排序
+
+    树中子节点总比父节点深一层，先建深的组就保证子值已在值表中。用显式栈
+    前序遍历，不受递归深度限制；有共享或成环的容器时返回 None。
+    """
+    groups: dict[tuple, list] = {}
+    seen = set()
+    stack = [(root, 0)]
+    while stack:
+        value, depth = stack.pop()
+        if id(value) in seen:
+            return None
+        seen.add(id(value))
+        if type(value) is dict:
+            group = (depth, GROUP_DICT, tuple(value))
+            items = value.values()
+        else:
+            group = (depth, GROUP_LIST, len(value))
+            items = value
+        members = groups.get(group)
+        if members is None:
+            members = groups[group] = []
+        members.append(value)
+        stack += [(item, depth + 1) for item in items if type(item) in CONTAINER_TYPES]
+    return sorted(groups.items(), key=lambda item: -item[0][0])
+
+
+def dumps_binary(ast: dict) -> bytes:
+    """编码语法树；标量与容器都按对象的 id 查编号，逐个值的工作都在 C 中完成"""
+    if type(ast) is not dict:
+        raise TypeError("Binary AST root must be a dict")
+    groups = _group(ast)
+    if groups is None:
+        # 共享子树按 JSON 的方式展开成各自的副本；有环时 json 抛出 ValueError
+        return dumps_binary(json.loads(json.dumps(ast)))
+    children = [list(chain.from_iterable(map(_children, members))) for _, members in groups]
+    scalars = [item for items in children for item in items if type(item) not in CONTAINER_TYPES]
+    unsupported = set(map(type, scalars)) - SCALAR_TYPES
+    if unsupported:
+        raise TypeError(f"Cannot encode {unsupported.pop().__name__} in a binary AST")
+
+    texts = [item for item in scalars if type(item) is str]
+    numbers = [item for item in scalars if type(item) is int]
+    ints = [number for number in numbers if INT64_MIN <= number <= INT64_MAX]
+    huge = [number for number in numbers if not INT64_MIN <= number <= INT64_MAX]
+    big_ints = list(dict.fromkeys(huge))
+    floats = [item for item in scalars if type(item) is float]
+
+    shapes = dict.fromkeys(shape for (_, kind, shape), _ in groups if kind == GROUP_DICT)
+    strings = dict.fromkeys(texts)
+    for shape in shapes:
+        for key in shape:
+            if type(key) is not str:
+                raise TypeError("Binary AST keys must be strings")
+        strings.update(dict.fromkeys(shape))
+    strings.update(dict.fromkeys(map(str, big_ints)))
+    string_slots = dict(zip(strings, count(len(CONSTANTS))))
+    int_slots = dict(zip(dict.fromkeys(ints), count(len(CONSTANTS) + len(strings))))
+    big_int_slots = dict(zip(big_ints, count(len(CONSTANTS) + len(strings) + len(int_slots))))
+    float_keys = dict.fromkeys(map(float.hex, floats))
+    float_slots = dict(zip(float_keys, count(len(CONSTANTS) + len(strings) + len(int_slots) + len(big_int_slots))))
+
+    # 值表中的编号：常量、字符串、整数、大整数、浮点数，然后按组排列的容器
+    slots = {id(None): 0, id(False): 1, id(True): 2}
+    slots.update(zip(map(id, texts), map(string_slots.__getitem__, texts)))
+    slots.update(zip(map(id, ints), map(int_slots.__getitem__, ints)))
+    slots.update(zip(map(id, huge), map(big_int_slots.__getitem__, huge)))
+    slots.update(zip(map(id, floats), map(float_slots.__getitem__, map(float.hex, floats))))
+    slot = len(CONSTANTS) + len(strings) + len(int_slots) + len(big_int_slots) + len(float_slots)
+    shape_ids = dict(zip(shapes, count()))
+    group_words: list[int] = []
+    references: list[int] = []
+    lookup = slots.__getitem__
+    for ((_, kind, shape), members), items in zip(groups, children):
+        group_words += (kind, shape_ids[shape] if kind == GROUP_DICT else shape, len(members))
+        references += map(lookup, map(id, items))
+        slots.update(zip(map(id, members), count(slot)))
+        slot += len(members)
+
+    shape_words: list[int] = []
+    for shape in shapes:
+        shape_words.append(len(shape))
+        shape_words += [string_slots[key] - len(CONSTANTS) for key in shape]
+    blob = "".join(strings).encode("utf-8")
+    header = HEADER.pack(
+        len(strings), len(blob), len(int_slots), len(big_ints), len(float_slots),
+        len(shape_words), len(groups), len(references),
+    )
+    return b"".join((
+        MAGIC,
+        bytes((FORMAT_VERSION,)),
+        header,
+        _pack(UINT32, map(len, strings)),
+        blob,
+        _pack("q", int_slots),
+        _pack(UINT32, [string_slots[str(number)] - len(CONSTANTS) for number in big_ints]),
+        _pack("d", map(float.fromhex, float_keys)),
+        _pack(UINT32, shape_words),
+        _pack(UINT32, group_words),
+        _pack(UINT32, references),
+    ))
+
+
+class _Reader:
+    """按顺序读取各段，长度不足时抛出 ValueError"""
+
+    def __init__(self, data: bytes, offset: int) -> None:
+        self.data = memoryview(data)
+        self.offset = offset
+
+    def take(self, size: int) -> memoryview:
+        if self.offset + size > len(self.data):
+            raise ValueError("Binary AST is truncated")
+        chunk = self.data[self.offset:self.offset + size]
+        self.offset += size
+        return chunk
+
+    def values(self, typecode: str, count: int) -> list:
+        return _unpack(typecode, self.take(8 * count if typecode in "qd" else 4 * count))
+
+
+def _scalars(reader: _Reader, counts: tuple) -> tuple[list[Any], list[str]]:
+    """值表开头的标量部分，以及字符串表"""
+    string_count, blob_size, int_count, big_int_count, float_count = counts
+    lengths = reader.values(UINT32, string_count)
+    try:
+        text = str(reader.take(blob_size), "utf-8")
+    except UnicodeDecodeError as error:
+        raise ValueError("Binary AST string table is not valid UTF-8") from error
+    if sum(lengths) != len(text):
+        raise ValueError("Binary AST string table is corrupt")
+    ends = list(accumulate(lengths))
+    strings = list(map(text.__getitem__, map(slice, [0] + ends[:-1], ends)))
+    ints = reader.values("q", int_count)
+    big_int_ids = reader.values(UINT32, big_int_count)
+    if big_int_ids and max(big_int_ids) >= string_count:
+        raise ValueError("Binary AST integer table is corrupt")
+    try:
+        big_ints = list(map(int, map(strings.__getitem__, big_int_ids)))
+    except ValueError as error:
+        raise ValueError("Binary AST integer table is corrupt") from error
+    floats = reader.values("d", float_count)
+    return CONSTANTS + strings + ints + big_ints + floats, strings
+
+
+def loads_binary(data: bytes) -> dict:
+    """解码 dumps_binary 的结果；任何不一致都抛出 ValueError"""
+    start = len(MAGIC) + 1
+    if data[:len(MAGIC)] != MAGIC or len(data) < start + HEADER.size:
+        raise ValueError("Not a binary AST file")
+    if data[len(MAGIC)] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported AST format version: {data[len(MAGIC)]}")
+    counts = HEADER.unpack_from(data, start)
+    reader = _Reader(data, start + HEADER.size)
+    values, strings = _scalars(reader, counts[:5])
+    shape_size, group_count, reference_count = counts[5:]
+
+    shape_words = reader.values(UINT32, shape_size)
+    shapes = []
+    position = 0
+    while position < len(shape_words):
+        count = shape_words[position]
+        keys = shape_words[position + 1:position + 1 + count]
+        if len(keys) != count or any(key >= len(strings) for key in keys):
+            raise ValueError("Binary AST shape table is corrupt")
+        shapes.append((count, _dict_builder(tuple(map(strings.__getitem__, keys))) if count else None))
+        position += 1 + count
+    group_words = reader.values(UINT32, 3 * group_count)
+    references = reader.values(UINT32, reference_count)
+    if reader.offset != len(data):
+        raise ValueError("Binary AST has trailing data")
+
+    lookup = values.__getitem__
+    position = 0
+    for index in range(0, len(group_words), 3):
+        kind, parameter, count = group_words[index:index + 3]
+        if kind == GROUP_DICT and parameter < len(shapes):
+            width, build = shapes[parameter]
+        elif kind == GROUP_LIST:
+            width = parameter
+        else:
+            raise ValueError("Binary AST group table is corrupt")
+        size = width * count
+        if not width:
+            # 空容器不占引用：个数不能超过文件大小，避免伪造的文件耗尽内存
+            if count > len(data):
+                raise ValueError("Binary AST group table is corrupt")
+            values += map(dict if kind == GROUP_DICT else list, repeat((), count))
+            continue
+        if not count or position + size > len(references):
+            raise ValueError("Binary AST group table is corrupt")
+        # 只能引用之前的组（更大的编号在值表中还不存在，抛出 IndexError）：
+        # 解码结果一定是树（或共享子树的 DAG），不会有环
+        try:
+            resolved = list(map(lookup, references[position:position + size]))
+        except IndexError as error:
+            raise ValueError("Binary AST references a later value") from error
+        position += size
+        # 引用按行存储：每 width 个是一个容器的子值
+        rows = zip(*[iter(resolved)] * width)
+        if kind == GROUP_DICT:
+            values += build(rows)
+        else:
+            values += map(list, rows)
+    if position != len(references) or not group_words:
+        raise ValueError("Binary AST group table is corrupt")
+    ast = values[-1]
+    if not isinstance(ast, dict) or ast.get("type") != "Program":
+        raise ValueError("Binary AST does not contain a Program")
+    return ast
+
+
+def dump_binary(ast: dict, path: str) -> None:
+    with open(path, "wb") as fp:
+        fp.write(dumps_binary(ast))
+
+
+def load_binary(path: str) -> dict:
+    with open(path, "rb") as fp:
+        return loads_binary(fp.read())
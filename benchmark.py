@@ -0,0 +1,432 @@
+"""伪代码转换器的规模基准测试
+
+用固定随机种子生成不同形状、不同规模的合法伪代码，分别计时
+Tokenizer.tokenize、Parser.parse_program 与 Pseudocode.ast_to_python，
+在双对数坐标上拟合耗时曲线的指数，并与保存的基线比较以发现超线性增长。
+
+    python benchmark.py                      # 运行并与 bench_baseline.json 比较
+    python benchmark.py --save-baseline      # 重新生成基线
+    python benchmark.py --shapes nested expression --sizes 25 50 100 200
+    python benchmark.py --licm               # 字符串扫描程序在循环不变量外提前后的运行时间
+    python benchmark.py --string-builders    # 字符串拼接程序改用列表缓冲前后的运行时间
+    python benchmark.py --vectorize          # 数组归约程序改为整段操作前后的运行时间
+    python benchmark.py --counter-loops      # 计数循环改为 range 上的 for 前后的运行时间
+"""
+from __future__ import annotations
+import gc
+import io
+import json
+import math
+import random
+import sys
+import time
+from typing import Callable, Optional
+
+from pseudocode import Tokenizer, Parser, Pseudocode
+from runner import execute
+
+DEFAULT_SIZES = [50, 200, 800]
+DEFAULT_BASELINE = "bench_baseline.json"
+# 指数超过该值即视为超线性
+SUPERLINEAR_EXPONENT = 1.3
+# 与基线相比指数允许的增幅
+EXPONENT_TOLERANCE = 0.3
+
+
+class ProgramGenerator:
+    """按形状生成合法伪代码，同一种子总是生成相同的程序"""
+
+    def __init__(self, seed: int = 0) -> None:
+        self.random = random.Random(seed)
+
+    def generate(self, shape: str, size: int) -> str:
+        return getattr(self, f"gen_{shape}")(size)
+
+    def operand(self, names: list[str]) -> str:
+        if self.random.random() < 0.5:
+            return self.random.choice(names)
+        return str(self.random.randint(0, 99))
+
+    def gen_straight(self, size: int) -> str:
+        """长串顺序语句"""
+        names = [f"V{i}" for i in range(max(2, size // 10))]
+        lines = [f"DECLARE {name} : INTEGER" for name in names]
+        for _ in range(size):
+            target = self.random.choice(names)
+            kind = self.random.random()
+            if kind < 0.6:
+                lines.append(
+                    f"{target} ← {self.operand(names)} + {self.operand(names)} * 2"
+                )
+            elif kind < 0.8:
+                lines.append(f"OUTPUT {target}, \"value\"")
+            else:
+                lines.append(f"{target} ← MOD({self.operand(names)}, 7)")
+        return "\n".join(lines)
+
+    def gen_nested(self, size: int) -> str:
+        """交替嵌套的 IF / WHILE，嵌套深度为 size // 4（递归下降解析器的栈深度有限）"""
+        lines = ["DECLARE X : INTEGER", "X ← 0"]
+        closers = []
+        for depth in range(max(1, size // 4)):
+            pad = "    " * depth
+            if depth % 2 == 0:
+                lines.append(f"{pad}IF X < {depth + 1} THEN")
+                closers.append(f"{pad}ENDIF")
+            else:
+                lines.append(f"{pad}WHILE X < {depth} DO")
+                closers.append(f"{pad}ENDWHILE")
+            lines.append(f"{pad}    X ← X + 1")
+        lines.extend(reversed(closers))
+        return "\n".join(lines)
+
+    def gen_expression(self, size: int) -> str:
+        """一个超长表达式"""
+        names = ["A", "B", "C"]
+        operators = ["+", "-", "*"]
+        terms = [self.operand(names)]
+        for _ in range(size):
+            terms.append(self.random.choice(operators))
+            terms.append(self.operand(names))
+        lines = [f"DECLARE {name} : INTEGER" for name in names]
+        lines.append("A ← " + " ".join(terms))
+        return "\n".join(lines)
+
+    def gen_procedures(self, size: int) -> str:
+        """大量 PROCEDURE 及其调用"""
+        lines = ["DECLARE Total : INTEGER", "Total ← 0"]
+        for i in range(size):
+            lines += [
+                f"PROCEDURE Proc{i}(N : INTEGER)",
+                "    DECLARE Local : INTEGER",
+                f"    Local ← N * {self.random.randint(1, 9)}",
+                "    OUTPUT Local",
+                "ENDPROCEDURE",
+            ]
+        for i in range(size):
+            lines.append(f"CALL Proc{i}({self.random.randint(0, 99)})")
+        return "\n".join(lines)
+
+    def gen_arrays(self, size: int) -> str:
+        """大数组的声明与遍历"""
+        lines = []
+        for i in range(max(1, size // 20)):
+            lines += [
+                f"DECLARE Arr{i} : ARRAY[1:{size}, 1:4] OF INTEGER",
+                f"FOR Index ← 1 TO {size}",
+                "    FOR Col ← 1 TO 4",
+                f"        Arr{i}[Index, Col] ← Index * Col + {i}",
+                "    NEXT Col",
+                "NEXT Index",
+            ]
+        return "\n".join(lines)
+
+    def gen_fileio(self, size: int) -> str:
+        """频繁的文件读写"""
+        lines = ["DECLARE Line : STRING"]
+        for i in range(size):
+            name = f"data{i % 10}.txt"
+            if i % 2 == 0:
+                lines += [
+                    f"OPENFILE {name} FOR WRITE",
+                    f"WRITEFILE {name}, Line",
+                    f"CLOSEFILE {name}",
+                ]
+            else:
+                lines += [
+                    f"OPENFILE {name} FOR READ",
+                    f"READFILE {name}, Line",
+                    f"CLOSEFILE {name}",
+                ]
+        return "\n".join(lines)
+
+    def gen_string_scan(self, size: int) -> str:
+        """典型的字符串扫描练习：长度为 size 的文本，逐字符统计、查找"""
+        text = "".join(self.random.choice("abcde fghij") for _ in range(size))
+        return "\n".join([
+            "DECLARE Text : STRING",
+            "DECLARE Index : INTEGER",
+            "DECLARE Vowels : INTEGER",
+            "DECLARE Spaces : INTEGER",
+            f"Text ← \"{text}\"",
+            "Index ← 1",
+            "Vowels ← 0",
+            "Spaces ← 0",
+            "WHILE Index < LENGTH(Text) DO",
+            "    IF SUBSTRING(UCASE(Text), Index, 1) = \"A\" OR SUBSTRING(UCASE(Text), Index, 1) = \"E\" THEN",
+            "        Vowels ← Vowels + 1",
+            "    ENDIF",
+            "    Index ← Index + 1",
+            "ENDWHILE",
+            "FOR Index ← 1 TO LENGTH(Text)",
+            "    IF SUBSTRING(LCASE(Text), Index, 1) = \" \" THEN",
+            "        Spaces ← Spaces + 1",
+            "    ENDIF",
+            "NEXT Index",
+            "OUTPUT Vowels, Spaces",
+        ])
+
+    def gen_string_concat(self, size: int) -> str:
+        """循环中逐段拼接字符串，循环 size * 10 次"""
+        words = [self.random.choice(["alpha", "beta", "gamma", "delta"]) for _ in range(8)]
+        lines = ["DECLARE Message : STRING", "DECLARE Words : ARRAY[0:8] OF STRING"]
+        lines += [f"Words[{i}] ← \"{word}\"" for i, word in enumerate(words)]
+        lines += [
+            "Message ← \"\"",
+            f"FOR Index ← 0 TO {size * 10}",
+            "    Message ← Message + Words[MOD(Index, 8)] + \" \"",
+            "NEXT Index",
+            "OUTPUT LENGTH(Message)",
+        ]
+        return "\n".join(lines)
+
+    def gen_array_reductions(self, size: int) -> str:
+        """大数组上的填充、求和、最值与计数，数组长度为 size * 100"""
+        length = size * 100
+        return "\n".join([
+            f"DECLARE Data : ARRAY[0:{length + 1}] OF INTEGER",
+            "DECLARE Total : INTEGER",
+            "DECLARE Largest : INTEGER",
+            "DECLARE Zeros : INTEGER",
+            f"FOR Index ← 1 TO {length + 1}",
+            f"    Data[Index] ← {self.random.randint(1, 9)}",
+            "NEXT Index",
+            "Total ← 0",
+            f"FOR Index ← 1 TO {length + 1}",
+            "    Total ← Total + Data[Index]",
+            "NEXT Index",
+            "Largest ← Data[1]",
+            f"FOR Index ← 2 TO {length + 1}",
+            "    IF Data[Index] > Largest THEN",
+            "        Largest ← Data[Index]",
+            "    ENDIF",
+            "NEXT Index",
+            "Zeros ← 0",
+            f"FOR Index ← 1 TO {length + 1}",
+            "    IF Data[Index] = 0 THEN",
+            "        Zeros ← Zeros + 1",
+            "    ENDIF",
+            "NEXT Index",
+            "OUTPUT Total, Largest, Zeros",
+        ])
+
+    def gen_counter_loops(self, size: int) -> str:
+        """用计数器手写的 WHILE 与 REPEAT 循环，各执行 size * 100 次"""
+        count = size * 100
+        step = self.random.randint(2, 5)
+        return "\n".join([
+            "DECLARE Index : INTEGER",
+            "DECLARE Limit : INTEGER",
+            "DECLARE Total : INTEGER",
+            f"Limit ← {count}",
+            "Total ← 0",
+            "Index ← 1",
+            "WHILE Index <= Limit DO",
+            f"    Total ← Total + MOD(Index, {step})",
+            "    Index ← Index + 1",
+            "ENDWHILE",
+            "REPEAT",
+            f"    Total ← Total - MOD(Index, {step})",
+            "    Index ← Index - 1",
+            "UNTIL Index < 1",
+            "OUTPUT Index, Total",
+        ])
+
+
+SHAPES = [
+    "straight",
+    "nested",
+    "expression",
+    "procedures",
+    "arrays",
+    "fileio",
+]
+# 运行时间对比（这些形状只用于下面的运行时间表，不参与规模测试）：命令行选项 -> (生成的程序形状, Pseudocode 选项)
+OPTIMIZATIONS = {
+    "licm": ("string_scan", "hoist_invariants"),
+    "string_builders": ("string_concat", "string_builders"),
+    "vectorize": ("array_reductions", "vectorize"),
+    "counter_loops": ("counter_loops", "counter_loops"),
+}
+STAGES = ["tokenize", "parse", "codegen"]
+
+
+def best_of(repeat: int, func: Callable[[], object]) -> float:
+    """与 timeit 一样在计时期间关闭 GC，取最好成绩以减小噪声"""
+    best = math.inf
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return best
+
+
+def time_stages(code: str, repeat: int = 5) -> dict[str, float]:
+    """分别计时三个阶段（各取最好成绩）"""
+    tokens = Tokenizer(code).tokenize()
+    ast = Parser(tokens).parse_program()
+    return {
+        "tokenize": best_of(repeat, lambda: Tokenizer(code).tokenize()),
+        "parse": best_of(repeat, lambda: Parser(tokens).parse_program()),
+        "codegen": best_of(repeat, lambda: Pseudocode().ast_to_python(ast)),
+    }
+
+
+def time_execution(code: str, repeat: int = 5, **options: object) -> float:
+    """转换后执行生成的程序（丢弃输出），返回最好成绩；options 传给 Pseudocode"""
+    ast = Parser(Tokenizer(code).tokenize()).parse_program()
+    python_code = Pseudocode(**options).ast_to_python(ast)
+    return best_of(repeat, lambda: execute(python_code, stdout=io.StringIO()))
+
+
+def optimization_benchmark(
+    optimization: str, sizes: list[int], seed: int = 0, repeat: int = 5
+) -> str:
+    """对比生成的程序在启用某个优化前后的运行时间（见 OPTIMIZATIONS）"""
+    shape, option = OPTIMIZATIONS[optimization]
+    lines = [f"{'size':>8}{'plain(ms)':>12}{'optimized(ms)':>15}{'speedup':>10}"]
+    for size in sizes:
+        code = ProgramGenerator(seed).generate(shape, size)
+        plain = time_execution(code, repeat)
+        optimized = time_execution(code, repeat, **{option: True})
+        lines.append(
+            f"{size:>8}{plain * 1000:>12.3f}{optimized * 1000:>15.3f}{plain / optimized:>9.2f}x"
+        )
+    return "\n".join(lines)
+
+
+def fit_exponent(sizes: list[int], seconds: list[float]) -> float:
+    """最小二乘拟合 log(t) = k * log(n) + c，返回 k"""
+    xs = [math.log(n) for n in sizes]
+    ys = [math.log(max(t, 1e-9)) for t in seconds]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    var = sum((x - mean_x) ** 2 for x in xs)
+    if not var:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var
+
+
+def run_benchmark(
+    shapes: list[str], sizes: list[int], seed: int = 0, repeat: int = 5
+) -> dict:
+    results = {}
+    for shape in shapes:
+        timings = {stage: [] for stage in STAGES}
+        for size in sizes:
+            code = ProgramGenerator(seed).generate(shape, size)
+            for stage, seconds in time_stages(code, repeat).items():
+                timings[stage].append(seconds)
+        results[shape] = {
+            stage: {
+                "seconds": timings[stage],
+                "exponent": round(fit_exponent(sizes, timings[stage]), 3),
+            }
+            for stage in STAGES
+        }
+    return {"seed": seed, "sizes": sizes, "results": results}
+
+
+def compare(current: dict, baseline: Optional[dict]) -> list[str]:
+    """返回需要关注的问题：超线性增长或相对基线的指数回退"""
+    problems = []
+    for shape, stages in current["results"].items():
+        for stage, result in stages.items():
+            exponent = result["exponent"]
+            base = None
+            if baseline and baseline.get("sizes") == current["sizes"]:
+                base = baseline["results"].get(shape, {}).get(stage)
+            # 基线中已经超线性的阶段属于已知问题，只检查是否进一步恶化
+            known = base is not None and base["exponent"] > SUPERLINEAR_EXPONENT
+            if exponent > SUPERLINEAR_EXPONENT and not known:
+                problems.append(
+                    f"{shape}/{stage}: super-linear scaling (exponent {exponent})"
+                )
+            # 小规模下固定开销会让指数低于 1，低于线性的基线按线性比较以免误报
+            if base and exponent > max(base["exponent"], 1.0) + EXPONENT_TOLERANCE:
+                problems.append(
+                    f"{shape}/{stage}: exponent {exponent} regressed from {base['exponent']}"
+                )
+    return problems
+
+
+def format_results(current: dict, baseline: Optional[dict]) -> str:
+    width = max(map(len, ["shape", *current["results"]])) + 2
+    lines = [f"{'shape':<{width}}{'stage':<10}{'largest(ms)':>13}{'exponent':>10}{'baseline':>10}"]
+    for shape, stages in current["results"].items():
+        for stage, result in stages.items():
+            base = (baseline or {}).get("results", {}).get(shape, {}).get(stage)
+            base_exponent = f"{base['exponent']:.3f}" if base else "-"
+            lines.append(
+                f"{shape:<{width}}{stage:<10}{result['seconds'][-1] * 1000:>13.3f}"
+                f"{result['exponent']:>10.3f}{base_exponent:>10}"
+            )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="伪代码转换器规模基准测试")
+    arg_parser.add_argument("--shapes", nargs="+", choices=SHAPES, default=SHAPES)
+    arg_parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    arg_parser.add_argument("--save-baseline", action="store_true")
+    arg_parser.add_argument(
+        "--emit", metavar="SHAPE:SIZE", help="只输出一个生成的程序，不计时"
+    )
+    arg_parser.add_argument(
+        "--licm", action="store_true", help="比较字符串扫描程序在循环不变量外提前后的运行时间"
+    )
+    arg_parser.add_argument(
+        "--string-builders",
+        action="store_true",
+        help="比较字符串拼接程序改用列表缓冲前后的运行时间",
+    )
+    arg_parser.add_argument(
+        "--vectorize", action="store_true", help="比较数组归约程序改为整段操作前后的运行时间"
+    )
+    arg_parser.add_argument(
+        "--counter-loops",
+        action="store_true",
+        help="比较计数循环改为 range 上的 for 前后的运行时间",
+    )
+    args = arg_parser.parse_args()
+
+    selected = [name for name in OPTIMIZATIONS if getattr(args, name)]
+    if selected:
+        for name in selected:
+            print(f"[{name}]")
+            print(optimization_benchmark(name, args.sizes, args.seed, args.repeat))
+        sys.exit(0)
+
+    if args.emit:
+        shape, size = args.emit.split(":")
+        print(ProgramGenerator(args.seed).generate(shape, int(size)))
+        sys.exit(0)
+
+    current = run_benchmark(args.shapes, args.sizes, args.seed, args.repeat)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as fp:
+            json.dump(current, fp, indent=2)
+        print(format_results(current, None))
+        sys.exit(0)
+
+    try:
+        with open(args.baseline, "r", encoding="utf-8") as fp:
+            baseline = json.load(fp)
+    except FileNotFoundError:
+        baseline = None
+    print(format_results(current, baseline))
+    problems = compare(current, baseline)
+    for problem in problems:
+        print(f"WARNING {problem}")
+    sys.exit(1 if problems else 0)
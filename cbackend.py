@@ -0,0 +1,758 @@
+"""C 后端：把只用数值的伪代码程序编译成本地可执行文件
+
+支持的子集：INTEGER / REAL / BOOLEAN 变量与常量、顶层声明的一维数组、
+IF / CASE / WHILE / REPEAT / FOR、PROCEDURE / FUNCTION（标量参数）、
+DIV / MOD，以及输出数值和字符串字面量的 OUTPUT。出现字符串变量、文件、
+INPUT、RANDOM 等其他节点时抛出 UnsupportedNode，run() 退回 Python 执行。
+
+表达式先用 Pseudocode 生成 Python 代码，再按 Python 的解析结果翻译，
+因此运算符优先级、比较链等与 Python 版本完全一致。变量必须始终保持
+同一种类型（例如 REAL 变量不能被赋予整数值），否则视为不支持。
+
+运行时遇到 Python 会抛出异常或 C 无法等价处理的情况（整数溢出、除零、
+数组越界、FUNCTION 没有返回值）时，程序以 FALLBACK_EXIT 退出，
+run() 丢弃已产生的输出并改用 Python 重新执行。
+
+    python cbackend.py tests/test3.txt             # 编译并运行
+    python cbackend.py tests/test3.txt --emit-c    # 只输出 C 代码
+"""
+from __future__ import annotations
+import ast as pyast
+import hashlib
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+from typing import Optional, TextIO
+
+from analysis import declared_types
+from pseudocode import Tokenizer, Parser, Pseudocode
+
+FALLBACK_EXIT = 75
+CFLAGS = ["-O2", "-std=c99"]
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "pseudocode",
+    "c",
+)
+
+
+class UnsupportedNode(Exception):
+    """程序用到了 C 后端不支持的节点或类型"""
+
+
+class CompileError(RuntimeError):
+    """C 编译器不可用或编译失败"""
+
+
+C_TYPES = {"INTEGER": "long long", "REAL": "double", "BOOLEAN": "int"}
+
+# 运行时辅助函数：与 Python 语义不一致的情况一律以 FALLBACK_EXIT 退出
+C_PRELUDE = r"""#include <math.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+#define PC_FALLBACK_EXIT %(fallback)d
+#define PC_EXACT_INT 9007199254740992LL
+
+static void pc_fallback(const char *reason) {
+    fprintf(stderr, "fallback: %%s\n", reason);
+    exit(PC_FALLBACK_EXIT);
+}
+
+static long long pc_add(long long a, long long b) {
+    long long r;
+    if (__builtin_add_overflow(a, b, &r)) pc_fallback("integer overflow");
+    return r;
+}
+
+static long long pc_sub(long long a, long long b) {
+    long long r;
+    if (__builtin_sub_overflow(a, b, &r)) pc_fallback("integer overflow");
+    return r;
+}
+
+static long long pc_mul(long long a, long long b) {
+    long long r;
+    if (__builtin_mul_overflow(a, b, &r)) pc_fallback("integer overflow");
+    return r;
+}
+
+static long long pc_neg(long long a) {
+    return pc_sub(0, a);
+}
+
+static long long pc_ipow(long long a, long long k) {
+    long long r = 1;
+    while (k-- > 0) r = pc_mul(r, a);
+    return r;
+}
+
+static double pc_rpow(double a, long long k) {
+    double r = pow(a, (double)k);
+    if (isinf(r) && isfinite(a)) pc_fallback("float overflow");
+    return r;
+}
+
+static long long pc_floordiv(long long a, long long b) {
+    if (b == 0 || (a == -9223372036854775807LL - 1 && b == -1)) pc_fallback("integer division");
+    long long q = a / b;
+    if ((a %% b != 0) && ((a < 0) != (b < 0))) q -= 1;
+    return q;
+}
+
+static long long pc_mod(long long a, long long b) {
+    if (b == 0) pc_fallback("integer modulo by zero");
+    if (b == -1) return 0;
+    long long r = a %% b;
+    if (r != 0 && ((r < 0) != (b < 0))) r += b;
+    return r;
+}
+
+static double pc_truediv(double a, double b) {
+    if (b == 0.0) pc_fallback("float division by zero");
+    return a / b;
+}
+
+static double pc_itruediv(long long a, long long b) {
+    if (a > PC_EXACT_INT || a < -PC_EXACT_INT || b > PC_EXACT_INT || b < -PC_EXACT_INT)
+        pc_fallback("inexact integer division");
+    return pc_truediv((double)a, (double)b);
+}
+
+static long long pc_index(long long i, long long n) {
+    if (i < 0) i += n;
+    if (i < 0 || i >= n) pc_fallback("list index out of range");
+    return i;
+}
+
+static void *pc_array(void *old, long long n, size_t size) {
+    void *p = realloc(old, (size_t)(n > 0 ? n : 1) * size);
+    if (!p) pc_fallback("out of memory");
+    memset(p, 0, (size_t)(n > 0 ? n : 1) * size);
+    return p;
+}
+
+/* 与 Python 的 repr(float) 相同：最短的可往返十进制表示 */
+static void pc_print_real(double x) {
+    char buf[64], digits[32];
+    int precision, exponent, n = 0, negative;
+    if (isnan(x)) { fputs("nan", stdout); return; }
+    if (isinf(x)) { fputs(x > 0 ? "inf" : "-inf", stdout); return; }
+    for (precision = 1; precision <= 17; precision++) {
+        snprintf(buf, sizeof buf, "%%.*e", precision - 1, x);
+        if (strtod(buf, NULL) == x) break;
+    }
+    negative = buf[0] == '-';
+    for (char *p = buf + negative; *p && *p != 'e'; p++)
+        if (*p != '.') digits[n++] = *p;
+    while (n > 1 && digits[n - 1] == '0') n--;
+    digits[n] = '\0';
+    exponent = atoi(strchr(buf, 'e') + 1);
+    if (negative) putchar('-');
+    if (exponent >= -4 && exponent < 16) {
+        if (exponent < 0) {
+            fputs("0.", stdout);
+            for (int i = 0; i < -exponent - 1; i++) putchar('0');
+            fputs(digits, stdout);
+        } else if (n <= exponent + 1) {
+            fputs(digits, stdout);
+            for (int i = n; i < exponent + 1; i++) putchar('0');
+            fputs(".0", stdout);
+        } else {
+            fwrite(digits, 1, (size_t)exponent + 1, stdout);
+            putchar('.');
+            fputs(digits + exponent + 1, stdout);
+        }
+    } else {
+        putchar(digits[0]);
+        if (n > 1) {
+            putchar('.');
+            fputs(digits + 1, stdout);
+        }
+        printf("e%%c%%02d", exponent < 0 ? '-' : '+', abs(exponent));
+    }
+}
+
+"""
+
+
+def c_string(text: str) -> str:
+    """C 字符串字面量（按 UTF-8 字节转义）"""
+    out = []
+    for byte in text.encode("utf-8"):
+        char = chr(byte)
+        if char in '"\\':
+            out.append("\\" + char)
+        elif 32 <= byte < 127 and char != "?":
+            out.append(char)
+        else:
+            out.append(f"\\{byte:03o}")
+    return '"' + "".join(out) + '"'
+
+
+class CBackend:
+    """伪代码语法树 -> C 源代码"""
+
+    compare_ops = {
+        pyast.Eq: "==",
+        pyast.NotEq: "!=",
+        pyast.Lt: "<",
+        pyast.LtE: "<=",
+        pyast.Gt: ">",
+        pyast.GtE: ">=",
+    }
+    integer_ops = {pyast.Add: "pc_add", pyast.Sub: "pc_sub", pyast.Mult: "pc_mul"}
+    real_ops = {pyast.Add: "+", pyast.Sub: "-", pyast.Mult: "*"}
+
+    def __init__(self) -> None:
+        # 表达式先转成 Python 代码再解析
+        self.python = Pseudocode()
+        self.globals: dict[str, str] = {}
+        self.arrays: dict[str, str] = {}
+        self.functions: dict[str, tuple[list[str], Optional[str]]] = {}
+        self.locals: Optional[dict[str, str]] = None
+        self.return_type: Optional[str] = None
+        self.temp_count = 0
+
+    def ast_to_c(self, program: dict) -> str:
+        if program.get("type") != "Program":
+            raise UnsupportedNode(program.get("type"))
+        self.collect_globals(program)
+        declarations = [
+            stmt for stmt in program["statements"] if stmt.get("type") in ("ProcedureDeclaration", "FunctionDeclaration")
+        ]
+        for stmt in declarations:
+            self.collect_signature(stmt)
+        variables = [f"static {C_TYPES[kind]} v_{name};" for name, kind in sorted(self.globals.items())]
+        variables += [
+            f"static {C_TYPES[kind]} *v_{name};\nstatic long long v_{name}_len;"
+            for name, kind in sorted(self.arrays.items())
+        ]
+        prototypes = [self.signature(stmt) + ";" for stmt in declarations]
+        functions = [self.function_to_c(stmt) for stmt in declarations]
+        main = [
+            self.statement_to_c(stmt)
+            for stmt in program["statements"]
+            if stmt.get("type") not in ("ProcedureDeclaration", "FunctionDeclaration")
+        ]
+        body = "\n".join(main + ["fflush(stdout);", "return 0;"])
+        return (
+            C_PRELUDE % {"fallback": FALLBACK_EXIT}
+            + "\n".join(variables + [""] + prototypes + [""] + functions)
+            + f"\nint main(void) {{\n{indent(body)}\n}}\n"
+        )
+
+    # ---- 名字与类型 ----
+
+    @staticmethod
+    def check_name(name: str) -> str:
+        if not (name.isascii() and name.isidentifier()):
+            raise UnsupportedNode(f"identifier {name!r}")
+        return name
+
+    def collect_globals(self, program: dict) -> None:
+        """顶层（不在 PROCEDURE / FUNCTION 中）出现的变量、常量与数组"""
+        types = declared_types(program)
+        stack = [
+            stmt for stmt in program["statements"] if stmt.get("type") not in ("ProcedureDeclaration", "FunctionDeclaration")
+        ]
+        while stack:
+            stmt = stack.pop()
+            stmt_type = stmt.get("type")
+            if stmt_type == "ArrayDeclaration":
+                if len(stmt["dimensions"]) != 1 or stmt["data_type"] not in C_TYPES:
+                    raise UnsupportedNode("array declaration")
+                self.arrays[self.check_name(stmt["identifier"])] = stmt["data_type"]
+            elif stmt_type == "ConstantDeclaration":
+                self.globals[self.check_name(stmt["identifier"])] = self.value_type(stmt["value"])
+            for name, loop in self.assigned_names([stmt], nested=False).items():
+                self.globals[self.check_name(name)] = self.variable_type(name, types, loop)
+            for key in ("body", "then_block", "else_block", "otherwise"):
+                stack.extend(stmt.get(key) or [])
+            for case in stmt.get("cases", []):
+                stack.append(case["body"])
+        if set(self.globals) & set(self.arrays):
+            raise UnsupportedNode("name used as both array and scalar")
+
+    @staticmethod
+    def value_type(value: object) -> str:
+        if isinstance(value, bool):
+            return "BOOLEAN"
+        if isinstance(value, int):
+            return "INTEGER"
+        if isinstance(value, float):
+            return "REAL"
+        raise UnsupportedNode(f"constant {value!r}")
+
+    def variable_type(self, name: str, types: dict[str, Optional[str]], loop_variable: bool = False) -> str:
+        kind = types.get(name, "INTEGER" if loop_variable else None)
+        if kind is None and name in self.globals:
+            kind = self.globals[name]
+        if kind not in C_TYPES:
+            raise UnsupportedNode(f"variable {name} of type {kind}")
+        return kind
+
+    @staticmethod
+    def assigned_names(block: list[dict], nested: bool = True) -> dict[str, bool]:
+        """block 中被赋值或声明的标量名 -> 是否是 FOR 循环变量（nested 为 False 时只看这一层）"""
+        names: dict[str, bool] = {}
+        for stmt in block:
+            stmt_type = stmt.get("type")
+            if stmt_type == "ExpressionStatement":
+                expr = stmt["expression"]
+                if expr.get("type") == "BinaryExpression" and expr["operator"] == "ASSIGN":
+                    if expr["left"].get("type") == "Identifier":
+                        names.setdefault(expr["left"]["name"], False)
+            elif stmt_type == "ForLoop":
+                names[stmt["variable"]] = True
+            elif stmt_type == "SimpleVariableDeclaration":
+                names.setdefault(stmt["identifier"], False)
+            if nested:
+                children = [stmt.get(key) or [] for key in ("body", "then_block", "else_block", "otherwise")]
+                children += [[case["body"]] for case in stmt.get("cases", [])]
+                for child in children:
+                    for name, loop in CBackend.assigned_names(child).items():
+                        names[name] = names.get(name, False) or loop
+        return names
+
+    def collect_signature(self, stmt: dict) -> None:
+        name = self.check_name(stmt["name"])
+        params = []
+        for param in stmt["parameters"]:
+            if param["is_array"] or param["data_type"] not in C_TYPES:
+                raise UnsupportedNode("parameter type")
+            params.append(param["data_type"])
+        returns = None
+        if stmt["type"] == "FunctionDeclaration":
+            if stmt["return_type"]["is_array"] or stmt["return_type"]["data_type"] not in C_TYPES:
+                raise UnsupportedNode("return type")
+            returns = stmt["return_type"]["data_type"]
+        self.functions[name] = (params, returns)
+
+    def signature(self, stmt: dict) -> str:
+        params, returns = self.functions[stmt["name"]]
+        args = ", ".join(
+            f"{C_TYPES[kind]} a_{param['identifier']}" for kind, param in zip(params, stmt["parameters"])
+        )
+        return f"static {C_TYPES[returns] if returns else 'void'} f_{stmt['name']}({args or 'void'})"
+
+    def lookup(self, name: str) -> tuple[str, str]:
+        """变量名 -> (C 名字, 类型)；Python 规则：函数中被赋值的名字是局部变量"""
+        if self.locals is not None and name in self.locals:
+            return f"l_{name}", self.locals[name]
+        if name in self.globals:
+            return f"v_{name}", self.globals[name]
+        raise UnsupportedNode(f"name {name}")
+
+    # ---- 语句 ----
+
+    def block_to_c(self, block: list[dict]) -> str:
+        if not block:
+            # 生成的 Python 代码中空语句块是语法错误
+            raise UnsupportedNode("empty block")
+        return "\n".join(self.statement_to_c(stmt) for stmt in block)
+
+    def function_to_c(self, stmt: dict) -> str:
+        params, returns = self.functions[stmt["name"]]
+        types = declared_types({"type": "Block", "body": stmt["body"]})
+        names = [self.check_name(param["identifier"]) for param in stmt["parameters"]]
+        self.locals = dict(zip(names, params))
+        for name, loop in self.assigned_names(stmt["body"]).items():
+            if name not in self.locals:
+                self.locals[self.check_name(name)] = self.variable_type(name, types, loop)
+        self.return_type = returns
+        lines = [
+            f"{C_TYPES[kind]} l_{name} = {f'a_{name}' if name in names else '0'};"
+            for name, kind in self.locals.items()
+        ]
+        lines.append(self.block_to_c(stmt["body"]))
+        if returns:
+            lines.append('pc_fallback("function returned None");')
+            lines.append("return 0;")
+        self.locals = None
+        self.return_type = None
+        return f"{self.signature(stmt)} {{\n{indent(chr(10).join(lines))}\n}}\n"
+
+    def statement_to_c(self, stmt: dict) -> str:
+        stmt_type = stmt.get("type")
+        if stmt.get("expression", {}).get("start") == "backslash":
+            raise UnsupportedNode("line continuation")
+
+        if stmt_type == "SimpleVariableDeclaration":
+            target, _ = self.lookup(stmt["identifier"])
+            return f"{target} = 0;"
+
+        if stmt_type == "ArrayDeclaration":
+            if self.locals is not None:
+                raise UnsupportedNode("local array")
+            name = stmt["identifier"]
+            dimension = stmt["dimensions"][0]
+            size, kind = self.expression_to_c(
+                f"({self.python.ast_to_python(dimension['upper'])}) - ({self.python.ast_to_python(dimension['lower'])})"
+            )
+            if kind != "INTEGER":
+                raise UnsupportedNode("array bound")
+            return (
+                f"v_{name}_len = {size};\n"
+                f"if (v_{name}_len < 0) v_{name}_len = 0;\n"
+                f"v_{name} = pc_array(v_{name}, v_{name}_len, sizeof(*v_{name}));"
+            )
+
+        if stmt_type == "ConstantDeclaration":
+            target, kind = self.lookup(stmt["identifier"])
+            return f"{target} = {self.literal(stmt['value'])[0]};"
+
+        if stmt_type in ("ExpressionStatement", "ProcedureCall"):
+            return self.python_statement_to_c(self.python.ast_to_python(stmt))
+
+        if stmt_type == "IfStatement":
+            condition = self.condition(stmt["condition"])
+            code = f"if ({condition}) {{\n{indent(self.block_to_c(stmt['then_block']))}\n}}"
+            if stmt["else_block"]:
+                code += f" else {{\n{indent(self.block_to_c(stmt['else_block']))}\n}}"
+            return code
+
+        if stmt_type == "WhileLoop":
+            return f"while ({self.condition(stmt['condition'])}) {{\n{indent(self.block_to_c(stmt['body']))}\n}}"
+
+        if stmt_type == "RepeatLoop":
+            body = self.block_to_c(stmt["body"])
+            return f"while (1) {{\n{indent(body)}\n    if ({self.condition(stmt['condition'])}) break;\n}}"
+
+        if stmt_type == "ForLoop":
+            return self.for_to_c(stmt)
+
+        if stmt_type == "CaseStatement":
+            return self.case_to_c(stmt)
+
+        if stmt_type == "OutputStatement":
+            return self.output_to_c(stmt)
+
+        if stmt_type == "ReturnStatement":
+            if self.return_type is None:
+                raise UnsupportedNode("RETURN outside FUNCTION")
+            value, kind = self.expression_to_c(self.python.ast_to_python(stmt["expression"]))
+            if kind != self.return_type:
+                raise UnsupportedNode("return type mismatch")
+            return f"return {value};"
+
+        raise UnsupportedNode(stmt_type)
+
+    def python_statement_to_c(self, code: str) -> str:
+        try:
+            body = pyast.parse(code).body
+        except SyntaxError as error:
+            raise UnsupportedNode(f"invalid statement {code!r}") from error
+        if len(body) != 1:
+            raise UnsupportedNode(code)
+        node = body[0]
+        if isinstance(node, pyast.Assign) and len(node.targets) == 1:
+            value, kind = self.translate(node.value)
+            target, target_kind = self.translate(node.targets[0])
+            if kind != target_kind:
+                raise UnsupportedNode(f"assignment changes type: {code}")
+            return f"{target} = {value};"
+        if isinstance(node, pyast.Expr) and isinstance(node.value, pyast.Call):
+            call, _ = self.translate(node.value, statement=True)
+            return f"{call};"
+        raise UnsupportedNode(code)
+
+    def condition(self, expr: dict) -> str:
+        value, _ = self.expression_to_c(self.python.ast_to_python(expr))
+        return value
+
+    def temp(self) -> str:
+        self.temp_count += 1
+        return f"t{self.temp_count}"
+
+    def for_to_c(self, stmt: dict) -> str:
+        target, kind = self.lookup(stmt["variable"])
+        start, start_kind = self.expression_to_c(self.python.ast_to_python(stmt["start"]))
+        end, end_kind = self.expression_to_c(self.python.ast_to_python(stmt["end"]))
+        if kind != "INTEGER" or start_kind != "INTEGER" or end_kind != "INTEGER":
+            raise UnsupportedNode("non-integer FOR range")
+        step = 1
+        if stmt["step"]:
+            # 步长必须是常量，才能决定比较方向
+            try:
+                step = pyast.literal_eval(self.python.ast_to_python(stmt["step"]))
+            except ValueError as error:
+                raise UnsupportedNode("FOR step is not a constant") from error
+            if type(step) is not int or step == 0:
+                raise UnsupportedNode("FOR step")
+        index, stop = self.temp(), self.temp()
+        compare = "<" if step > 0 else ">"
+        body = self.block_to_c(stmt["body"])
+        # Python 的 range 在开始时求值边界，循环变量保留最后一次迭代的值
+        return (
+            f"for (long long {index} = {start}, {stop} = {end}; {index} {compare} {stop}; {index} += {step}LL) {{\n"
+            f"    {target} = {index};\n{indent(body)}\n}}"
+        )
+
+    def case_to_c(self, stmt: dict) -> str:
+        if stmt.get("otherwise") and len(stmt["otherwise"]) > 1:
+            # 多条 OTHERWISE 语句生成的 Python 代码无法执行
+            raise UnsupportedNode("multi-statement OTHERWISE")
+        value, kind = self.expression_to_c(self.python.ast_to_python(stmt["expression"]))
+        temp = self.temp()
+        lines = [f"{C_TYPES[kind]} {temp} = {value};"]
+        for i, case in enumerate(stmt["cases"]):
+            label, label_kind = self.expression_to_c(self.python.ast_to_python(case["condition"]))
+            if (label_kind == "BOOLEAN") != (kind == "BOOLEAN"):
+                raise UnsupportedNode("CASE label type")
+            keyword = "if" if i == 0 else "} else if"
+            lines.append(f"{keyword} ({temp} == {label}) {{\n{indent(self.statement_to_c(case['body']))}")
+        if stmt.get("otherwise"):
+            lines.append(f"}} else {{\n{indent(self.statement_to_c(stmt['otherwise'][0]))}")
+        lines.append("}")
+        return "{\n" + indent("\n".join(lines)) + "\n}"
+
+    def output_to_c(self, stmt: dict) -> str:
+        call = pyast.parse(self.python.ast_to_python(stmt), mode="eval").body
+        lines = []
+        for i, arg in enumerate(call.args):
+            if i:
+                lines.append("putchar(' ');")
+            if isinstance(arg, pyast.Constant) and isinstance(arg.value, str):
+                lines.append(f"fputs({c_string(arg.value)}, stdout);")
+                continue
+            value, kind = self.translate(arg)
+            if kind == "INTEGER":
+                lines.append(f'printf("%lld", {value});')
+            elif kind == "REAL":
+                lines.append(f"pc_print_real({value});")
+            else:
+                lines.append(f'fputs(({value}) ? "True" : "False", stdout);')
+        lines.append("putchar('\\n');")
+        return "\n".join(lines)
+
+    # ---- 表达式（翻译 Python 语法树） ----
+
+    def expression_to_c(self, code: str) -> tuple[str, str]:
+        try:
+            tree = pyast.parse(code, mode="eval")
+        except SyntaxError as error:
+            raise UnsupportedNode(f"invalid expression {code!r}") from error
+        return self.translate(tree.body)
+
+    @staticmethod
+    def literal(value: object) -> tuple[str, str]:
+        if isinstance(value, bool):
+            return ("1" if value else "0"), "BOOLEAN"
+        if isinstance(value, int):
+            if not -(2**63) < value < 2**63:
+                raise UnsupportedNode("integer literal out of range")
+            return f"{value}LL", "INTEGER"
+        if isinstance(value, float) and value == value and abs(value) != float("inf"):
+            return value.hex(), "REAL"
+        raise UnsupportedNode(f"literal {value!r}")
+
+    def translate(self, node: pyast.AST, statement: bool = False) -> tuple[str, str]:
+        """Python 表达式节点 -> (C 表达式, 类型)；类型为 None 表示过程调用"""
+        if isinstance(node, pyast.Constant):
+            return self.literal(node.value)
+
+        if isinstance(node, pyast.Name):
+            return self.lookup(node.id)
+
+        if isinstance(node, pyast.Subscript) and isinstance(node.value, pyast.Name):
+            name = node.value.id
+            if name not in self.arrays or (self.locals is not None and name in self.locals):
+                raise UnsupportedNode(f"array {name}")
+            index, kind = self.translate(node.slice)
+            if kind != "INTEGER":
+                raise UnsupportedNode("array index type")
+            return f"v_{name}[pc_index({index}, v_{name}_len)]", self.arrays[name]
+
+        if isinstance(node, pyast.BinOp):
+            return self.binary(node)
+
+        if isinstance(node, pyast.UnaryOp):
+            operand, kind = self.translate(node.operand)
+            if isinstance(node.op, pyast.Not):
+                return f"(!{operand})", "BOOLEAN"
+            if kind == "BOOLEAN":
+                raise UnsupportedNode("arithmetic on BOOLEAN")
+            if isinstance(node.op, pyast.UAdd):
+                return operand, kind
+            if isinstance(node.op, pyast.USub):
+                return (f"pc_neg({operand})" if kind == "INTEGER" else f"(-{operand})"), kind
+            raise UnsupportedNode(type(node.op).__name__)
+
+        if isinstance(node, pyast.BoolOp):
+            operands = [self.translate(value) for value in node.values]
+            # 只有两边都是布尔值时 and / or 的结果才是布尔值
+            if any(kind != "BOOLEAN" for _, kind in operands):
+                raise UnsupportedNode("and/or on non-BOOLEAN")
+            op = " && " if isinstance(node.op, pyast.And) else " || "
+            return "(" + op.join(value for value, _ in operands) + ")", "BOOLEAN"
+
+        if isinstance(node, pyast.Compare):
+            return self.compare(node)
+
+        if isinstance(node, pyast.Call) and isinstance(node.func, pyast.Name) and not node.keywords:
+            return self.call(node, statement)
+
+        raise UnsupportedNode(type(node).__name__)
+
+    def binary(self, node: pyast.BinOp) -> tuple[str, str]:
+        left, left_kind = self.translate(node.left)
+        if isinstance(node.op, pyast.Pow):
+            exponent = node.right
+            if not (
+                isinstance(exponent, pyast.Constant)
+                and type(exponent.value) is int
+                and exponent.value >= 0
+            ):
+                raise UnsupportedNode("non-constant exponent")
+            if left_kind == "INTEGER":
+                return f"pc_ipow({left}, {exponent.value}LL)", "INTEGER"
+            if left_kind == "REAL":
+                return f"pc_rpow({left}, {exponent.value}LL)", "REAL"
+            raise UnsupportedNode("arithmetic on BOOLEAN")
+        right, right_kind = self.translate(node.right)
+        if "BOOLEAN" in (left_kind, right_kind):
+            raise UnsupportedNode("arithmetic on BOOLEAN")
+        if isinstance(node.op, pyast.Div):
+            if left_kind == right_kind == "INTEGER":
+                return f"pc_itruediv({left}, {right})", "REAL"
+            return f"pc_truediv({left}, {right})", "REAL"
+        if left_kind == right_kind == "INTEGER" and type(node.op) in self.integer_ops:
+            return f"{self.integer_ops[type(node.op)]}({left}, {right})", "INTEGER"
+        if type(node.op) in self.real_ops:
+            return f"({left} {self.real_ops[type(node.op)]} {right})", "REAL"
+        raise UnsupportedNode(type(node.op).__name__)
+
+    def compare(self, node: pyast.Compare) -> tuple[str, str]:
+        operands = [self.translate(node.left)] + [self.translate(item) for item in node.comparators]
+        kinds = {kind == "BOOLEAN" for _, kind in operands}
+        if len(kinds) != 1:
+            raise UnsupportedNode("comparison between BOOLEAN and number")
+        if len(node.ops) > 1 and any(
+            isinstance(sub, pyast.Call) for item in node.comparators[:-1] for sub in pyast.walk(item)
+        ):
+            # 比较链中间的操作数会被求值两次，只允许没有调用的表达式
+            raise UnsupportedNode("chained comparison with call")
+        parts = []
+        for op, (left, _), (right, _) in zip(node.ops, operands, operands[1:]):
+            if type(op) not in self.compare_ops:
+                raise UnsupportedNode(type(op).__name__)
+            parts.append(f"({left} {self.compare_ops[type(op)]} {right})")
+        return "(" + " && ".join(parts) + ")", "BOOLEAN"
+
+    def call(self, node: pyast.Call, statement: bool) -> tuple[str, str]:
+        name = node.func.id
+        args = [self.translate(arg) for arg in node.args]
+        if name in ("DIV", "MOD") and name not in self.functions:
+            if len(args) != 2 or any(kind != "INTEGER" for _, kind in args):
+                raise UnsupportedNode(f"{name} on non-INTEGER")
+            helper = "pc_floordiv" if name == "DIV" else "pc_mod"
+            return f"{helper}({args[0][0]}, {args[1][0]})", "INTEGER"
+        if name not in self.functions:
+            raise UnsupportedNode(f"call to {name}")
+        params, returns = self.functions[name]
+        if [kind for _, kind in args] != params:
+            raise UnsupportedNode(f"argument types of {name}")
+        if returns is None and not statement:
+            raise UnsupportedNode(f"procedure {name} used as a value")
+        return f"f_{name}({', '.join(value for value, _ in args)})", returns or "INTEGER"
+
+
+def indent(code: str, level: int = 1) -> str:
+    return "\n".join(("    " * level + line) if line else line for line in code.split("\n"))
+
+
+def source_to_c(code: str) -> str:
+    """伪代码 -> C 代码，不支持时抛出 UnsupportedNode"""
+    program = Parser(Tokenizer(code).tokenize()).parse_program()
+    return CBackend().ast_to_c(program)
+
+
+def build(c_code: str, cache_dir: Optional[str] = None, cc: Optional[str] = None) -> str:
+    """编译 C 代码并返回可执行文件路径；以源码与编译命令的哈希为键缓存"""
+    compiler = shlex.split(cc or os.environ.get("CC") or "cc")
+    cache_dir = cache_dir or DEFAULT_CACHE_DIR
+    key = hashlib.sha256(
+        "\0".join(compiler + CFLAGS + [c_code]).encode("utf-8")
+    ).hexdigest()
+    binary = os.path.join(cache_dir, key)
+    if os.path.exists(binary):
+        return binary
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(binary + ".c", "w", encoding="utf-8") as fp:
+        fp.write(c_code)
+    # 先编译到临时文件再改名，并发构建同一程序时不会读到半成品
+    fd, temp_path = tempfile.mkstemp(dir=cache_dir, prefix=key + ".")
+    os.close(fd)
+    try:
+        result = subprocess.run(
+            compiler + CFLAGS + ["-o", temp_path, binary + ".c", "-lm"],
+            capture_output=True,
+            text=True,
+        )
+    except OSError as error:
+        os.unlink(temp_path)
+        raise CompileError(f"cannot run {compiler[0]}: {error}") from error
+    if result.returncode != 0:
+        os.unlink(temp_path)
+        raise CompileError(result.stderr)
+    os.replace(temp_path, binary)
+    return binary
+
+
+def run(
+    code: str,
+    stdout: Optional[TextIO] = None,
+    cache_dir: Optional[str] = None,
+    cc: Optional[str] = None,
+    stdin: Optional[str] = None,
+    stack_size: Optional[int] = None,
+    recursion_limit: Optional[int] = None,
+    tail_calls: bool = False,
+) -> str:
+    """优先用 C 后端运行伪代码程序，返回实际使用的后端（"c" 或 "python"）
+
+    读输入（INPUT）的程序不会编译成 C，stdin 与其余参数只用于退回 Python 执行。
+    """
+    from runner import execute
+
+    stdout = stdout or sys.stdout
+    try:
+        binary = build(source_to_c(code), cache_dir, cc)
+    except (UnsupportedNode, CompileError):
+        binary = None
+    if binary is not None:
+        # 输出先完整收集：中途需要退回 Python 时不能留下 C 版本的部分输出
+        result = subprocess.run([binary], capture_output=True, stdin=subprocess.DEVNULL)
+        if result.returncode == 0:
+            stdout.write(result.stdout.decode("utf-8"))
+            return "c"
+    python_code = Pseudocode(tail_calls=tail_calls).ast_to_python(Parser(Tokenizer(code).tokenize()).parse_program())
+    execute(python_code, stdin, stdout, stack_size, recursion_limit)
+    return "python"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="用 C 后端编译并运行数值伪代码程序")
+    arg_parser.add_argument("file")
+    arg_parser.add_argument("--emit-c", action="store_true", help="只输出生成的 C 代码")
+    arg_parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    arg_parser.add_argument("--cc", help="C 编译器命令（默认取 $CC 或 cc）")
+    args = arg_parser.parse_args()
+
+    with open(args.file, "r", encoding="utf8") as fp:
+        source = fp.read()
+    if args.emit_c:
+        try:
+            print(source_to_c(source))
+        except UnsupportedNode as error:
+            print(f"unsupported: {error}", file=sys.stderr)
+            sys.exit(1)
+    else:
+        backend = run(source, cache_dir=args.cache_dir, cc=args.cc)
+        print(f"backend: {backend}", file=sys.stderr)
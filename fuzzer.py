@@ -0,0 +1,539 @@
+"""寻找性能病态输入的语法模糊测试
+
+GrammarGenerator 按 grammar.md 与 Parser 的产生式随机生成合法程序，并按
+随机的规模放大其中一种结构（深层嵌套、超长表达式、超长字符串、大量语句），
+mutate() 再对 Token 做少量增删换位得到“接近合法”的程序。
+
+每个输入在常驻的工作进程中依次经过 Tokenizer、Parser 与 Pseudocode：
+超过时间预算（杀掉并重启工作进程）、超过内存预算（按 ru_maxrss 的增量）
+或抛出 SyntaxError 以外的异常，都视为失败。失败的输入先按行、再按词
+用 ddmin 最小化（要求失败类型不变），保存到回归语料目录。
+
+    python fuzzer.py --iterations 500 --seed 1
+    python fuzzer.py --replay fuzz_corpus        # 重跑语料，仍然失败的退出码为 1
+"""
+from __future__ import annotations
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import selectors
+import subprocess
+import sys
+import time
+import traceback
+from typing import Callable, Optional
+
+DEFAULT_TIMEOUT = 5.0
+DEFAULT_MEMORY_MB = 512
+DEFAULT_CORPUS = "fuzz_corpus"
+# 最小化一个输入最多运行的次数
+MAX_MINIMIZE_RUNS = 300
+# 超时的输入每次重跑都要等满时间预算，最小化再受总耗时限制
+MAX_MINIMIZE_SECONDS = 120.0
+
+
+class GrammarGenerator:
+    """按语法随机生成程序，同一种子总是生成相同的程序"""
+
+    comparisons = ("=", "<>", "<", ">", "<=", ">=")
+    stress_kinds = ("nesting", "expression", "string", "statements", "procedures", "case")
+
+    def __init__(self, seed: int = 0, max_scale: int = 4000) -> None:
+        self.random = random.Random(seed)
+        self.max_scale = max_scale
+
+    # ---- 表达式 ----
+
+    def scale(self) -> int:
+        """对数均匀分布的规模：多数很小，偶尔接近 max_scale"""
+        return int(2 ** self.random.uniform(0, math.log2(max(2, self.max_scale))))
+
+    def number(self) -> str:
+        if self.random.random() < 0.2:
+            return f"{self.random.randint(0, 999)}.{self.random.randint(0, 99)}"
+        return str(self.random.randint(0, 999))
+
+    def string(self, length: Optional[int] = None) -> str:
+        if length is None:
+            length = self.random.randint(0, 12)
+        alphabet = "abcdefghij XYZ0123456789"
+        return '"' + "".join(self.random.choice(alphabet) for _ in range(length)) + '"'
+
+    def numeric(self, depth: int) -> str:
+        """INTEGER 表达式"""
+        roll = self.random.random()
+        if depth <= 0 or roll < 0.35:
+            return self.random.choice(self.integers + [self.number().split(".")[0]])
+        if roll < 0.65:
+            op = self.random.choice(("+", "-", "*"))
+            return f"{self.numeric(depth - 1)} {op} {self.numeric(depth - 1)}"
+        if roll < 0.75:
+            return f"({self.numeric(depth - 1)})"
+        if roll < 0.85:
+            func = self.random.choice(("DIV", "MOD"))
+            return f"{func}({self.numeric(depth - 1)}, {self.random.randint(1, 9)})"
+        if roll < 0.9:
+            return f"LENGTH({self.text(depth - 1)})"
+        if roll < 0.95 and self.arrays:
+            return f"{self.random.choice(self.arrays)}[{self.random.randint(1, 5)}]"
+        return f"(-{self.random.choice(self.integers)})"
+
+    def text(self, depth: int) -> str:
+        """STRING 表达式"""
+        roll = self.random.random()
+        if depth <= 0 or roll < 0.4:
+            return self.random.choice(self.strings + [self.string()])
+        if roll < 0.7:
+            return f"{self.text(depth - 1)} + {self.text(depth - 1)}"
+        if roll < 0.85:
+            return f"{self.random.choice(('UCASE', 'LCASE'))}({self.text(depth - 1)})"
+        return f"SUBSTRING({self.text(depth - 1)}, 1, {self.random.randint(1, 5)})"
+
+    def condition(self, depth: int) -> str:
+        roll = self.random.random()
+        if depth <= 0 or roll < 0.6:
+            op = self.random.choice(self.comparisons)
+            return f"{self.numeric(1)} {op} {self.numeric(1)}"
+        joiner = self.random.choice(("AND", "OR"))
+        return f"{self.condition(depth - 1)} {joiner} {self.condition(depth - 1)}"
+
+    # ---- 语句 ----
+
+    def statement(self, depth: int, pad: str) -> list[str]:
+        roll = self.random.random()
+        inner = pad + "    "
+        if depth <= 0 or roll < 0.35:
+            return [pad + self.simple_statement()]
+        if roll < 0.5:
+            lines = [f"{pad}IF {self.condition(2)} THEN"] + self.block(depth - 1, inner)
+            if self.random.random() < 0.5:
+                lines += [f"{pad}ELSE"] + self.block(depth - 1, inner)
+            return lines + [f"{pad}ENDIF"]
+        if roll < 0.62:
+            return [f"{pad}WHILE {self.condition(1)} DO"] + self.block(depth - 1, inner) + [f"{pad}ENDWHILE"]
+        if roll < 0.72:
+            return [f"{pad}REPEAT"] + self.block(depth - 1, inner) + [f"{pad}UNTIL {self.condition(1)}"]
+        if roll < 0.86:
+            variable = self.random.choice(self.integers)
+            step = f" STEP {self.random.randint(1, 3)}" if self.random.random() < 0.3 else ""
+            return (
+                [f"{pad}FOR {variable} ← 1 TO {self.numeric(1)}{step}"]
+                + self.block(depth - 1, inner)
+                + [f"{pad}NEXT {variable}"]
+            )
+        return self.case(self.random.randint(1, 4), pad)
+
+    def simple_statement(self) -> str:
+        roll = self.random.random()
+        if roll < 0.4:
+            return f"{self.random.choice(self.integers)} ← {self.numeric(3)}"
+        if roll < 0.55:
+            return f"{self.random.choice(self.strings)} ← {self.text(2)}"
+        if roll < 0.7:
+            items = [self.numeric(1) if self.random.random() < 0.5 else self.text(1) for _ in range(self.random.randint(1, 3))]
+            return "OUTPUT " + ", ".join(items)
+        if roll < 0.78 and self.arrays:
+            return f"{self.random.choice(self.arrays)}[{self.random.randint(1, 5)}] ← {self.numeric(2)}"
+        if roll < 0.86 and self.procedures:
+            return f"CALL {self.random.choice(self.procedures)}({self.numeric(1)})"
+        if roll < 0.92:
+            return f"INPUT {self.random.choice(self.integers + self.strings)}"
+        return f"{self.random.choice(self.booleans)} ← {self.condition(1)}"
+
+    def block(self, depth: int, pad: str) -> list[str]:
+        lines = []
+        for _ in range(self.random.randint(1, 3)):
+            lines += self.statement(depth, pad)
+        return lines
+
+    def case(self, branches: int, pad: str) -> list[str]:
+        lines = [f"{pad}CASE OF {self.random.choice(self.integers)}"]
+        for label in self.random.sample(range(branches * 3), branches):
+            lines.append(f"{pad}    {label} : {self.simple_statement()}")
+        if self.random.random() < 0.5:
+            lines += [f"{pad}    OTHERWISE", f"{pad}        {self.simple_statement()}"]
+        return lines + [f"{pad}ENDCASE"]
+
+    def procedure(self, index: int) -> list[str]:
+        name = f"Proc{index}"
+        lines = [f"PROCEDURE {name}(N : INTEGER)"]
+        saved = self.integers
+        self.integers = saved + ["N"]
+        lines += self.block(2, "    ")
+        self.integers = saved
+        self.procedures.append(name)
+        return lines + ["ENDPROCEDURE"]
+
+    def function(self, index: int) -> list[str]:
+        name = f"Func{index}"
+        saved = self.integers
+        self.integers = saved + ["N"]
+        lines = [f"FUNCTION {name}(N : INTEGER) RETURNS INTEGER"] + self.block(1, "    ")
+        lines.append(f"    RETURN {self.numeric(2)}")
+        self.integers = saved
+        return lines + ["ENDFUNCTION"]
+
+    # ---- 程序 ----
+
+    def program(self) -> str:
+        self.integers = [f"I{i}" for i in range(self.random.randint(1, 4))]
+        self.strings = [f"S{i}" for i in range(self.random.randint(1, 3))]
+        self.booleans = ["Flag"]
+        self.arrays = ["Arr"] if self.random.random() < 0.5 else []
+        self.procedures: list[str] = []
+        lines = [f"DECLARE {name} : INTEGER" for name in self.integers]
+        lines += [f"DECLARE {name} : STRING" for name in self.strings]
+        lines += ["DECLARE Flag : BOOLEAN", "CONSTANT Limit ← 10"]
+        if self.arrays:
+            lines.append("DECLARE Arr : ARRAY[1:10] OF INTEGER")
+        for i in range(self.random.randint(0, 2)):
+            lines += self.procedure(i)
+        for i in range(self.random.randint(0, 1)):
+            lines += self.function(i)
+        for _ in range(self.random.randint(1, 8)):
+            lines += self.statement(3, "")
+        if self.random.random() < 0.5:
+            lines += self.stress(self.random.choice(self.stress_kinds), self.scale())
+        return "\n".join(lines)
+
+    def stress(self, kind: str, size: int) -> list[str]:
+        """把一种结构放大到 size 的规模"""
+        variable = self.integers[0]
+        if kind == "nesting":
+            lines, closers = [], []
+            for depth in range(size):
+                pad = " " * min(depth, 40)
+                if depth % 3 == 0:
+                    lines.append(f"{pad}IF {variable} < {depth} THEN")
+                    closers.append(f"{pad}ENDIF")
+                elif depth % 3 == 1:
+                    lines.append(f"{pad}WHILE {variable} > {depth} DO")
+                    closers.append(f"{pad}ENDWHILE")
+                else:
+                    lines.append(f"{pad}REPEAT")
+                    closers.append(f"{pad}UNTIL {variable} = {depth}")
+            return lines + [f"{variable} ← 1"] + list(reversed(closers))
+        if kind == "expression":
+            terms = [self.numeric(0)]
+            for _ in range(size):
+                terms += [self.random.choice(("+", "-", "*")), self.numeric(0)]
+            if self.random.random() < 0.3:
+                # 括号嵌套的表达式
+                return [f"{variable} ← " + "(" * size + "1" + " + 1)" * size]
+            return [f"{variable} ← " + " ".join(terms)]
+        if kind == "string":
+            return [f"{self.strings[0]} ← {self.string(size * 100)}", f"OUTPUT {self.strings[0]}"]
+        if kind == "statements":
+            return [f"{variable} ← {variable} + {i % 7}" for i in range(size * 4)]
+        if kind == "procedures":
+            lines = []
+            for i in range(size):
+                lines += self.procedure(100 + i)
+            return lines
+        return self.case(size, "")
+
+    def mutate(self, code: str) -> str:
+        """对 Token 做 1 到 3 处增删、复制、换位，得到接近合法的程序"""
+        from pseudocode import Tokenizer
+
+        tokens = [[token.line, str(token.value)] for token in Tokenizer(code).tokenize()]
+        if not tokens:
+            return code
+        for _ in range(self.random.randint(1, 3)):
+            i = self.random.randrange(len(tokens))
+            roll = self.random.random()
+            if roll < 0.4 and len(tokens) > 1:
+                del tokens[i]
+            elif roll < 0.7:
+                tokens.insert(i, list(self.random.choice(tokens)))
+            elif i + 1 < len(tokens):
+                tokens[i][1], tokens[i + 1][1] = tokens[i + 1][1], tokens[i][1]
+        lines: dict[int, list[str]] = {}
+        for line, value in tokens:
+            lines.setdefault(line, []).append(value)
+        return "\n".join(" ".join(lines[line]) for line in sorted(lines))
+
+
+# ---- 工作进程 ----
+
+def run_pipeline(code: str) -> dict:
+    """在当前进程中完整转换一次：{"status", "stage", "error", "seconds"}"""
+    from pseudocode import Tokenizer, Parser, Pseudocode
+
+    started = time.perf_counter()
+    stage = "tokenize"
+    try:
+        tokens = Tokenizer(code).tokenize()
+        stage = "parse"
+        ast = Parser(tokens).parse_program()
+        stage = "codegen"
+        Pseudocode().ast_to_python(ast)
+        status, error = "ok", None
+    except SyntaxError as exc:
+        status, error = "rejected", f"SyntaxError: {exc}"
+    except MemoryError:
+        status, error = "memory", "MemoryError"
+    except Exception as exc:
+        status = "crash"
+        error = "".join(traceback.format_exception_only(type(exc), exc)).strip()
+    return {
+        "status": status,
+        "stage": stage,
+        "error": error,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def worker(memory_mb: int) -> None:
+    """常驻工作进程：每行读入一个 JSON 请求，输出一行 JSON 结果"""
+    import resource
+
+    statm = "/proc/self/statm"
+    if memory_mb and os.path.exists(statm):
+        # 地址空间硬上限：当前用量 + 两倍预算，防止失控的输入拖垮整台机器
+        with open(statm) as fp:
+            current = int(fp.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+        limit = current + 2 * memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    import pseudocode  # noqa: F401  预先导入，使基线内存包含模块本身
+
+    def maxrss() -> int:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    print(json.dumps({"ready": True, "maxrss": maxrss()}), flush=True)
+    for line in sys.stdin:
+        result = run_pipeline(json.loads(line)["code"])
+        result["maxrss"] = maxrss()
+        print(json.dumps(result), flush=True)
+
+
+class Sandbox:
+    """在常驻工作进程中运行输入；超时或崩溃后重启工作进程"""
+
+    def __init__(self, timeout: float = DEFAULT_TIMEOUT, memory_mb: int = DEFAULT_MEMORY_MB) -> None:
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.process: Optional[subprocess.Popen] = None
+        self.baseline = 0
+        self.runs = 0
+
+    def start(self) -> None:
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--worker", "--memory-mb", str(self.memory_mb)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        self.baseline = json.loads(self.process.stdout.readline())["maxrss"]
+
+    def stop(self) -> None:
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+
+    def __enter__(self) -> Sandbox:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def run(self, code: str) -> dict:
+        if self.process is None:
+            self.start()
+        self.runs += 1
+        process = self.process
+        try:
+            process.stdin.write(json.dumps({"code": code}) + "\n")
+            process.stdin.flush()
+        except BrokenPipeError:
+            self.stop()
+            return {"status": "crash", "stage": None, "error": "worker died", "seconds": 0.0}
+        with selectors.DefaultSelector() as selector:
+            selector.register(process.stdout, selectors.EVENT_READ)
+            ready = selector.select(self.timeout)
+        if not ready:
+            self.stop()
+            return {"status": "timeout", "stage": None, "error": f"> {self.timeout}s", "seconds": self.timeout}
+        line = process.stdout.readline()
+        if not line:
+            code = process.wait()
+            self.process = None
+            return {"status": "crash", "stage": None, "error": f"worker exited with {code}", "seconds": 0.0}
+        result = json.loads(line)
+        if result["maxrss"] - self.baseline > self.memory_mb * 1024 * 1024:
+            # ru_maxrss 只增不减，重启后才能测量下一个输入
+            self.stop()
+            if result["status"] in ("ok", "rejected"):
+                result["status"] = "memory"
+                result["error"] = f"peak RSS {(result['maxrss'] - self.baseline) >> 20} MiB"
+        return result
+
+
+def is_failure(result: dict) -> bool:
+    return result["status"] not in ("ok", "rejected")
+
+
+def signature(result: dict) -> tuple:
+    """最小化时要求保持不变的失败特征：状态与异常类型"""
+    error = result.get("error") or ""
+    return result["status"], error.split(":")[0].split("\n")[-1]
+
+
+# ---- 最小化 ----
+
+def ddmin(
+    items: list[str],
+    test: Callable[[list[str]], bool],
+    should_stop: Callable[[], bool] = lambda: False,
+) -> list[str]:
+    """Zeller 的 delta debugging：返回仍满足 test 的 1-最小子序列
+
+    每次调用 test 之前先检查 should_stop，为真时立即返回当前结果。
+    """
+    granularity = 2
+    while len(items) >= 2:
+        size = -(-len(items) // granularity)
+        subsets = [items[i:i + size] for i in range(0, len(items), size)]
+        for i, subset in enumerate(subsets):
+            if should_stop():
+                return items
+            if test(subset):
+                items, granularity = subset, 2
+                break
+            if len(subsets) <= 2:
+                # 两块时补集就是另一块，下一轮会直接测试它
+                continue
+            if should_stop():
+                return items
+            complement = [item for j, other in enumerate(subsets) if j != i for item in other]
+            if test(complement):
+                items, granularity = complement, max(granularity - 1, 2)
+                break
+        else:
+            if granularity >= len(items):
+                break
+            granularity = min(len(items), granularity * 2)
+    return items
+
+
+def minimize(
+    code: str,
+    sandbox: Sandbox,
+    expected: tuple,
+    max_runs: int = MAX_MINIMIZE_RUNS,
+    max_seconds: float = MAX_MINIMIZE_SECONDS,
+) -> str:
+    """先按行、再按词缩小输入，保持失败特征不变；超出次数或时间预算时返回当前结果"""
+    runs = [0]
+    deadline = time.monotonic() + max_seconds
+
+    def exhausted() -> bool:
+        return runs[0] >= max_runs or time.monotonic() > deadline
+
+    def reproduces(text: str) -> bool:
+        runs[0] += 1
+        return signature(sandbox.run(text)) == expected
+
+    lines = ddmin(code.split("\n"), lambda part: reproduces("\n".join(part)), exhausted)
+    code = "\n".join(lines)
+    if exhausted():
+        return code
+    words = re.findall(r"\S+\s*", code)
+    words = ddmin(words, lambda part: reproduces("".join(part)), exhausted)
+    return "".join(words)
+
+
+# ---- 语料 ----
+
+def save_case(corpus: str, code: str, result: dict) -> str:
+    os.makedirs(corpus, exist_ok=True)
+    digest = hashlib.sha1(code.encode("utf-8")).hexdigest()[:12]
+    path = os.path.join(corpus, f"{result['status']}-{digest}.txt")
+    error = (result.get("error") or "").split("\n")[-1]
+    with open(path, "w", encoding="utf-8") as fp:
+        fp.write(f"// fuzz: {result['status']} in {result.get('stage')}: {error}\n{code}\n")
+    return path
+
+
+def fuzz(
+    iterations: int,
+    seed: int,
+    sandbox: Sandbox,
+    corpus: str,
+    near_valid: float = 0.3,
+    max_scale: int = 4000,
+    minimize_seconds: float = MAX_MINIMIZE_SECONDS,
+    log: Callable[[str], None] = print,
+) -> list[str]:
+    """生成并运行 iterations 个输入，返回保存到语料中的文件"""
+    generator = GrammarGenerator(seed, max_scale)
+    counts: dict[str, int] = {}
+    saved = []
+    for i in range(iterations):
+        code = generator.program()
+        if generator.random.random() < near_valid:
+            code = generator.mutate(code)
+        result = sandbox.run(code)
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+        if is_failure(result):
+            expected = signature(result)
+            log(f"[{i}] {result['status']} in {result.get('stage')}: {expected[1]} ({len(code)} chars), minimizing")
+            small = minimize(code, sandbox, expected, max_seconds=minimize_seconds)
+            path = save_case(corpus, small, result)
+            log(f"[{i}] saved {path} ({len(small)} chars)")
+            saved.append(path)
+    log(" ".join(f"{status}={count}" for status, count in sorted(counts.items())))
+    return saved
+
+
+def replay(corpus: str, sandbox: Sandbox, log: Callable[[str], None] = print) -> int:
+    """重跑语料中的输入，返回仍然失败的个数"""
+    failing = 0
+    for name in sorted(os.listdir(corpus)):
+        if not name.endswith(".txt"):
+            continue
+        with open(os.path.join(corpus, name), "r", encoding="utf-8") as fp:
+            result = sandbox.run(fp.read())
+        if is_failure(result):
+            failing += 1
+        log(f"{result['status']:>8}  {result['seconds']:.3f}s  {name}")
+    return failing
+
+
+if __name__ == "__main__":
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="寻找使转换器超时、超内存或崩溃的输入")
+    arg_parser.add_argument("--iterations", type=int, default=200)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="每个输入的时间预算（秒）")
+    arg_parser.add_argument("--memory-mb", type=int, default=DEFAULT_MEMORY_MB, help="每个输入的内存预算")
+    arg_parser.add_argument("--max-scale", type=int, default=4000, help="放大结构的最大规模")
+    arg_parser.add_argument("--near-valid", type=float, default=0.3, help="变异为接近合法程序的比例")
+    arg_parser.add_argument(
+        "--minimize-seconds", type=float, default=MAX_MINIMIZE_SECONDS, help="最小化一个输入的时间预算"
+    )
+    arg_parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    arg_parser.add_argument("--replay", metavar="DIR", help="重跑语料目录中的输入")
+    arg_parser.add_argument("--emit", action="store_true", help="只输出一个生成的程序")
+    arg_parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+
+    if args.worker:
+        worker(args.memory_mb)
+    elif args.emit:
+        print(GrammarGenerator(args.seed, args.max_scale).program())
+    else:
+        with Sandbox(args.timeout, args.memory_mb) as sandbox:
+            if args.replay:
+                sys.exit(1 if replay(args.replay, sandbox) else 0)
+            fuzz(
+                args.iterations, args.seed, sandbox, args.corpus,
+                args.near_valid, args.max_scale, args.minimize_seconds,
+            )
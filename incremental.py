@@ -0,0 +1,321 @@
+"""编辑器用的增量文档模型
+
+Document 按行保存 Token，按顶层语句保存语法树（每条顶层语句是一个块，
+记录它覆盖的行）。每次编辑只重新词法分析改动的行，并从受影响的块
+（以及它前面的一个块，因为语句的结束位置取决于后面的 Token）开始
+重新解析，一旦解析位置重新对齐到某个未改动块的开头，就复用其后的所有块。
+
+    doc = Document(source)
+    doc.update(new_source)      # 编辑器每次发送完整源码
+    doc.diagnostics             # [{"line", "column", "message"}]
+    doc.program()               # 与 Parser(Tokenizer(source).tokenize()).parse_program() 相同
+
+    python incremental.py tests/test15.txt    # 逐字符重新输入文件并统计每次更新的耗时
+"""
+from __future__ import annotations
+from typing import Any, Optional
+
+from analysis import walk
+from pseudocode import Tokenizer, Token, Parser
+
+
+class Block:
+    """一条顶层语句：覆盖的 Token 范围 (行, 行内序号) 与语法树"""
+
+    def __init__(
+        self,
+        start: tuple[int, int],
+        end: tuple[int, int],
+        ast: Optional[dict],
+        declared: dict[str, str],
+        has_input: bool,
+        error: Optional[dict] = None,
+    ) -> None:
+        self.start = start
+        self.end = end
+        self.ast = ast
+        # 语法树中的行号与当前行号之差，在 program() 时才修正
+        self.shift = 0
+        # 这条语句在全局作用域中声明的名字（INPUT 节点的 identifier_type 依赖它）
+        self.declared = declared
+        self.has_input = has_input
+        self.error = error
+
+    def moved(self, delta: int) -> None:
+        self.start = (self.start[0] + delta, self.start[1])
+        self.end = (self.end[0] + delta, self.end[1])
+        self.shift += delta
+
+
+class Document:
+    """按行增量维护 Token 与顶层语句的语法树"""
+
+    def __init__(self, source: str = "") -> None:
+        self.rebuild(source)
+
+    # ---- 全量构建 ----
+
+    def rebuild(self, source: str) -> None:
+        """全量词法分析与解析（首次构建，或增量更新无法处理时）"""
+        self.lines = source.split("\n")
+        self.full_rebuilds = getattr(self, "full_rebuilds", -1) + 1
+        self.line_tokens: list[list[Token]] = [[] for _ in self.lines]
+        self.blocks: list[Block] = []
+        self.diagnostics: list[dict] = []
+        try:
+            tokens = Tokenizer(source).tokenize()
+        except SyntaxError as error:
+            # 词法错误：没有可用的 Token，之后的每次更新都全量重做
+            self.lexed = False
+            self.diagnostics = [self.diagnostic(error, None, len(self.lines))]
+            return
+        self.lexed = True
+        for token in tokens:
+            # 跨行的 Token（多行字符串）无法按行维护
+            if "\n" in str(token.value):
+                self.lexed = False
+            self.line_tokens[token.line - 1].append(token)
+        self.reparse(0, (0, 0), None)
+
+    # ---- 增量更新 ----
+
+    def update(self, source: str) -> None:
+        """用新的完整源码更新文档，只处理与旧源码不同的那些行"""
+        lines = source.split("\n")
+        old = self.lines
+        first = 0
+        limit = min(len(lines), len(old))
+        while first < limit and lines[first] == old[first]:
+            first += 1
+        if first == len(lines) == len(old):
+            return
+        last_old, last_new = len(old) - 1, len(lines) - 1
+        while last_old >= first and last_new >= first and old[last_old] == lines[last_new]:
+            last_old -= 1
+            last_new -= 1
+        self.replace_lines(first, last_old + 1, lines[first:last_new + 1])
+
+    def edit(self, start_line: int, start_col: int, end_line: int, end_col: int, text: str) -> None:
+        """用 text 替换 (start_line, start_col) 到 (end_line, end_col) 之间的文本（行列从 1 开始）"""
+        prefix = self.lines[start_line - 1][:start_col - 1]
+        suffix = self.lines[end_line - 1][end_col - 1:]
+        self.replace_lines(start_line - 1, end_line, (prefix + text + suffix).split("\n"))
+
+    def replace_lines(self, first: int, stop: int, new_lines: list[str]) -> None:
+        """把第 first 到 stop - 1 行（从 0 开始）替换为 new_lines"""
+        if not self.lexed:
+            self.rebuild("\n".join(self.lines[:first] + new_lines + self.lines[stop:]))
+            return
+        new_tokens = []
+        for offset, text in enumerate(new_lines):
+            try:
+                tokens = Tokenizer(text).tokenize()
+            except SyntaxError:
+                # 单独一行无法词法分析（例如字符串跨行）时退回全量处理
+                self.rebuild("\n".join(self.lines[:first] + new_lines + self.lines[stop:]))
+                return
+            for token in tokens:
+                token.line = first + offset + 1
+            new_tokens.append(tokens)
+        delta = len(new_lines) - (stop - first)
+        self.lines[first:stop] = new_lines
+        self.line_tokens[first:stop] = new_tokens
+
+        # 与编辑范围重叠的块，以及它前面的一个块，需要重新解析
+        index = 0
+        while index < len(self.blocks) and self.blocks[index].end[0] < first:
+            index += 1
+        index = max(index - 1, 0)
+        # 前面有语法错误时从错误处重新解析：后面的编辑可能修复了它（例如补上 ENDIF）
+        for i, block in enumerate(self.blocks[:index]):
+            if block.error:
+                index = i
+                break
+        after = index
+        while after < len(self.blocks) and self.blocks[after].start[0] < stop:
+            after += 1
+        if delta:
+            for block in self.blocks[after:]:
+                block.moved(delta)
+        start = self.blocks[index].start if index < len(self.blocks) else (first, 0)
+        start = min(start, (first, 0))
+        self.reparse(index, start, after, replaced=self.blocks[index:after])
+
+    def reparse(
+        self,
+        index: int,
+        start: tuple[int, int],
+        after: Optional[int],
+        replaced: Optional[list[Block]] = None,
+    ) -> None:
+        """从 start 开始重新解析，替换 self.blocks[index:after]
+
+        after 之后的块是可以复用的候选：解析位置对齐到其中某块的开头时停止。
+        after 为 None 时解析到文档末尾。
+        """
+        before = self.blocks[:index]
+        candidates = self.blocks[after:] if after is not None else []
+        scope: dict[str, str] = {}
+        for block in before:
+            scope.update(block.declared)
+
+        # 窗口先包含一个候选块，解析越过窗口末尾时加倍扩大窗口
+        window = 1
+        while True:
+            truncated = window < len(candidates)
+            stop = candidates[window].start if truncated else None
+            tokens, positions = self.gather(start, stop)
+            boundaries = {
+                block.start: i for i, block in enumerate(candidates[:window + 1])
+            }
+            parsed, resync, overflow = self.parse_window(tokens, positions, scope, boundaries, truncated)
+            if not overflow:
+                break
+            window *= 2
+
+        reused = candidates[resync:] if resync is not None else []
+        if replaced is not None:
+            new_declared = [block.declared for block in parsed]
+            old_declared = [block.declared for block in replaced + candidates[:resync or 0]]
+            if new_declared != old_declared:
+                self.refresh_inputs(before + parsed, reused)
+        self.blocks = before + parsed + reused
+        self.diagnostics = [block.error for block in self.blocks if block.error]
+
+    def gather(
+        self, start: tuple[int, int], stop: Optional[tuple[int, int]]
+    ) -> tuple[list[Token], list[tuple[int, int]]]:
+        """[start, stop) 范围内的 Token（修正行号）及其 (行, 行内序号)"""
+        tokens, positions = [], []
+        line, column = start
+        end_line = stop[0] if stop else len(self.line_tokens) - 1
+        while line <= end_line:
+            line_tokens = self.line_tokens[line]
+            last = stop[1] if stop and line == stop[0] else len(line_tokens)
+            for i in range(column, last):
+                token = line_tokens[i]
+                token.line = line + 1
+                tokens.append(token)
+                positions.append((line, i))
+            line += 1
+            column = 0
+        return tokens, positions
+
+    def parse_window(
+        self,
+        tokens: list[Token],
+        positions: list[tuple[int, int]],
+        scope: dict[str, str],
+        boundaries: dict[tuple[int, int], int],
+        truncated: bool,
+    ) -> tuple[list[Block], Optional[int], bool]:
+        """逐条解析顶层语句，返回 (新块, 对齐到的候选块序号, 是否需要扩大窗口)"""
+        parser = Parser(tokens)
+        parser.scope_stack[0].update(scope)
+        blocks: list[Block] = []
+        while parser.current_token:
+            position = positions[parser.pos]
+            if position in boundaries:
+                return blocks, boundaries[position], False
+            declared_before = dict(parser.scope_stack[0])
+            try:
+                stmt = parser.parse_statement()
+            except Exception as error:
+                if truncated and parser.pos >= len(tokens) - 2:
+                    return blocks, None, True
+                # 错误块覆盖到窗口末尾，之后的候选块原样保留
+                blocks.append(
+                    Block(position, positions[-1], None, {}, False, self.diagnostic(error, parser.current_token, None))
+                )
+                return blocks, (len(boundaries) - 1 if truncated else None), False
+            if truncated and parser.current_token is None:
+                # 语句一直延伸到窗口末尾，可能还没有结束
+                return blocks, None, True
+            declared = {
+                name: kind
+                for name, kind in parser.scope_stack[0].items()
+                if declared_before.get(name) != kind
+            }
+            has_input = any(node["type"] == "InputStatement" for node in walk(stmt)) if stmt else False
+            blocks.append(Block(position, positions[parser.pos - 1], stmt or None, declared, has_input))
+        return blocks, None, False
+
+    def refresh_inputs(self, prefix: list[Block], blocks: list[Block]) -> None:
+        """声明改变后，重新解析后面含 INPUT 的块（INPUT 记录了变量的声明类型）"""
+        scope: dict[str, str] = {}
+        for block in prefix:
+            scope.update(block.declared)
+        for i, block in enumerate(blocks):
+            if block.has_input and block.ast is not None:
+                stop = blocks[i + 1].start if i + 1 < len(blocks) else None
+                tokens, positions = self.gather(block.start, stop)
+                parser = Parser(tokens)
+                parser.scope_stack[0].update(scope)
+                block.ast = parser.parse_statement()
+                block.shift = 0
+            scope.update(block.declared)
+
+    @staticmethod
+    def diagnostic(error: Exception, token: Optional[Token], line: Optional[int]) -> dict:
+        return {
+            "line": token.line if token else line,
+            "column": token.start if token else None,
+            "message": str(error),
+        }
+
+    # ---- 结果 ----
+
+    def program(self) -> dict:
+        """当前源码的语法树；有语法错误时抛出 SyntaxError"""
+        if self.diagnostics:
+            first = self.diagnostics[0]
+            raise SyntaxError(f"{first['message']} (line {first['line']})")
+        statements = []
+        for block in self.blocks:
+            if block.ast is None:
+                continue
+            if block.shift:
+                for node in walk(block.ast):
+                    if "line" in node:
+                        node["line"] += block.shift
+                block.shift = 0
+            statements.append(block.ast)
+        program: dict[str, Any] = {"type": "Program", "statements": statements}
+        if self.blocks:
+            program["line"] = self.blocks[0].start[0] + 1
+            program["column"] = self.line_tokens[self.blocks[0].start[0]][self.blocks[0].start[1]].start
+        return program
+
+    @property
+    def source(self) -> str:
+        return "\n".join(self.lines)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    arg_parser = argparse.ArgumentParser(description="模拟逐字符输入，统计增量更新耗时")
+    arg_parser.add_argument("file")
+    arg_parser.add_argument("--line", type=int, help="在该行末尾逐字符输入（默认中间一行）")
+    args = arg_parser.parse_args()
+
+    with open(args.file, "r", encoding="utf8") as fp:
+        text = fp.read()
+    lines = text.split("\n")
+    target = (args.line or len(lines) // 2) - 1
+    started = time.perf_counter()
+    document = Document(text)
+    print(f"initial build: {(time.perf_counter() - started) * 1000:.2f} ms, {len(lines)} lines")
+    typed = "    // incremental"
+    timings = []
+    for i in range(1, len(typed) + 1):
+        edited = lines[:target] + [lines[target] + typed[:i]] + lines[target + 1:]
+        started = time.perf_counter()
+        document.update("\n".join(edited))
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    print(
+        f"{len(timings)} updates: median {timings[len(timings) // 2] * 1000:.3f} ms, "
+        f"max {timings[-1] * 1000:.3f} ms, full rebuilds {document.full_rebuilds}"
+    )
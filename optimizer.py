@@ -0,0 +1,853 @@
+"""语法树变换
+
+这些变换在代码生成之前就地修改语句节点（表达式节点不会被修改，而是整体替换），
+并只引入 Pseudocode.ast_to_python 能识别的节点类型。由 Pseudocode 的选项启用。
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Callable, Optional
+
+from analysis import (
+    BUILTIN_PURE_FUNCTIONS,
+    DECLARATION_TYPES,
+    LOOP_TYPES,
+    assignment,
+    declared_types,
+    names_read_outside_loops,
+    pure_functions,
+    read_names,
+    target_name,
+    walk,
+    written_names,
+)
+
+# 语句中直接包含的表达式字段（不含嵌套语句块）
+EXPRESSION_FIELDS = {
+    "ExpressionStatement": ("expression",),
+    "ReturnStatement": ("expression",),
+    "IfStatement": ("condition",),
+    "WhileLoop": ("condition",),
+    "RepeatLoop": ("condition",),
+    "ForLoop": ("start", "end", "step"),
+    "CaseStatement": ("expression",),
+    "ArrayReduction": ("array", "target", "value", "start", "end"),
+    "CountedLoop": ("stop",),
+}
+EXPRESSION_LIST_FIELDS = {
+    "OutputStatement": "expressions",
+    "ProcedureCall": "arguments",
+    "TailCall": "arguments",
+    "StringBuilderAppend": "expressions",
+}
+# 可以外提的内置函数：没有副作用，参数不变时结果不变
+HOISTABLE_FUNCTIONS = {"LENGTH", "UCASE", "LCASE", "SUBSTRING"}
+
+
+def eliminate_tail_calls(program: dict) -> set[str]:
+    """把 PROCEDURE / FUNCTION 中对自身的尾调用改写成循环，返回被改写的名称
+
+    尾调用指不在循环内的 RETURN f(...)，以及处于过程末尾（可经由 IF / CASE
+    分支）的 CALL f(...)。改写后函数体包在 while True 中，尾调用变成
+    TailCall 节点：同时给参数赋新值再 continue。
+    """
+    rewritten = set()
+    for stmt in program["statements"]:
+        if stmt.get("type") not in DECLARATION_TYPES:
+            continue
+        params = [param["identifier"] for param in stmt["parameters"]]
+        if _rewrite_tail_calls(stmt["body"], stmt["name"], params, True):
+            stmt["tail_loop"] = True
+            rewritten.add(stmt["name"])
+    return rewritten
+
+
+def _tail_call(stmt: dict, name: str, params: list[str], tail: bool) -> bool:
+    if stmt.get("type") == "ReturnStatement":
+        call = stmt["expression"]
+    elif stmt.get("type") == "ProcedureCall" and tail:
+        call = stmt
+    else:
+        return False
+    return (
+        call.get("type") in ("FunctionCall", "ProcedureCall")
+        and call["function"] == name
+        and len(call["arguments"]) == len(params)
+    )
+
+
+def _rewrite_tail_calls(block: list[dict], name: str, params: list[str], tail: bool) -> bool:
+    found = False
+    for i, stmt in enumerate(block):
+        is_tail = tail and i == len(block) - 1
+        stmt_type = stmt.get("type")
+        if _tail_call(stmt, name, params, is_tail):
+            call = stmt["expression"] if stmt_type == "ReturnStatement" else stmt
+            block[i] = {
+                "type": "TailCall",
+                "parameters": params,
+                "arguments": call["arguments"],
+                **{key: stmt[key] for key in ("line", "column") if key in stmt},
+            }
+            found = True
+        elif stmt_type == "IfStatement":
+            found |= _rewrite_tail_calls(stmt["then_block"], name, params, is_tail)
+            found |= _rewrite_tail_calls(stmt["else_block"], name, params, is_tail)
+        elif stmt_type == "CaseStatement":
+            for case in stmt["cases"]:
+                body = [case["body"]]
+                found |= _rewrite_tail_calls(body, name, params, is_tail)
+                case["body"] = body[0]
+            if stmt.get("otherwise"):
+                found |= _rewrite_tail_calls(stmt["otherwise"], name, params, is_tail)
+        # 循环体内的 continue 会作用到内层循环，因此不改写循环中的调用
+    return found
+
+
+def child_blocks(stmt: dict) -> list[list[dict]]:
+    """语句直接包含的语句块"""
+    stmt_type = stmt.get("type")
+    if stmt_type == "IfStatement":
+        return [stmt["then_block"], stmt["else_block"]]
+    if stmt_type in LOOP_TYPES or stmt_type in DECLARATION_TYPES:
+        return [stmt["body"]]
+    if stmt_type == "CaseStatement":
+        blocks = [[case["body"]] for case in stmt["cases"]]
+        if stmt.get("otherwise"):
+            blocks.append(stmt["otherwise"])
+        return blocks
+    return []
+
+
+def map_expressions(stmt: dict, func: Callable[[dict], dict]) -> None:
+    """用 func 的结果替换语句直接包含的每个表达式（不进入嵌套语句块）"""
+    stmt_type = stmt.get("type")
+    for field in EXPRESSION_FIELDS.get(stmt_type, ()):
+        if stmt.get(field):
+            stmt[field] = func(stmt[field])
+    if stmt_type in EXPRESSION_LIST_FIELDS:
+        field = EXPRESSION_LIST_FIELDS[stmt_type]
+        stmt[field] = [func(expr) for expr in stmt[field]]
+    if stmt_type == "CaseStatement":
+        for case in stmt["cases"]:
+            case["condition"] = func(case["condition"])
+
+
+def map_statements(block: list[dict], func: Callable[[dict], None]) -> None:
+    """对 block 及其所有嵌套语句块中的每条语句调用 func"""
+    for stmt in block:
+        func(stmt)
+        for child in child_blocks(stmt):
+            map_statements(child, func)
+
+
+def assign_statement(name: str, value: dict, position: dict) -> dict:
+    """构造 <name> ← <value> 语句"""
+    location = {key: position[key] for key in ("line", "column") if key in position}
+    return {
+        "type": "ExpressionStatement",
+        "expression": {
+            "type": "BinaryExpression",
+            "operator": "ASSIGN",
+            "left": {"type": "Identifier", "name": name},
+            "right": value,
+        },
+        **location,
+    }
+
+
+def expression_key(expr: dict) -> str:
+    """结构相同（忽略位置）的表达式得到相同的键"""
+    return json.dumps(_strip_positions(expr), sort_keys=True)
+
+
+def _strip_positions(node: Any) -> Any:
+    if isinstance(node, dict):
+        return {
+            key: _strip_positions(value)
+            for key, value in node.items()
+            if key not in ("line", "column")
+        }
+    if isinstance(node, list):
+        return [_strip_positions(item) for item in node]
+    return node
+
+
+class InvariantHoister:
+    """循环不变量外提
+
+    循环体（含 WHILE / REPEAT 的条件）中的 LENGTH / UCASE / LCASE / SUBSTRING
+    调用，如果读取的变量在循环内都没有被写入，就只计算一次：循环前把临时变量
+    置为 None，调用处换成 InvariantValue 节点，第一次执行到时计算并存入临时
+    变量，之后直接取值。调用不会提前到循环之前，循环一次都不执行、或调用所在的
+    分支没有执行时不会求值，也就不会抛出原来不会出现的异常（如下标越界）。
+    循环中调用了过程或非纯函数时整个循环跳过，因为它们可能修改数组。
+    """
+
+    def __init__(self, program: dict) -> None:
+        self.program = program
+        self.callable_pure = BUILTIN_PURE_FUNCTIONS | pure_functions(program)
+        self.count = 0
+
+    def run(self) -> int:
+        self.program["statements"] = self.hoist_block(self.program["statements"])
+        return self.count
+
+    def hoist_block(self, block: list[dict]) -> list[dict]:
+        result = []
+        for stmt in block:
+            stmt_type = stmt.get("type")
+            if stmt_type == "IfStatement":
+                stmt["then_block"] = self.hoist_block(stmt["then_block"])
+                stmt["else_block"] = self.hoist_block(stmt["else_block"])
+            elif stmt_type == "CaseStatement":
+                # CASE 分支只有一条语句，外提的语句放在 CASE 之前
+                for case in stmt["cases"]:
+                    hoisted = self.hoist_block([case["body"]])
+                    result.extend(hoisted[:-1])
+                    case["body"] = hoisted[-1]
+                if stmt.get("otherwise"):
+                    stmt["otherwise"] = self.hoist_block(stmt["otherwise"])
+            elif stmt_type in DECLARATION_TYPES or stmt_type in LOOP_TYPES:
+                stmt["body"] = self.hoist_block(stmt["body"])
+            if stmt_type in LOOP_TYPES:
+                result.extend(self.hoist_loop(stmt))
+            result.append(stmt)
+        return result
+
+    def has_impure_call(self, loop: dict) -> bool:
+        for node in walk(loop):
+            if node["type"] in ("ProcedureCall", "TailCall"):
+                return True
+            if node["type"] == "FunctionCall" and node["function"] not in self.callable_pure:
+                return True
+        return False
+
+    def hoist_loop(self, loop: dict) -> list[dict]:
+        if self.has_impure_call(loop):
+            return []
+        written = written_names(loop)
+        temps: dict[str, str] = {}
+        preheader: list[dict] = []
+
+        def replace(expr: dict) -> dict:
+            if self.is_invariant_call(expr, written):
+                key = expression_key(expr)
+                if key not in temps:
+                    self.count += 1
+                    temps[key] = f"__licm{self.count}"
+                    preheader.append(assign_statement(temps[key], {"type": "Literal", "value": None}, loop))
+                return {"type": "InvariantValue", "name": temps[key], "expression": expr}
+            return self.map_children(expr, replace)
+
+        if loop["type"] != "ForLoop":
+            loop["condition"] = replace(loop["condition"])
+        map_statements(loop["body"], lambda stmt: map_expressions(stmt, replace))
+        return preheader
+
+    def is_invariant_call(self, expr: dict, written: set[str]) -> bool:
+        if expr.get("type") != "FunctionCall" or expr["function"] not in HOISTABLE_FUNCTIONS:
+            return False
+        for node in walk(expr):
+            if node["type"] == "FunctionCall" and node["function"] not in BUILTIN_PURE_FUNCTIONS:
+                return False
+        return not (read_names(expr) & written)
+
+    @staticmethod
+    def map_children(expr: dict, func: Callable[[dict], dict]) -> dict:
+        """返回把子表达式替换为 func 结果的新节点；没有变化时返回原节点"""
+        changes: dict[str, Any] = {}
+        for key, value in expr.items():
+            if isinstance(value, dict) and "type" in value:
+                new = func(value)
+                if new is not value:
+                    changes[key] = new
+            elif key in ("arguments", "indices"):
+                new_list = [func(item) for item in value]
+                if any(new is not old for new, old in zip(new_list, value)):
+                    changes[key] = new_list
+        return {**expr, **changes} if changes else expr
+
+
+def hoist_loop_invariants(program: dict) -> int:
+    """循环不变量外提，返回外提的表达式数量"""
+    return InvariantHoister(program).run()
+
+
+def _append_terms(expr: dict, name: str) -> Optional[list[dict]]:
+    """expr 形如 name + a + b ...（左结合的加法链，最左端为 name）时返回 [a, b, ...]"""
+    terms = []
+    while expr.get("type") == "BinaryExpression" and expr["operator"] == "ADD":
+        terms.append(expr["right"])
+        expr = expr["left"]
+    if not terms or expr.get("type") != "Identifier" or expr["name"] != name:
+        return None
+    return terms[::-1]
+
+
+def _appended_to(stmt: dict, name: str) -> Optional[list[dict]]:
+    """stmt 是 name ← name + ... 且右侧其余部分不读 name 时返回追加的各项"""
+    assign = stmt.get("expression") if stmt.get("type") == "ExpressionStatement" else None
+    if not assign or assign.get("type") != "BinaryExpression" or assign["operator"] != "ASSIGN":
+        return None
+    if assign["left"].get("type") != "Identifier" or assign["left"]["name"] != name:
+        return None
+    terms = _append_terms(assign["right"], name)
+    if terms is None or any(name in read_names(term) for term in terms):
+        return None
+    return terms
+
+
+def string_variables(program: dict) -> set[str]:
+    """只被声明为 STRING 的变量"""
+    return {name for name, kind in declared_types(program).items() if kind == "STRING"}
+
+
+class StringAccumulatorRewriter:
+    """循环内字符串累加改为列表缓冲
+
+    循环中对 STRING 变量 X 只有 X ← X + ... 形式的追加、没有其他读写时，
+    循环前建立缓冲 [X]，每次追加改为 append，循环结束后用 ''.join 写回 X。
+    循环中含 RETURN、过程调用或非纯函数调用时跳过，因为它们可能在写回前读取 X。
+    """
+
+    def __init__(self, program: dict) -> None:
+        self.program = program
+        self.callable_pure = BUILTIN_PURE_FUNCTIONS | pure_functions(program)
+        self.strings = string_variables(program)
+        self.count = 0
+
+    def run(self) -> int:
+        self.program["statements"] = self.rewrite_block(self.program["statements"])
+        return self.count
+
+    def rewrite_block(self, block: list[dict], expand: bool = True) -> list[dict]:
+        """expand 为 False 时不在该层插入语句（CASE 分支只能放一条语句）"""
+        result = []
+        for stmt in block:
+            stmt_type = stmt.get("type")
+            before, after = [], []
+            if stmt_type in LOOP_TYPES and expand:
+                for name in sorted(self.accumulators(stmt)):
+                    self.count += 1
+                    buffer = f"__sb{self.count}"
+                    self.rewrite_appends(stmt["body"], name, buffer)
+                    position = {key: stmt[key] for key in ("line", "column") if key in stmt}
+                    before.append({"type": "StringBuilderStart", "name": name, "buffer": buffer, **position})
+                    after.append({"type": "StringBuilderEnd", "name": name, "buffer": buffer, **position})
+            if stmt_type == "IfStatement":
+                stmt["then_block"] = self.rewrite_block(stmt["then_block"])
+                stmt["else_block"] = self.rewrite_block(stmt["else_block"])
+            elif stmt_type == "CaseStatement":
+                for case in stmt["cases"]:
+                    case["body"] = self.rewrite_block([case["body"]], expand=False)[0]
+                if stmt.get("otherwise"):
+                    stmt["otherwise"] = self.rewrite_block(stmt["otherwise"])
+            elif stmt_type in DECLARATION_TYPES or stmt_type in LOOP_TYPES:
+                stmt["body"] = self.rewrite_block(stmt["body"])
+            result.extend(before)
+            result.append(stmt)
+            result.extend(after)
+        return result
+
+    def accumulators(self, loop: dict) -> set[str]:
+        appends: dict[str, int] = {}
+        identifiers: dict[str, int] = {}
+        excluded = set()
+        for node in walk(loop):
+            node_type = node["type"]
+            if node_type in ("ProcedureCall", "TailCall", "ReturnStatement"):
+                return set()
+            if node_type == "FunctionCall" and node["function"] not in self.callable_pure:
+                return set()
+            if node_type == "Identifier":
+                identifiers[node["name"]] = identifiers.get(node["name"], 0) + 1
+            elif node_type == "ForLoop":
+                excluded.add(node["variable"])
+            elif node_type in ("SimpleVariableDeclaration", "ArrayDeclaration"):
+                excluded.add(node["identifier"])
+            elif node_type == "ExpressionStatement":
+                name = target_name(node["expression"].get("left", {}))
+                if name in self.strings and _appended_to(node, name) is not None:
+                    appends[name] = appends.get(name, 0) + 1
+        # 每条追加语句恰好包含两次 X（赋值目标与加法链最左端），多出的就是其他读写
+        return {
+            name
+            for name, count in appends.items()
+            if name not in excluded and identifiers.get(name) == 2 * count
+        }
+
+    def rewrite_appends(self, block: list[dict], name: str, buffer: str) -> None:
+        for i, stmt in enumerate(block):
+            terms = _appended_to(stmt, name)
+            if terms is not None:
+                block[i] = {
+                    "type": "StringBuilderAppend",
+                    "buffer": buffer,
+                    "expressions": terms,
+                    **{key: stmt[key] for key in ("line", "column") if key in stmt},
+                }
+                continue
+            blocks = child_blocks(stmt)
+            for child in blocks:
+                self.rewrite_appends(child, name, buffer)
+            if stmt.get("type") == "CaseStatement":
+                for case, child in zip(stmt["cases"], blocks):
+                    case["body"] = child[0]
+
+
+def build_string_accumulators(program: dict) -> int:
+    """把循环内的字符串累加改写为列表缓冲，返回改写的变量数"""
+    return StringAccumulatorRewriter(program).run()
+
+
+NUMERIC_TYPES = {"INTEGER", "REAL"}
+# IF 条件 -> 对应的归约：(比较运算符, 数组元素在左侧) -> max / min
+EXTREMUM_KINDS = {
+    ("GT", True): "max",
+    ("LT", False): "max",
+    ("LT", True): "min",
+    ("GT", False): "min",
+}
+
+
+class LoopVectorizer:
+    """把只做求和、填充、最值或计数的 FOR 循环改写为整段数组操作
+
+    FOR I ← a TO b 中只有一条下列形式的语句（A[..., I] 的其他下标不含 I）：
+
+        Total ← Total + A[I]                        -> sum（REAL 为逐个相加的 reduce）
+        A[I] ← v                                    -> 切片赋值
+        IF A[I] > Max THEN Max ← A[I] ENDIF         -> max（< 为 min）
+        IF A[I] = v THEN Count ← Count + 1 ENDIF    -> list.count
+
+    v 只能读取循环中不变的变量并只调用内置纯函数。循环变量在这些 FOR 之外
+    被读取时不改写，因为改写后循环变量不再保留最后一次迭代的值。
+    """
+
+    def __init__(self, program: dict) -> None:
+        self.program = program
+        self.types = declared_types(program)
+        self.loop_read = names_read_outside_loops(program)
+        # 值一定是 int 的变量，与计数循环的判定相同
+        self.integers = CounterLoopRewriter(program).integers
+        self.count = 0
+
+    def run(self) -> int:
+        self.rewrite_block(self.program["statements"])
+        return self.count
+
+    def rewrite_block(self, block: list[dict]) -> None:
+        for i, stmt in enumerate(block):
+            node = self.vectorize(stmt) if stmt.get("type") == "ForLoop" else None
+            if node is not None:
+                self.count += 1
+                block[i] = node
+                continue
+            blocks = child_blocks(stmt)
+            for child in blocks:
+                self.rewrite_block(child)
+            if stmt.get("type") == "CaseStatement":
+                for case, child in zip(stmt["cases"], blocks):
+                    case["body"] = child[0]
+
+    def vectorize(self, loop: dict) -> Optional[dict]:
+        if loop.get("step") or len(loop["body"]) != 1 or loop["variable"] in self.loop_read:
+            return None
+        stmt = loop["body"][0]
+        variable = loop["variable"]
+        matched = None
+        if stmt.get("type") == "ExpressionStatement":
+            matched = self.match_sum(stmt, variable) or self.match_fill(stmt, variable)
+        elif stmt.get("type") == "IfStatement" and not stmt["else_block"]:
+            matched = self.match_extremum(stmt, variable) or self.match_count(stmt, variable)
+        if matched is None:
+            return None
+        kind, array, target, value = matched
+        written = {variable, array["array"]} | ({target["name"]} if target else set())
+        if not all(self.invariant(index, written) for index in array["indices"]):
+            return None
+        return {
+            "type": "ArrayReduction",
+            "kind": kind,
+            "array": array,
+            "target": target,
+            "value": value,
+            "start": loop["start"],
+            "end": loop["end"],
+            **{key: loop[key] for key in ("line", "column") if key in loop},
+        }
+
+    def element(self, expr: dict, variable: str) -> Optional[dict]:
+        """expr 为 A[..., I] 时返回去掉最后一个下标的 A[...]"""
+        if expr.get("type") != "ArrayAccess" or expr["array"] == "-":
+            return None
+        *outer, last = expr["indices"]
+        if last.get("type") != "Identifier" or last["name"] != variable:
+            return None
+        if any(variable in read_names(index) for index in outer):
+            return None
+        return {"type": "ArrayAccess", "array": expr["array"], "indices": outer}
+
+    @staticmethod
+    def invariant(expr: dict, written: set[str]) -> bool:
+        for node in walk(expr):
+            if node["type"] == "FunctionCall" and node["function"] not in BUILTIN_PURE_FUNCTIONS:
+                return False
+        return not (read_names(expr) & written)
+
+    def scalar_target(self, expr: dict, array: dict, variable: str) -> bool:
+        return (
+            expr.get("type") == "Identifier"
+            and expr["name"] not in (variable, array["array"])
+        )
+
+    def match_sum(self, stmt: dict, variable: str) -> Optional[tuple]:
+        pair = assignment(stmt)
+        if not pair:
+            return None
+        target, value = pair
+        if value.get("type") != "BinaryExpression" or value["operator"] != "ADD":
+            return None
+        array = self.element(value["right"], variable)
+        if array is None or not self.scalar_target(target, array, variable):
+            return None
+        if value["left"].get("type") != "Identifier" or value["left"]["name"] != target["name"]:
+            return None
+        # sum() 只按数值相加，字符串拼接不能改写
+        if self.types.get(target["name"]) not in NUMERIC_TYPES:
+            return None
+        if self.types.get(array["array"]) not in {f"ARRAY OF {kind}" for kind in NUMERIC_TYPES}:
+            return None
+        # sum() 对浮点数做补偿求和，只有整数相加时结果与逐次累加相同
+        exact = target["name"] in self.integers and array["array"] in self.integers
+        return ("sum" if exact else "fold"), array, target, None
+
+    def match_fill(self, stmt: dict, variable: str) -> Optional[tuple]:
+        pair = assignment(stmt)
+        if not pair:
+            return None
+        target, value = pair
+        array = self.element(target, variable)
+        if array is None or not self.invariant(value, {variable, array["array"]}):
+            return None
+        return "fill", array, None, value
+
+    def match_extremum(self, stmt: dict, variable: str) -> Optional[tuple]:
+        condition = stmt["condition"]
+        if condition.get("type") != "BinaryExpression" or len(stmt["then_block"]) != 1:
+            return None
+        pair = assignment(stmt["then_block"][0])
+        if not pair:
+            return None
+        target, value = pair
+        for element_first in (True, False):
+            element, other = (
+                (condition["left"], condition["right"])
+                if element_first
+                else (condition["right"], condition["left"])
+            )
+            kind = EXTREMUM_KINDS.get((condition["operator"], element_first))
+            array = self.element(element, variable)
+            if kind is None or array is None or not self.scalar_target(target, array, variable):
+                continue
+            if other.get("type") != "Identifier" or other["name"] != target["name"]:
+                continue
+            if expression_key(value) == expression_key(element):
+                return kind, array, target, None
+        return None
+
+    def match_count(self, stmt: dict, variable: str) -> Optional[tuple]:
+        condition = stmt["condition"]
+        if condition.get("type") != "BinaryExpression" or condition["operator"] != "EQ":
+            return None
+        if len(stmt["then_block"]) != 1:
+            return None
+        pair = assignment(stmt["then_block"][0])
+        if not pair:
+            return None
+        target, increment = pair
+        if (
+            increment.get("type") != "BinaryExpression"
+            or increment["operator"] != "ADD"
+            or increment["left"].get("type") != "Identifier"
+            or increment["left"]["name"] != target.get("name")
+            or increment["right"].get("type") != "Literal"
+            or type(increment["right"]["value"]) is not int
+            or increment["right"]["value"] != 1
+        ):
+            return None
+        for element, value in (
+            (condition["left"], condition["right"]),
+            (condition["right"], condition["left"]),
+        ):
+            array = self.element(element, variable)
+            if array is None or not self.scalar_target(target, array, variable):
+                continue
+            if self.invariant(value, {variable, array["array"], target["name"]}):
+                return "count", array, target, value
+        return None
+
+
+def vectorize_array_loops(program: dict) -> int:
+    """把数组求和、填充、最值与计数循环改写为 ArrayReduction 节点，返回改写的循环数"""
+    return LoopVectorizer(program).run()
+
+
+# 比较运算符交换左右两侧后的运算符，以及取反后的运算符（REPEAT 的 UNTIL 条件）
+FLIPPED_COMPARISONS = {"LT": "GT", "GT": "LT", "LEQ": "GEQ", "GEQ": "LEQ"}
+NEGATED_COMPARISONS = {"LT": "GEQ", "GEQ": "LT", "GT": "LEQ", "LEQ": "GT"}
+# (继续循环的条件 I op B, 步长的符号) -> range 终点相对 B 的偏移
+COUNTER_STOP_OFFSETS = {("LEQ", 1): 1, ("LT", 1): 0, ("GEQ", -1): -1, ("GT", -1): 0}
+# 结果一定是整数的内置函数
+INTEGER_FUNCTIONS = {"DIV", "MOD", "LENGTH"}
+
+
+class CounterLoopRewriter:
+    """把计数器驱动的 WHILE / REPEAT 循环改写为 range 上的 for 循环
+
+        WHILE I <= N DO ... I ← I + 1 ENDWHILE
+        REPEAT ... I ← I + 1 UNTIL I > N
+
+    条件为 I 与界限 N 的大小比较（<、<=、>、>=，I 可以在任一侧），循环体的
+    最后一条语句把 I 加上（或减去）一个整数字面量，且与比较的方向一致。
+    I 是整数变量，N 只由整数字面量、整数变量、整数 CONSTANT、+ - * 与
+    DIV / MOD / LENGTH 组成，循环体中没有其他语句写 I 或 N 读取的变量，循环体
+    与 N 中都没有过程调用或非纯函数调用（N 只求值一次）。整数变量（见
+    integer_variables）不只看声明：INTEGER 只是声明的类型，I ← N / 2 之后 I 是
+    浮点数，range 会抛出 TypeError。
+
+    改写后的循环体中 I 每次迭代的取值与原来相同，循环结束后 I 被设为
+    range 的下一个值，与 WHILE 退出时的值相同。REPEAT 至少执行一次，终点取
+    max(终点, I + 1)（步长为负时取 min），其界限中不能有 DIV / MOD，LENGTH 的
+    参数只能是字符串或数组变量，因为界限会在第一次迭代之前求值，不能在原来
+    不会出错的时刻抛出除零或越界错误。
+    """
+
+    def __init__(self, program: dict) -> None:
+        self.program = program
+        self.types = declared_types(program)
+        self.integer_constants = {
+            stmt["identifier"]
+            for stmt in program["statements"]
+            if stmt.get("type") == "ConstantDeclaration" and type(stmt["value"]) is int
+        }
+        self.callable_pure = BUILTIN_PURE_FUNCTIONS | pure_functions(program)
+        self.integers = self.integer_variables()
+        self.count = 0
+
+    def run(self) -> int:
+        self.rewrite_block(self.program["statements"])
+        return self.count
+
+    def integer_variables(self) -> set[str]:
+        """值（数组为每个元素）一定是 int 的变量
+
+        候选为声明（包括过程/函数参数）都是 INTEGER 或 ARRAY OF INTEGER 的名字，
+        同名的 REAL 参数等不同类型的声明使名字落选。变量不区分作用域，程序中
+        对同名变量的每次写入都必须是整数表达式：赋值语句、调用时传给同名参数
+        的实参、数组整段操作写入的值；READFILE 写入字符串，嵌在表达式中的赋值
+        无法确定。写入可能读取其他候选变量，所以反复剔除，直到不再变化。
+        """
+        types = dict(self.types)
+        routines = {
+            stmt["name"]: stmt
+            for stmt in self.program["statements"]
+            if stmt.get("type") in ("ProcedureDeclaration", "FunctionDeclaration")
+        }
+        for routine in routines.values():
+            for param in routine["parameters"]:
+                kind = f"ARRAY OF {param['data_type']}" if param["is_array"] else param["data_type"]
+                name = param["identifier"]
+                types[name] = kind if types.get(name, kind) == kind else None
+        writes: dict[str, list[Optional[dict]]] = {}
+        statements = set()
+        for node in walk(self.program):
+            node_type = node["type"]
+            pair = assignment(node) if node_type == "ExpressionStatement" else None
+            if pair:
+                statements.add(id(node["expression"]))
+                name = target_name(pair[0])
+                if name:
+                    writes.setdefault(name, []).append(pair[1])
+            elif (
+                node_type == "BinaryExpression"
+                and node["operator"] == "ASSIGN"
+                and id(node) not in statements
+            ):
+                # 嵌在其他运算里的赋值：I ← N / 2 解析为 (I ← N) / 2，生成的代码却是
+                # I = N / 2，写入的值不是 right
+                name = target_name(node["left"])
+                if name:
+                    writes.setdefault(name, []).append(None)
+            elif node_type == "ReadFile":
+                writes.setdefault(node["target"]["name"], []).append(None)
+            elif node_type in ("FunctionCall", "ProcedureCall") and node["function"] in routines:
+                params = [param["identifier"] for param in routines[node["function"]]["parameters"]]
+                for name, argument in zip(params, node["arguments"]):
+                    writes.setdefault(name, []).append(argument)
+            elif node_type == "TailCall":
+                for name, argument in zip(node["parameters"], node["arguments"]):
+                    writes.setdefault(name, []).append(argument)
+            elif node_type == "ArrayReduction":
+                array = node["array"]["array"]
+                if node["kind"] == "fill":
+                    writes.setdefault(array, []).append(node["value"])
+                elif node["kind"] != "count":
+                    # sum / max / min 的结果来自数组元素
+                    element = {"type": "Identifier", "name": array}
+                    writes.setdefault(node["target"]["name"], []).append(element)
+        self.integers = {name for name, kind in types.items() if kind in ("INTEGER", "ARRAY OF INTEGER")}
+        changed = True
+        while changed:
+            changed = False
+            for name in list(self.integers):
+                if not all(
+                    value is not None and self.integer_expression(value, True)
+                    for value in writes.get(name, ())
+                ):
+                    self.integers.discard(name)
+                    changed = True
+        return self.integers
+
+    def rewrite_block(self, block: list[dict]) -> None:
+        # 先改写内层循环：外层循环按改写后的循环体判断
+        for i, stmt in enumerate(block):
+            blocks = child_blocks(stmt)
+            for child in blocks:
+                self.rewrite_block(child)
+            if stmt.get("type") == "CaseStatement":
+                for case, child in zip(stmt["cases"], blocks):
+                    case["body"] = child[0]
+            if stmt.get("type") in ("WhileLoop", "RepeatLoop"):
+                node = self.canonicalize(stmt)
+                if node is not None:
+                    self.count += 1
+                    block[i] = node
+
+    def canonicalize(self, loop: dict) -> Optional[dict]:
+        if not loop["body"]:
+            return None
+        *body, last = loop["body"]
+        update = self.counter_update(last)
+        if update is None:
+            return None
+        variable, step = update
+        if variable not in self.integers or self.types.get(variable) != "INTEGER":
+            return None
+        bound = self.comparison(loop["condition"], variable, loop["type"] == "RepeatLoop")
+        if bound is None:
+            return None
+        operator, limit = bound
+        offset = COUNTER_STOP_OFFSETS.get((operator, 1 if step > 0 else -1))
+        if offset is None or not self.integer_expression(limit, loop["type"] == "WhileLoop"):
+            return None
+        if variable in written_names(body) or read_names(limit) & (written_names(body) | {variable}):
+            return None
+        # 界限只求值一次：其中的调用不能有副作用
+        if self.has_impure_call(body) or self.has_impure_call([limit]):
+            return None
+        stop = limit
+        if offset:
+            stop = {
+                "type": "BinaryExpression",
+                "operator": "ADD" if offset > 0 else "SUB",
+                "left": limit,
+                "right": {"type": "Literal", "value": abs(offset)},
+            }
+        return {
+            "type": "CountedLoop",
+            "variable": variable,
+            "range": f"__counter{self.count + 1}",
+            "stop": stop,
+            "step": step,
+            "at_least_once": loop["type"] == "RepeatLoop",
+            "body": body,
+            **{key: loop[key] for key in ("line", "column") if key in loop},
+        }
+
+    @staticmethod
+    def counter_update(stmt: dict) -> Optional[tuple[str, int]]:
+        """stmt 为 I ← I + c、I ← c + I 或 I ← I - c（c 为非零整数字面量）时返回 (I, 步长)"""
+        pair = assignment(stmt)
+        if not pair or pair[0].get("type") != "Identifier":
+            return None
+        name = pair[0]["name"]
+        value = pair[1]
+        if value.get("type") != "BinaryExpression" or value["operator"] not in ("ADD", "SUB"):
+            return None
+        left, right = value["left"], value["right"]
+        if value["operator"] == "ADD" and left.get("type") == "Literal":
+            left, right = right, left
+        if left.get("type") != "Identifier" or left["name"] != name:
+            return None
+        if right.get("type") != "Literal" or type(right["value"]) is not int or not right["value"]:
+            return None
+        return name, right["value"] if value["operator"] == "ADD" else -right["value"]
+
+    @staticmethod
+    def comparison(condition: dict, variable: str, negate: bool) -> Optional[tuple[str, dict]]:
+        """条件为 I 与界限的比较时返回 (继续循环时成立的 I op 界限 中的 op, 界限)"""
+        if condition.get("type") != "BinaryExpression" or condition["operator"] not in FLIPPED_COMPARISONS:
+            return None
+        operator, left, right = condition["operator"], condition["left"], condition["right"]
+        if right.get("type") == "Identifier" and right["name"] == variable:
+            operator, left, right = FLIPPED_COMPARISONS[operator], right, left
+        if left.get("type") != "Identifier" or left["name"] != variable:
+            return None
+        return (NEGATED_COMPARISONS[operator] if negate else operator), right
+
+    def integer_expression(self, expr: dict, may_raise: bool) -> bool:
+        """expr 的值一定是整数；may_raise 为 False 时还要求求值不会抛出异常"""
+        expr_type = expr.get("type")
+        if expr_type == "Literal":
+            return type(expr["value"]) is int
+        if expr_type == "Identifier":
+            return expr["name"] in self.integers or expr["name"] in self.integer_constants
+        if expr_type == "ArrayAccess":
+            # 下标可能越界
+            return may_raise and expr["array"] in self.integers
+        if expr_type == "UnaryExpression":
+            return self.integer_expression(expr["operand"], may_raise)
+        if expr_type == "Parenthesis":
+            return self.integer_expression(expr["operand"], may_raise)
+        if expr_type == "BinaryExpression":
+            return expr["operator"] in ("ADD", "SUB", "MUL") and all(
+                self.integer_expression(side, may_raise) for side in (expr["left"], expr["right"])
+            )
+        if expr_type == "FunctionCall":
+            if expr["function"] == "-":
+                return len(expr["arguments"]) == 1 and self.integer_expression(expr["arguments"][0], may_raise)
+            if expr["function"] == "LENGTH":
+                return len(expr["arguments"]) == 1 and self.sized_expression(expr["arguments"][0], may_raise)
+            if expr["function"] in INTEGER_FUNCTIONS and may_raise:
+                return all(self.integer_expression(arg, may_raise) for arg in expr["arguments"])
+        return False
+
+    def sized_expression(self, expr: dict, may_raise: bool) -> bool:
+        """LENGTH 的参数：may_raise 为 False 时只能是字符串字面量或字符串 / 数组变量
+
+        其他参数（数组元素、函数调用等）可能越界或出错，只用于 WHILE 的界限；
+        纯度由 canonicalize 对整个界限检查。
+        """
+        if may_raise:
+            return True
+        if expr.get("type") == "Literal":
+            return type(expr["value"]) is str
+        if expr.get("type") == "Identifier":
+            kind = self.types.get(expr["name"]) or ""
+            return kind == "STRING" or kind.startswith("ARRAY OF ")
+        return False
+
+    def has_impure_call(self, body: list[dict]) -> bool:
+        for node in walk({"type": "Block", "body": body}):
+            if node["type"] in ("ProcedureCall", "TailCall"):
+                return True
+            if node["type"] == "FunctionCall" and node["function"] not in self.callable_pure:
+                return True
+        return False
+
+
+def canonicalize_counter_loops(program: dict) -> int:
+    """把计数器驱动的 WHILE / REPEAT 循环改写为 CountedLoop 节点，返回改写的循环数"""
+    return CounterLoopRewriter(program).run()
@@ -0,0 +1,206 @@
+"""单个大文件的多进程转换
+
+大文件按行切成若干段并行词法分析（Token 不跨行，只有跨行字符串例外，
+此时退回整体分析），再在 Token 流中找出顶层的 PROCEDURE … ENDPROCEDURE 与
+FUNCTION … ENDFUNCTION 块。相邻的块按 Token 数分成若干工作单元，交给工作
+进程解析并生成代码；块之间的顶层语句由主进程按顺序解析，以得到每个单元
+开始时的全局声明（INPUT、赋值的类型转换依赖它）。各部分的代码按源码顺序
+拼接，辅助函数（DIV、LENGTH 等）按首次使用的顺序合并，输出与串行转换相同。
+
+任何部分出错时整体改为串行转换，报出与串行转换相同的错误。
+
+    python parallel.py big.txt --workers 8    # 写出 big.txt.py
+"""
+from __future__ import annotations
+import os
+from multiprocessing import Pool
+from typing import Any, Optional
+
+from pseudocode import Parser, Pseudocode, Token, Tokenizer, transpile
+
+# 可以逐块生成代码的选项：其余优化依赖整个程序的分析（纯函数、常量、变量类型），
+# CASE 查表的表名按全程序计数
+PARALLEL_OPTIONS = {"tail_calls"}
+# 每个进程分到的工作单元数：块的大小不均时靠多个较小的单元平衡负载
+UNITS_PER_WORKER = 4
+# 行数少于该值的文件直接串行转换（进程池的启动与传输开销更大）
+MIN_PARALLEL_LINES = 2000
+
+# 块语句的开头词 -> 结尾词
+BLOCK_CLOSERS = {opener: terminators[-1] for opener, terminators in Parser.block_terminators.items()}
+DECLARATION_KEYWORDS = ("PROCEDURE", "FUNCTION")
+HELPERS = list(Pseudocode.pre_string_dic.values())
+
+# Token 在进程之间以元组传递：(类型, 值, 行, 起始列, 结束列)
+TokenTuple = tuple[str, Any, int, int, int]
+
+
+def _tokenize_lines(chunk: tuple[int, str]) -> Optional[list[TokenTuple]]:
+    """工作进程：词法分析从第 first + 1 行开始的一段源码，失败时返回 None"""
+    first, text = chunk
+    try:
+        tokens = Tokenizer(text).tokenize()
+    except SyntaxError:
+        return None
+    return [(token._type, token.value, token.line + first, token.start, token.end) for token in tokens]
+
+
+def _translate_unit(
+    unit: tuple[list[TokenTuple], dict[str, str], dict[str, Any]]
+) -> Optional[tuple[str, str, bool]]:
+    """工作进程：解析并生成一个工作单元，出错时返回 None"""
+    tokens, scope, options = unit
+    try:
+        return translate(tokens, scope, options)
+    except Exception:
+        return None
+
+
+def translate(
+    tokens: list[TokenTuple], scope: dict[str, str], options: dict[str, Any]
+) -> tuple[str, str, bool]:
+    """解析一段顶层语句并生成代码：(辅助函数, 代码, 第一条语句是否接在上一行末尾)
+
+    scope 是这段代码开始时的全局声明，解析时会就地更新。
+    """
+    parser = Parser([Token(*token) for token in tokens])
+    parser.scope_stack[0] = scope
+    statements = parser.parse_program()["statements"]
+    generator = Pseudocode(**options)
+    code = generator.ast_to_python({"type": "Program", "statements": statements})
+    pre_string = generator.pre_string
+    # 与 Pseudocode 中顶层语句的拼接规则相同
+    joined = bool(statements) and statements[0].get("expression", {}).get("start", "") == "backslash"
+    return pre_string, code[len(pre_string):], joined
+
+
+def top_level_blocks(kinds: list[str]) -> list[tuple[int, int]]:
+    """顶层 PROCEDURE / FUNCTION 块的 Token 范围 [start, stop)
+
+    只按块语句的开头词与结尾词配对，不配对的结尾词忽略：
+    这样划分出错的程序在解析时同样会出错。
+    """
+    blocks = []
+    closers: list[str] = []
+    start: Optional[int] = None
+    for i, kind in enumerate(kinds):
+        if kind in BLOCK_CLOSERS:
+            if not closers:
+                start = i if kind in DECLARATION_KEYWORDS else None
+            closers.append(BLOCK_CLOSERS[kind])
+        elif closers and kind == closers[-1]:
+            closers.pop()
+            if not closers and start is not None:
+                blocks.append((start, i + 1))
+    return blocks
+
+
+def work_units(blocks: list[tuple[int, int]], count: int) -> list[tuple[int, int]]:
+    """把相邻的块合并成 Token 数大致相同的约 count 个单元，不跨越块之间的顶层语句"""
+    if not blocks:
+        return []
+    size = max(1, sum(stop - start for start, stop in blocks) // count)
+    units = []
+    unit_start, unit_stop = blocks[0]
+    for start, stop in blocks[1:]:
+        if start != unit_stop or unit_stop - unit_start >= size:
+            units.append((unit_start, unit_stop))
+            unit_start = start
+        unit_stop = stop
+    units.append((unit_start, unit_stop))
+    return units
+
+
+def helper_pieces(pre_string: str) -> Optional[list[str]]:
+    """把一段的辅助函数拆回各个片段（按出现顺序），含有未知内容时返回 None"""
+    pieces = sorted((helper for helper in HELPERS if helper in pre_string), key=pre_string.index)
+    return pieces if "".join(pieces) == pre_string else None
+
+
+def tokenize_parallel(code: str, pool: Any, chunks: int) -> Optional[list[TokenTuple]]:
+    """按行切成 chunks 段并行词法分析；某段失败（跨段的多行字符串）时返回 None"""
+    lines = code.split("\n")
+    step = -(-len(lines) // chunks)
+    pieces = [(first, "\n".join(lines[first:first + step])) for first in range(0, len(lines), step)]
+    tokens: list[TokenTuple] = []
+    for part in pool.imap(_tokenize_lines, pieces):
+        if part is None:
+            return None
+        tokens.extend(part)
+    return tokens
+
+
+def _transpile_with(pool: Any, code: str, workers: int, options: dict[str, Any]) -> Optional[str]:
+    tokens = tokenize_parallel(code, pool, workers * UNITS_PER_WORKER)
+    if tokens is None:
+        return None
+    units = work_units(top_level_blocks([token[0] for token in tokens]), workers * UNITS_PER_WORKER)
+    # 按源码顺序：主进程生成的结果，或工作进程的 AsyncResult
+    parts: list[Any] = []
+    scope: dict[str, str] = {}
+    position = 0
+    for start, stop in units + [(len(tokens), len(tokens))]:
+        if position < start:
+            parts.append(translate(tokens[position:start], scope, options))
+        if start < stop:
+            parts.append(pool.apply_async(_translate_unit, ((tokens[start:stop], dict(scope), options),)))
+        position = stop
+
+    pre_string, body = "", ""
+    for part in parts:
+        if not isinstance(part, tuple):
+            part = part.get()
+            if part is None:
+                return None
+        part_pre, part_code, joined = part
+        pieces = helper_pieces(part_pre)
+        if pieces is None:
+            return None
+        for piece in pieces:
+            if piece not in pre_string:
+                pre_string += piece
+        if joined:
+            body = body.rstrip("\n")
+        body += part_code
+    return pre_string + body
+
+
+def transpile_parallel(code: str, workers: Optional[int] = None, **options: Any) -> str:
+    """多进程转换一个文件，结果与 transpile(code, **options) 相同"""
+    unsupported = sorted(name for name, value in options.items() if value and name not in PARALLEL_OPTIONS)
+    if unsupported:
+        raise ValueError(f"Options not supported in parallel mode: {', '.join(unsupported)}")
+    workers = workers or os.cpu_count() or 1
+    if workers < 2 or code.count("\n") < MIN_PARALLEL_LINES:
+        return transpile(code, **options)
+    try:
+        with Pool(workers) as pool:
+            python_code = _transpile_with(pool, code, workers, options)
+    except Exception:
+        python_code = None
+    if python_code is None:
+        # 串行重做一遍，报出与串行转换相同的错误
+        return transpile(code, **options)
+    return python_code
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    import time
+
+    arg_parser = argparse.ArgumentParser(description="多进程转换单个大文件")
+    arg_parser.add_argument("file")
+    arg_parser.add_argument("--workers", type=int, help="进程数（默认 CPU 核数）")
+    arg_parser.add_argument(
+        "--tail-calls", action="store_true", help="把过程/函数的自身尾调用改写为循环"
+    )
+    args = arg_parser.parse_args()
+
+    with open(args.file, "r", encoding="utf8") as fp:
+        source = fp.read()
+    started = time.perf_counter()
+    output = transpile_parallel(source, args.workers, tail_calls=args.tail_calls)
+    print(f"{args.file}: {(time.perf_counter() - started) * 1000:.1f} ms", file=sys.stderr)
+    with open(args.file + ".py", "w", encoding="utf-8") as fp:
+        fp.write(output)
@@ -1,7 +1,22 @@
 from __future__ import annotations
 import re
 import json
-from typing import Optional, Any
+import time
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from typing import Optional, Any, Callable, Iterator
+
+from analysis import pure_functions
+from astio import dump_binary, dump_json, load_binary, loads_binary
+from semantic import SymbolTable, resolve
+from optimizer import (
+    build_string_accumulators,
+    eliminate_tail_calls,
+    canonicalize_counter_loops,
+    hoist_loop_invariants,
+    vectorize_array_loops,
+)
 
 
 class Tokenizer:
@@ -101,16 +116,42 @@ class Tokenizer:
 
     token_specs = empty + keywords + binary_operators + functions + specs
 
-    def __init__(self, code: str) -> None:
+    # 所有 Tokenizer 默认共用的行缓存（None 表示不缓存），批量处理时设置
+    line_cache: Optional[LineTokenCache] = None
+
+    def __init__(self, code: str, line_cache: Optional[LineTokenCache] = None) -> None:
         self.code = code
+        if line_cache is not None:
+            self.line_cache = line_cache
 
     def tokenize(self) -> list[Token]:
-        code = self.code
+        cache = self.line_cache
+        if cache is None:
+            return self.scan(self.code)
+        # 除了跨行的字符串，Token 都不会跨行，所以每行可以单独词法分析。
+        # 跨行字符串的开头一行单独分析必然失败（引号不配对），此时整段重新分析
+        tokens = []
+        for line, text in enumerate(self.code.split("\n"), 1):
+            entry = cache.get(text)
+            if entry is None:
+                try:
+                    entry = tuple(
+                        (token._type, token.value, token.start, token.end)
+                        for token in self.scan(text)
+                    )
+                except SyntaxError:
+                    return self.scan(self.code)
+                cache.put(text, entry)
+            tokens.extend(Token(kind, value, line, start, end) for kind, value, start, end in entry)
+        return tokens
+
+    def scan(self, code: str) -> list[Token]:
+        """逐个匹配 token_specs，不使用行缓存"""
         tokens = []
         pos = 0
         line = 1
         last_col_num = 0
-        while pos < len(self.code):
+        while pos < len(code):
             for pattern, token_type in self.token_specs:
                 regex = re.compile(pattern)
                 match = regex.match(code, pos)
@@ -137,6 +178,38 @@ class Tokenizer:
         return tokens
 
 
+class LineTokenCache:
+    """按行内容缓存该行 Token（不含行号）的 LRU 缓存
+
+    同一作业的提交大多包含相同的行（老师给出的声明与过程），批量处理时
+    这些行只需词法分析一次。缓存最多保存 max_lines 行，超过 max_length
+    个字符的行不缓存，内存占用有上限。
+    """
+
+    def __init__(self, max_lines: int = 4096, max_length: int = 256) -> None:
+        self.max_lines = max_lines
+        self.max_length = max_length
+        self.lines: OrderedDict[str, tuple] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text: str) -> Optional[tuple]:
+        entry = self.lines.get(text)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.lines.move_to_end(text)
+        return entry
+
+    def put(self, text: str, entry: tuple) -> None:
+        if len(text) > self.max_length:
+            return
+        self.lines[text] = entry
+        if len(self.lines) > self.max_lines:
+            self.lines.popitem(last=False)
+
+
 class Token:
     def __init__(self, types: str, value: Any, line: int, start: int, end: int) -> None:
         self._type = types
@@ -163,11 +236,44 @@ class Token:
 
 ############
 class Parser:
-    def __init__(self, tokens: list[Token]) -> None:
+    # 错误恢复时用于同步的语句关键字
+    statement_keywords = (
+        "DECLARE", "CONSTANT", "IF", "WHILE", "REPEAT", "FOR", "CALL", "OPENFILE",
+        "READFILE", "WRITEFILE", "CLOSEFILE", "INPUT", "OUTPUT", "CASE",
+        "PROCEDURE", "FUNCTION", "RETURN",
+    )
+    # 块语句 -> 它的分隔词与结尾词
+    block_terminators = {
+        "IF": ("ELSE", "ENDIF"),
+        "WHILE": ("ENDWHILE",),
+        "REPEAT": ("UNTIL",),
+        "FOR": ("NEXT",),
+        "CASE": ("OTHERWISE", "ENDCASE"),
+        "PROCEDURE": ("ENDPROCEDURE",),
+        "FUNCTION": ("ENDFUNCTION",),
+    }
+    terminator_types = tuple(t for ts in block_terminators.values() for t in ts)
+    # 可以在多处共享的（之后不再修改的）表达式节点
+    shared_types = (
+        "Identifier", "Literal", "UnaryExpression", "BinaryExpression", "FunctionCall", "ArrayAccess",
+    )
+
+    def __init__(
+        self, tokens: list[Token], recover: bool = False, share_subtrees: bool = False
+    ) -> None:
         self.tokens = tokens
         self.pos = 0
         self.current_token = self.tokens[0] if tokens else None
         self.scope_stack = [{}]  # 作用域栈，初始为全局作用域
+        # 错误恢复模式：出错的语句被跳过并记录在 diagnostics 中，解析继续进行
+        self.recover = recover
+        self.diagnostics: list[dict] = []
+        self.open_blocks: list[tuple[str, ...]] = []  # 正在解析的块体的结尾词
+        self.orphans: list[tuple[str, ...]] = []  # 头部出错的块留下的结尾词
+        self.bodies_opened = 0
+        # 结构相同的表达式节点只保留一份（不记录位置）：结构键 -> 节点
+        self.share_subtrees = share_subtrees
+        self.shared_nodes: dict[tuple, dict] = {}
 
     def enter_scope(self) -> None:
         self.scope_stack.append({})
@@ -178,6 +284,33 @@ class Parser:
     def declare_identifier(self, name: str, data_type: str) -> None:
         self.scope_stack[-1][name] = data_type
 
+    def mark(self, node: dict, token: Optional[Token]) -> dict:
+        """记录节点对应的源代码位置（line / column 取自节点的第一个 Token）"""
+        if self.share_subtrees and node and node["type"] in self.shared_types:
+            return self.share(node)
+        if node and token is not None and "line" not in node:
+            node["line"] = token.line
+            node["column"] = token.start
+        return node
+
+    def share(self, node: dict) -> dict:
+        """返回与 node 结构相同的共享节点（子节点已经共享，按 id 比较即可）"""
+        node_type = node["type"]
+        if node_type == "Identifier":
+            key = (node_type, node["name"])
+        elif node_type == "Literal":
+            # 记下值的类型，区分 1、1.0 与 TRUE
+            key = (node_type, type(node["value"]), node["value"])
+        else:
+            # 同类型节点的字段顺序相同，只取值即可
+            key = tuple(
+                id(value) if isinstance(value, dict)
+                else tuple(map(id, value)) if isinstance(value, list)
+                else value
+                for value in node.values()
+            )
+        return self.shared_nodes.setdefault(key, node)
+
     def get_identifier_type(self, identifier: dict) -> str:
         """获取标识符的类型"""
         if identifier["type"] == "Identifier":
@@ -217,11 +350,101 @@ class Parser:
     def parse_program(self) -> dict:
         """Program ::= Statement+"""
         statements = []
+        first_token = self.current_token
         while self.current_token:
-            stmt = self.parse_statement()
+            if self.recover and self.skip_orphan():
+                continue
+            stmt = self.parse_statement_or_recover()
             if stmt:
                 statements.append(stmt)
-        return {"type": "Program", "statements": statements}
+        return self.mark({"type": "Program", "statements": statements}, first_token)
+
+    def parse_block(self, terminators: tuple[str, ...]) -> list[dict]:
+        """解析块体中的语句，直到 terminators 中的结尾词（不消耗结尾词）"""
+        body = []
+        if not self.recover:
+            while self.current_token and self.current_token.type not in terminators:
+                body.append(self.parse_statement())
+            return body
+        self.bodies_opened += 1
+        self.open_blocks.append(terminators)
+        orphans = len(self.orphans)
+        try:
+            while self.current_token and self.current_token.type not in terminators:
+                if self.skip_orphan():
+                    continue
+                if any(self.current_token.type in outer for outer in self.open_blocks[:-1]):
+                    # 外层块的结尾词：本块缺少结尾词，交给调用者报告
+                    break
+                stmt = self.parse_statement_or_recover()
+                if stmt:
+                    body.append(stmt)
+        finally:
+            self.open_blocks.pop()
+            del self.orphans[orphans:]
+        return body
+
+    def parse_statement_or_recover(self) -> dict:
+        """恢复模式下，出错的语句记录诊断信息后同步到下一条语句，返回 {}"""
+        if not self.recover:
+            return self.parse_statement()
+        start, opened = self.pos, self.bodies_opened
+        try:
+            return self.parse_statement()
+        except SyntaxError as error:
+            self.report(error)
+            keyword = self.tokens[start].type
+            if keyword in self.block_terminators and self.bodies_opened == opened:
+                # 块头部出错，块体会被当作外层语句解析，之后遇到的结尾词直接跳过
+                self.orphans.append(self.block_terminators[keyword])
+            self.synchronize(start, getattr(error, "token", None))
+            return {}
+
+    def report(self, error: SyntaxError) -> None:
+        token = getattr(error, "token", None) or self.current_token or self.tokens[-1]
+        self.diagnostics.append(
+            {"line": token.line, "column": token.start, "message": str(error)}
+        )
+
+    def synchronize(self, start: int, error_token: Optional[Token] = None) -> None:
+        """跳过出错行余下的 Token，停在下一行、语句关键字或块结尾词处"""
+        if (
+            error_token is not None
+            and self.pos - 1 > start
+            and self.tokens[self.pos - 1] is error_token
+            and error_token.type in self.statement_keywords + self.terminator_types
+        ):
+            # 出错的 Token 是下一条语句的开头或块结尾词（例如表达式缺少右操作数），退回到它
+            self.pos -= 1
+            self.current_token = error_token
+            return
+        if self.pos == start:
+            self.consume()
+        line = self.tokens[self.pos - 1].line
+        while (
+            self.current_token
+            and self.current_token.line == line
+            and self.current_token.type not in self.statement_keywords
+            and self.current_token.type not in self.terminator_types
+        ):
+            self.consume()
+
+    def skip_orphan(self) -> bool:
+        """跳过头部出错的块留下的分隔词/结尾词（NEXT 后的变量、UNTIL 后的条件一并跳过）"""
+        if not self.orphans or self.current_token.type not in self.orphans[-1]:
+            return False
+        token = self.consume()
+        if token.type == self.orphans[-1][-1]:
+            self.orphans.pop()
+        if token.type == "NEXT" and self.current_token and self.current_token.type == "VARIDENTIFIER":
+            self.consume()
+        elif token.type == "UNTIL":
+            try:
+                self.parse_expression()
+            except SyntaxError as error:
+                self.report(error)
+                self.synchronize(self.pos, getattr(error, "token", None))
+        return True
 
     def parse_statement(self) -> dict:
         """Statement ::= Declaration | Assignment | ControlStructure | IOStatement | ProcedureCall | ReturnStatement"""
@@ -238,9 +461,15 @@ class Parser:
         elif token_type == "CONSTANT":
             result = self.parse_constant()
 
-        # 控制结构
-        elif token_type in ("IF", "WHILE", "REPEAT", "FOR"):
-            result = self.parse_control_structure()
+        # 控制结构（直接分派：每层嵌套少占一个栈帧，抵消 parse_block 多出的一层）
+        elif token_type == "IF":
+            result = self.parse_if_statement()
+        elif token_type == "WHILE":
+            result = self.parse_while_loop()
+        elif token_type == "REPEAT":
+            result = self.parse_repeat_loop()
+        elif token_type == "FOR":
+            result = self.parse_for_loop()
 
         # 过程调用
         elif token_type == "CALL":
@@ -272,7 +501,7 @@ class Parser:
 
         # case 语句
         elif token_type == "CASE":
-            return self.parse_case()
+            result = self.parse_case()
 
         # 过程定义
         elif token_type == "PROCEDURE":
@@ -292,7 +521,7 @@ class Parser:
                 "type": "ExpressionStatement",
                 "expression": self.parse_expression(),
             }
-        return result
+        return self.mark(result, token)
 
     def parse_return(self) -> dict:
         """RETURN <expression>"""
@@ -331,17 +560,13 @@ class Parser:
             self.consume("COLON")
 
             # 解析分支语句块
-            stmt = self.parse_statement()
+            stmt = self.parse_statement_or_recover()
             cases.append({"condition": condition, "body": stmt})
 
         # 处理OTHERWISE分支
         if self.current_token and self.current_token.type == "OTHERWISE":
             self.consume("OTHERWISE")
-            otherwise = []
-            while self.current_token and self.current_token.type != "ENDCASE":
-                stmt = self.parse_statement()
-                if stmt:
-                    otherwise.append(stmt)
+            otherwise = [stmt for stmt in self.parse_block(("ENDCASE",)) if stmt]
 
         # 验证ENDCASE
         if not self.current_token or self.current_token.type != "ENDCASE":
@@ -411,7 +636,7 @@ class Parser:
         params = []
         while self.current_token and self.current_token.type != "RPAREN":
             params.append(self.parse_expression())
-            if self.current_token.type == "COMMA":
+            if self.current_token and self.current_token.type == "COMMA":
                 self.consume("COMMA")
         self.consume("RPAREN")
         return {
@@ -490,9 +715,7 @@ class Parser:
         self.enter_scope()
         for param in parameters:
             self.declare_identifier(param["identifier"], param["data_type"])
-        body = []
-        while self.current_token and self.current_token.type != end_keyword:
-            body.append(self.parse_statement())
+        body = self.parse_block((end_keyword,))
         self.exit_scope()
 
         # 消耗结尾词
@@ -560,15 +783,17 @@ class Parser:
         return declaration
 
     def parse_data_type(self, identifier: str = "") -> dict:
-        if not self.current_token:
+        token = self.current_token
+        if not token:
             raise SyntaxError("Expected DATATYPE")
-        if self.current_token.type == "ARRAY":
+        if token.type == "ARRAY":
             # 数组声明
-            return self.parse_array_declaration(identifier, "ArrayDeclaration")
+            node = self.parse_array_declaration(identifier, "ArrayDeclaration")
         else:
-            return self.parse_simple_variable_declaration(
+            node = self.parse_simple_variable_declaration(
                 identifier, "SimpleVariableDeclaration"
             )
+        return self.mark(node, token)
 
     def parse_simple_variable_declaration(
         self, identifier: str, node_type: str
@@ -629,11 +854,12 @@ class Parser:
         if token and token.type in Tokenizer.unary_operators_types:
             self.consume()
             operand = self.parse_primary()
-            return {
+            node = {
                 "type": "UnaryExpression",
                 "operator": token.type,
                 "operand": operand,
             }
+            return self.mark(node, token)
         return self.parse_binary_expression(0)
 
     def get_precedence(self, token_type: str) -> int:
@@ -659,6 +885,7 @@ class Parser:
 
     def parse_binary_expression(self, min_precedence: int) -> dict:
         """递归处理二元表达式"""
+        start_token = self.current_token
         left = self.parse_primary()
 
         while True:
@@ -684,6 +911,7 @@ class Parser:
                 "left": left,
                 "right": right,
             }
+            left = self.mark(left, start_token)
 
         return left
 
@@ -698,47 +926,53 @@ class Parser:
             # 处理数组索引 x[1, 2]
             if self.current_token and self.current_token.type == "LBRACKET":
                 self.consume("LBRACKET")
-                return self.parse_indexing(token.value)
+                return self.mark(self.parse_indexing(token.value), token)
 
             # 函数调用
             elif self.current_token and self.current_token.type == "LPAREN":
                 self.consume("LPAREN")
-                return self.parse_function_procedure_call("FunctionCall", token.value)
+                tree = self.parse_function_procedure_call("FunctionCall", token.value)
+                return self.mark(tree, token)
 
             # 普通标识符
-            return {"type": "Identifier", "name": token.value}
+            return self.mark({"type": "Identifier", "name": token.value}, token)
 
         # 字面量
         elif token.type in ("NUMBER", "STRING", "BOOLEAN"):
-            return {"type": "Literal", "value": self.process_literal_value(token)}
+            node = {"type": "Literal", "value": self.process_literal_value(token)}
+            return self.mark(node, token)
 
         # 多层函数调用 IDENTIFIER(IDENTIFIER...)(IDENTIFIER...)
         elif token.type == "LPAREN":
             tree = self.parse_function_procedure_call("FunctionCall", "-")
             tree["start"] = "backslash"
-            return tree
+            return self.mark(tree, token)
         
         # 复杂索引 IDENTIFIER(IDENTIFIER...)[IDENTIFIER...]
         elif token.type == "LBRACKET":
             tree = self.parse_indexing("-")
             tree["start"] = "backslash"
-            return tree
+            return self.mark(tree, token)
         
         # 默认函数调用
         elif token.type in [f[1] for f in Tokenizer.functions]:
             self.consume("LPAREN")
-            return self.parse_function_procedure_call("FunctionCall", token.type)
+            tree = self.parse_function_procedure_call("FunctionCall", token.type)
+            return self.mark(tree, token)
 
         elif token.type in Tokenizer.unary_operators_types:
             operand = self.parse_primary()
-            return {
+            node = {
                 "type": "UnaryExpression",
                 "operator": token.type,
                 "operand": operand,
             }
+            return self.mark(node, token)
 
         else:
-            raise SyntaxError(f"Unexpected token: {token}")
+            error = SyntaxError(f"Unexpected token: {token}")
+            error.token = token  # 出错的 Token 已被消耗，诊断位置取自它
+            raise error
 
     def parse_if_statement(self) -> dict:
         """IF语句解析"""
@@ -747,16 +981,13 @@ class Parser:
         self.consume("THEN")
 
         # 解析THEN块
-        then_block = []
-        while self.current_token and self.current_token.type not in ("ELSE", "ENDIF"):
-            then_block.append(self.parse_statement())
+        then_block = self.parse_block(("ELSE", "ENDIF"))
 
         # 解析ELSE块
         else_block = []
         if self.current_token and self.current_token.type == "ELSE":
             self.consume("ELSE")
-            while self.current_token and self.current_token.type != "ENDIF":
-                else_block.append(self.parse_statement())
+            else_block = self.parse_block(("ENDIF",))
 
         self.consume("ENDIF")
         return {
@@ -766,27 +997,10 @@ class Parser:
             "else_block": else_block,
         }
 
-    def parse_control_structure(self) -> dict:
-        if not self.current_token:
-            raise SyntaxError("Unexpected end of input")
-        token_type = self.current_token.type
-        if token_type == "IF":
-            return self.parse_if_statement()
-        elif token_type == "REPEAT":
-            return self.parse_repeat_loop()
-        elif token_type == "WHILE":
-            return self.parse_while_loop()
-        elif token_type == "FOR":
-            return self.parse_for_loop()
-        else:
-            raise SyntaxError(f"Unsupported control structure: {token_type}")
-
     def parse_repeat_loop(self) -> dict:
         """REPEAT...UNTIL结构"""
         self.consume("REPEAT")
-        body = []
-        while self.current_token and self.current_token.type != "UNTIL":
-            body.append(self.parse_statement())
+        body = self.parse_block(("UNTIL",))
         self.consume("UNTIL")
         condition = self.parse_expression()
         return {"type": "RepeatLoop", "body": body, "condition": condition}
@@ -796,9 +1010,7 @@ class Parser:
         self.consume("WHILE")
         condition = self.parse_expression()
         self.consume("DO")
-        body = []
-        while self.current_token and self.current_token.type != "ENDWHILE":
-            body.append(self.parse_statement())
+        body = self.parse_block(("ENDWHILE",))
         self.consume("ENDWHILE")
         return {"type": "WhileLoop", "condition": condition, "body": body}
 
@@ -817,9 +1029,7 @@ class Parser:
         if self.current_token and self.current_token.type == "STEP":
             self.consume("STEP")
             step = self.parse_expression()
-        body = []
-        while self.current_token and self.current_token.type != "NEXT":
-            body.append(self.parse_statement())
+        body = self.parse_block(("NEXT",))
         self.consume("NEXT")
         id_token = self.consume("VARIDENTIFIER")  # 检查循环变量是否匹配
         if not id_token:
@@ -926,6 +1136,43 @@ import random
 
 def RANDOM():
     return random.random()
+"""
+    memoize_pre_string = """
+import functools
+
+"""
+    # 整段数组操作：下标都在范围内时用切片，否则逐个访问以保留原来的越界行为
+    array_slice_pre_string = """
+def __array_slice(a: list, lo: int, hi: int) -> list:
+    if 0 <= lo <= hi <= len(a):
+        return a[lo:hi]
+    return [a[i] for i in range(lo, hi)]
+
+"""
+    # value 为无参函数：没有元素时不求值，与零次迭代的循环一样不会出错
+    array_fill_pre_string = """
+def __array_fill(a: list, lo: int, hi: int, value) -> None:
+    if lo >= hi:
+        return
+    value = value()
+    if 0 <= lo <= hi <= len(a):
+        a[lo:hi] = [value] * (hi - lo)
+    else:
+        for i in range(lo, hi):
+            a[i] = value
+
+"""
+    array_count_pre_string = """
+def __array_count(a: list, lo: int, hi: int, value) -> int:
+    elements = __array_slice(a, lo, hi)
+    return elements.count(value()) if elements else 0
+
+"""
+    # REAL 的求和：sum() 在 Python 3.12 起对浮点数做补偿求和，舍入与逐次累加不同
+    array_fold_pre_string = """
+import functools
+import operator
+
 """
     pre_string_dic = {
         "DIV": div_pre_string,
@@ -969,13 +1216,155 @@ def RANDOM():
         "NOT": "not",
     }
 
-    def __init__(self) -> None:
+    expression_types = {
+        "Identifier",
+        "Literal",
+        "UnaryExpression",
+        "BinaryExpression",
+        "FunctionCall",
+        "ArrayAccess",
+        "Parenthesis",
+        "InvariantValue",
+    }
+    # 共享子树时缓存代码的复合表达式（叶子节点直接生成更快）
+    remembered_types = {"UnaryExpression", "BinaryExpression", "FunctionCall", "ArrayAccess"}
+    # 行号标记：repr() 会转义 \x00，所以它不会出现在生成代码的其他位置
+    line_mark_re = re.compile(r"\x00(\d+)\x00")
+
+    def __init__(
+        self,
+        stats: Optional[Stats] = None,
+        source_map: bool = False,
+        memoize: bool = False,
+        memo_cache_size: int = 1024,
+        memo_stats: bool = False,
+        tail_calls: bool = False,
+        case_dispatch: bool = False,
+        hoist_invariants: bool = False,
+        string_builders: bool = False,
+        vectorize: bool = False,
+        share_subtrees: bool = False,
+        resolve_symbols: bool = False,
+        counter_loops: bool = False,
+    ) -> None:
+        if share_subtrees and resolve_symbols:
+            # 共享的 Identifier 节点可能出现在不同作用域中，无法记下唯一的符号
+            raise ValueError("resolve_symbols cannot be combined with share_subtrees")
         self.pre_string = ""
+        self.stats = stats
+        # 纯函数自动加 functools.lru_cache（见 analysis.pure_functions）
+        self.memoize = memoize
+        self.memo_cache_size = memo_cache_size
+        self.memo_stats = memo_stats
+        self.memoized: set[str] = set()
+        # 自身尾调用改写为循环（见 optimizer.eliminate_tail_calls）
+        self.tail_calls = tail_calls
+        # 分支标签全为字面量的 CASE 用查表代替 if/elif 链
+        self.case_dispatch = case_dispatch
+        self.case_tables = 0
+        # 循环不变的字符串函数调用只计算一次（见 optimizer.hoist_loop_invariants）
+        self.hoist_invariants = hoist_invariants
+        # 循环内的字符串累加改为列表缓冲（见 optimizer.build_string_accumulators）
+        self.string_builders = string_builders
+        # 数组求和、填充、最值、计数循环改为整段操作（见 optimizer.vectorize_array_loops）
+        self.vectorize = vectorize
+        # 计数器驱动的 WHILE / REPEAT 改为 range 上的 for（见 optimizer.canonicalize_counter_loops）
+        self.counter_loops = counter_loops
+        # source_map[i] 为生成代码第 i + 1 行对应的伪代码行号
+        self.source_map: Optional[list[Optional[int]]] = [] if source_map else None
+        # 共享子树（Parser(share_subtrees=True)）的代码只生成一次：id(节点) -> (节点, 代码)，
+        # 同时保存节点，防止 id 被复用
+        self.expression_code: Optional[dict[int, tuple[dict, str]]] = {} if share_subtrees else None
+        # 生成代码前解析所有名字（见 semantic.resolve），INPUT 按解析出的类型转换
+        self.resolve_symbols = resolve_symbols
+        self.symbols: Optional[SymbolTable] = None
+        # 只在需要时包装代码生成入口，避免常规转换的额外开销
+        if source_map:
+            self.ast_to_python = self._with_line_marks(self.ast_to_python)
+        if stats is not None:
+            self.ast_to_python = self._with_timing(self.ast_to_python)
+
+    def _with_timing(self, generate: Callable[[dict], str]) -> Callable[[dict], str]:
+        """记录各节点类型代码生成的自身耗时（不含子节点）"""
+        child_time = []
+        stats = self.stats
+
+        def timed_generate(ast: dict) -> str:
+            child_time.append(0.0)
+            start = time.perf_counter()
+            try:
+                return generate(ast)
+            finally:
+                elapsed = time.perf_counter() - start
+                stats.add_node_time(ast["type"], elapsed - child_time.pop())
+                if child_time:
+                    child_time[-1] += elapsed
+
+        return timed_generate
+
+    def _with_line_marks(self, generate: Callable[[dict], str]) -> Callable[[dict], str]:
+        """在每条语句代码的首行末尾插入行号标记，整个程序生成后再剥离成 source_map"""
+
+        def marked_generate(ast: dict) -> str:
+            code = generate(ast)
+            if ast["type"] == "Program":
+                return self._strip_line_marks(code)
+            if code and "line" in ast and ast["type"] not in self.expression_types:
+                first, sep, rest = code.partition("\n")
+                code = f"{first}\x00{ast['line']}\x00{sep}{rest}"
+            return code
+
+        return marked_generate
+
+    def _strip_line_marks(self, code: str) -> str:
+        lines = code.split("\n")
+        self.source_map = []
+        marks = []  # (缩进宽度, 伪代码行号)
+        for i, text in enumerate(lines):
+            found = self.line_mark_re.findall(text)
+            if found:
+                text = lines[i] = self.line_mark_re.sub("", text)
+            width = len(text) - len(text.lstrip(" "))
+            if found:
+                while marks and marks[-1][0] >= width:
+                    marks.pop()
+                marks.append((width, int(found[0])))
+                self.source_map.append(int(found[0]))
+            elif text.strip():
+                # 没有标记的行（else:、REPEAT 的退出判断等）归属于缩进不超过它的最近一条语句
+                while marks and marks[-1][0] > width:
+                    marks.pop()
+                self.source_map.append(marks[-1][1] if marks else None)
+            else:
+                self.source_map.append(None)
+        return "\n".join(lines)
+
+    def binary_to_python(self, data: bytes) -> str:
+        """由 astio 二进制格式的语法树生成 Python 代码（解析可以在别处完成）"""
+        return self.ast_to_python(loads_binary(data))
 
     def ast_to_python(self, ast: dict) -> str:
         """将语法树转换为Python代码"""
         ast_type = ast["type"]
+        if self.expression_code is not None and ast_type in self.remembered_types:
+            cached = self.expression_code.get(id(ast))
+            if cached is not None:
+                return cached[1]
         if ast_type == "Program":
+            if self.tail_calls:
+                eliminate_tail_calls(ast)
+            if self.hoist_invariants:
+                hoist_loop_invariants(ast)
+            if self.string_builders:
+                build_string_accumulators(ast)
+            if self.vectorize:
+                vectorize_array_loops(ast)
+            if self.counter_loops:
+                canonicalize_counter_loops(ast)
+            if self.memoize:
+                self.memoized = pure_functions(ast)
+            if self.resolve_symbols:
+                self.symbols = resolve(ast)
             code = ""
             for stmt in ast["statements"]:
                 if stmt.get("expression", {}).get("start", "") == "backslash":
@@ -983,6 +1372,12 @@ def RANDOM():
                 else:
                     code += "\n"
                 code += self.ast_to_python(stmt)
+            if self.memo_stats and self.memoized:
+                names = ", ".join(sorted(self.memoized))
+                code += (
+                    f"\nimport sys\nfor __fn in ({names},):\n"
+                    f"    print(__fn.__name__, __fn.cache_info(), file=sys.stderr)"
+                )
             return self.pre_string + code
 
         elif ast_type == "SimpleVariableDeclaration":
@@ -1029,10 +1424,10 @@ def RANDOM():
             return repr(ast["value"])
 
         elif ast_type == "UnaryExpression":
-            return f"{self.operator_dic[ast['operator']]}({self.ast_to_python(ast['operand'])})"
+            return self.remember(ast, f"{self.operator_dic[ast['operator']]}({self.ast_to_python(ast['operand'])})")
 
         elif ast_type == "BinaryExpression":
-            return f"{self.ast_to_python(ast['left'])} {self.operator_dic[ast['operator']]} {self.ast_to_python(ast['right'])}"
+            return self.remember(ast, f"{self.ast_to_python(ast['left'])} {self.operator_dic[ast['operator']]} {self.ast_to_python(ast['right'])}")
 
         elif ast_type == "IfStatement":
             then_block = "\n".join(
@@ -1070,14 +1465,14 @@ def RANDOM():
             ):
                 self.pre_string += self.pre_string_dic[ast["function"]]
             args = ", ".join(self.ast_to_python(arg) for arg in ast["arguments"])
-            return f"{ast['function'] if ast['function'] != '-' else ''}({args})"
+            return self.remember(ast, f"{ast['function'] if ast['function'] != '-' else ''}({args})")
 
         elif ast_type == "ReturnStatement":
             return f"return {self.ast_to_python(ast['expression'])}"
 
         elif ast_type == "InputStatement":
             return "\n".join(
-                f'{self.ast_to_python(elem["identifier"])} = {self.data_type_conv[elem["identifier_type"]]}(input())'
+                f'{self.ast_to_python(elem["identifier"])} = {self.data_type_conv[self.input_type(elem)]}(input())'
                 for elem in ast["elements"]
             )
 
@@ -1091,7 +1486,7 @@ def RANDOM():
             indices = "".join(
                 f"[{self.ast_to_python(index)}]" for index in ast["indices"]
             )
-            return f"{ast['array'] if ast['array'] != '-' else ''}{indices}"
+            return self.remember(ast, f"{ast['array'] if ast['array'] != '-' else ''}{indices}")
 
         elif ast_type == "OpenFile":
             return f"with open(\"{ast['file']}\", '{ast['mode'][0].lower()}') as __fp:\n    pass"
@@ -1106,6 +1501,9 @@ def RANDOM():
             return f"with open(\"{ast['file']}\", 'w') as __fp:\n    __fp.write({ast['target']['name']})"
 
         elif ast_type == "CaseStatement":
+            labels = self.case_labels(ast) if self.case_dispatch else None
+            if labels is not None:
+                return self.case_dispatch_to_python(ast, labels)
             cases = f"__case = {self.ast_to_python(ast['expression'])}\n"
             for i, case in enumerate(ast["cases"]):
                 if_key = "elif"
@@ -1129,6 +1527,8 @@ def RANDOM():
                 for param in ast["parameters"]
             )
             body = "\n".join(self.ast_to_python(stmt) for stmt in ast["body"])
+            if ast.get("tail_loop"):
+                body = self.tail_loop(ast, body, "return")
             return f"def {ast['name']}({params}) -> None:\n{indent(body)}"
 
         elif ast_type == "FunctionDeclaration":
@@ -1137,43 +1537,479 @@ def RANDOM():
                 for param in ast["parameters"]
             )
             body = "\n".join(self.ast_to_python(stmt) for stmt in ast["body"])
+            if ast.get("tail_loop"):
+                body = self.tail_loop(ast, body, "return None")
             return_type = (
                 "list"
                 if ast["return_type"]["is_array"]
                 else self.data_type_conv[ast["return_type"]["data_type"]]
             )
-            return f"def {ast['name']}({params}) -> {return_type}:\n{indent(body)}"
+            decorator = ""
+            if ast["name"] in self.memoized:
+                if self.memoize_pre_string not in self.pre_string:
+                    self.pre_string += self.memoize_pre_string
+                decorator = f"@functools.lru_cache(maxsize={self.memo_cache_size}, typed=True)\n"
+            return f"{decorator}def {ast['name']}({params}) -> {return_type}:\n{indent(body)}"
 
         elif ast_type == "ExpressionStatement":
             return self.ast_to_python(ast["expression"])
 
+        elif ast_type == "TailCall":
+            # 同时给参数赋新值，然后回到函数体开头
+            if not ast["parameters"]:
+                return "continue"
+            args = ", ".join(self.ast_to_python(arg) for arg in ast["arguments"])
+            return f"{', '.join(ast['parameters'])} = {args}\ncontinue"
+
+        elif ast_type == "StringBuilderStart":
+            return f"{ast['buffer']} = [{ast['name']}]"
+
+        elif ast_type == "StringBuilderAppend":
+            items = [self.ast_to_python(expr) for expr in ast["expressions"]]
+            if len(items) == 1:
+                return f"{ast['buffer']}.append({items[0]})"
+            return f"{ast['buffer']}.extend(({', '.join(items)}))"
+
+        elif ast_type == "StringBuilderEnd":
+            return f"{ast['name']} = ''.join({ast['buffer']})"
+
+        elif ast_type == "ArrayReduction":
+            return self.array_reduction_to_python(ast)
+
+        elif ast_type == "InvariantValue":
+            # 循环中第一次执行到时计算，之后取临时变量中的值（LENGTH 等不会返回 None）
+            name = ast["name"]
+            return f"({name} if {name} is not None else ({name} := {self.ast_to_python(ast['expression'])}))"
+
+        elif ast_type == "CountedLoop":
+            return self.counted_loop_to_python(ast)
+
         elif ast_type == "Parenthesis":
             return f"({self.ast_to_python(ast['operand'])})"
 
         else:
             raise ValueError(f"Unknown AST node type: {ast['type']}")
 
+    def tail_loop(self, ast: dict, body: str, exit: str) -> str:
+        """尾调用改写后的函数体：循环体末尾不是尾调用或 RETURN 时才需要 exit 退出循环"""
+        if ast["body"] and ast["body"][-1].get("type") in ("TailCall", "ReturnStatement"):
+            return f"while True:\n{indent(body)}"
+        return f"while True:\n{indent(body)}\n    {exit}"
+
+    def input_type(self, element: dict) -> str:
+        """INPUT 变量的类型：名字已解析时取符号的类型，否则取解析时按声明顺序得到的类型"""
+        resolved = element["identifier"].get("symbol_type")
+        return resolved if resolved in self.data_type_conv else element["identifier_type"]
+
+    def remember(self, ast: dict, code: str) -> str:
+        """记录复合表达式节点的代码，见 remembered_types"""
+        if self.expression_code is not None:
+            self.expression_code[id(ast)] = (ast, code)
+        return code
+
+    def array_reduction_to_python(self, ast: dict) -> str:
+        """ArrayReduction：FOR 循环改写成的整段数组操作"""
+        array = self.ast_to_python(ast["array"])
+        bounds = f"{self.ast_to_python(ast['start'])}, {self.ast_to_python(ast['end'])}"
+        if ast["kind"] == "fill":
+            if self.array_fill_pre_string not in self.pre_string:
+                self.pre_string += self.array_fill_pre_string
+            return f"__array_fill({array}, {bounds}, lambda: {self.ast_to_python(ast['value'])})"
+        if self.array_slice_pre_string not in self.pre_string:
+            self.pre_string += self.array_slice_pre_string
+        elements = f"__array_slice({array}, {bounds})"
+        target = self.ast_to_python(ast["target"])
+        if ast["kind"] == "sum":
+            # 只用于整数：以原值为初值相加，结果与逐次累加相同
+            return f"{target} = sum({elements}, {target})"
+        if ast["kind"] == "fold":
+            # 以原值为初值从左到右逐个相加，浮点舍入与原循环一致
+            if self.array_fold_pre_string not in self.pre_string:
+                self.pre_string += self.array_fold_pre_string
+            return f"{target} = functools.reduce(operator.add, {elements}, {target})"
+        if ast["kind"] == "count":
+            if self.array_count_pre_string not in self.pre_string:
+                self.pre_string += self.array_count_pre_string
+            value = self.ast_to_python(ast["value"])
+            return f"{target} = {target} + __array_count({array}, {bounds}, lambda: {value})"
+        return f"{target} = {ast['kind']}({target}, {ast['kind']}({elements}, default={target}))"
+
+    def counted_loop_to_python(self, ast: dict) -> str:
+        """CountedLoop：WHILE / REPEAT 改写成的 range 上的 for 循环"""
+        variable, counter, step = ast["variable"], ast["range"], ast["step"]
+        stop = self.ast_to_python(ast["stop"])
+        if ast["at_least_once"]:
+            # REPEAT 的循环体至少执行一次
+            stop = f"max({stop}, {variable} + 1)" if step > 0 else f"min({stop}, {variable} - 1)"
+        body = "\n".join(self.ast_to_python(stmt) for stmt in ast["body"]) or "pass"
+        # 循环结束后计数器为 range 的下一个值，与原循环退出时相同（零次迭代时不变）
+        return (
+            f"{counter} = range({variable}, {stop}{f', {step}' if step != 1 else ''})\n"
+            f"for {variable} in {counter}:\n{indent(body)}\n"
+            f"{variable} = {counter}.start + len({counter}) * {counter}.step"
+        )
+
+    # 分支少于该数量时 if/elif 链已经足够快
+    case_dispatch_min = 4
+
+    def case_labels(self, ast: dict) -> Optional[list[Any]]:
+        """CASE 的全部分支标签都是字面量时返回标签值，否则返回 None"""
+        if len(ast["cases"]) < self.case_dispatch_min:
+            return None
+        labels = []
+        for case in ast["cases"]:
+            if case["condition"]["type"] != "Literal":
+                return None
+            labels.append(case["condition"]["value"])
+        return labels
+
+    def case_dispatch_to_python(self, ast: dict, labels: list[Any]) -> str:
+        """字面量 CASE：模块级字典把标签映射到分支，查表 O(1)
+
+        每个分支（含 OTHERWISE）都只是给同一变量赋字面量时，字典直接存放赋的值；
+        否则字典给出分支序号，再用二分的 if 树选择分支，比较次数为 O(log 分支数)。
+        """
+        self.case_tables += 1
+        table_name = f"__CASE_{self.case_tables}"
+        expression = self.ast_to_python(ast["expression"])
+        bodies = [case["body"] for case in ast["cases"]]
+        otherwise = ast.get("otherwise") or []
+
+        assigned = [self._literal_assignment(body) for body in bodies + otherwise]
+        targets = {pair[0] for pair in assigned if pair}
+        if all(assigned) and len(targets) == 1 and len(otherwise) == 1:
+            target = targets.pop()
+            table = {}
+            for label, (_, value) in zip(labels, assigned):
+                table.setdefault(label, value)
+            default = repr(assigned[-1][1])
+            self.pre_string += f"\n{table_name} = {table!r}\n"
+            return f"{target} = {table_name}.get({expression}, {default})"
+
+        table = {}
+        for index, label in enumerate(labels):
+            table.setdefault(label, index)
+        self.pre_string += f"\n{table_name} = {table!r}\n"
+        branches = [self.ast_to_python(body) for body in bodies]
+
+        def branch_tree(low: int, high: int) -> str:
+            if high - low == 1:
+                return branches[low]
+            middle = (low + high) // 2
+            return (
+                f"if __case < {middle}:\n{indent(branch_tree(low, middle))}\n"
+                f"else:\n{indent(branch_tree(middle, high))}"
+            )
+
+        code = f"__case = {table_name}.get({expression}, -1)\n"
+        if otherwise:
+            otherwise_code = "\n".join(self.ast_to_python(stmt) for stmt in otherwise)
+            return (
+                f"{code}if __case < 0:\n{indent(otherwise_code)}\n"
+                f"else:\n{indent(branch_tree(0, len(branches)))}"
+            )
+        return f"{code}if __case >= 0:\n{indent(branch_tree(0, len(branches)))}"
+
+    def _literal_assignment(self, stmt: dict) -> Optional[tuple[str, Any]]:
+        """stmt 是 <变量> ← <字面量> 时返回 (变量名, 值)"""
+        expr = stmt.get("expression") if stmt.get("type") == "ExpressionStatement" else None
+        if (
+            expr
+            and expr["type"] == "BinaryExpression"
+            and expr["operator"] == "ASSIGN"
+            and expr["left"]["type"] == "Identifier"
+            and expr["right"]["type"] == "Literal"
+        ):
+            return expr["left"]["name"], expr["right"]["value"]
+        return None
+
 
 def indent(code: str, level: int = 1) -> str:
     """缩进代码"""
     return "\n".join("    " * level + line for line in code.split("\n"))
 
 
+def count_nodes(ast: Any) -> int:
+    """统计语法树中的节点数量"""
+    if isinstance(ast, dict):
+        own = 1 if "type" in ast else 0
+        return own + sum(count_nodes(value) for value in ast.values())
+    if isinstance(ast, list):
+        return sum(count_nodes(item) for item in ast)
+    return 0
+
+
+stats_hooks: list[Callable[[dict], None]] = []
+
+
+def add_stats_hook(hook: Callable[[dict], None]) -> None:
+    """注册统计回调，每次 Stats.publish() 时以 Stats.to_dict() 的结果调用"""
+    stats_hooks.append(hook)
+
+
+class Stats:
+    """转换过程的统计：各阶段耗时、计数、内存峰值与各节点类型的代码生成耗时"""
+
+    def __init__(self, trace_memory: bool = False) -> None:
+        self.trace_memory = trace_memory
+        self.phases: dict[str, dict[str, float]] = {}
+        self.counts: dict[str, int] = {}
+        self.node_times: dict[str, float] = {}
+        self.node_counts: dict[str, int] = {}
+        self.memory_peak: Optional[int] = None
+
+    def __enter__(self) -> Stats:
+        if self.trace_memory:
+            tracemalloc.start()
+        self._total = (time.perf_counter(), time.process_time())
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        wall, cpu = self._total
+        self.add_phase("total", time.perf_counter() - wall, time.process_time() - cpu)
+        if self.trace_memory:
+            self.memory_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - wall, time.process_time() - cpu)
+
+    def add_phase(self, name: str, wall: float, cpu: float) -> None:
+        phase = self.phases.setdefault(name, {"wall": 0.0, "cpu": 0.0})
+        phase["wall"] += wall
+        phase["cpu"] += cpu
+
+    def count(self, name: str, value: int) -> None:
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def add_node_time(self, node_type: str, seconds: float) -> None:
+        self.node_times[node_type] = self.node_times.get(node_type, 0.0) + seconds
+        self.node_counts[node_type] = self.node_counts.get(node_type, 0) + 1
+
+    def to_dict(self) -> dict:
+        return {
+            "phases": self.phases,
+            "counts": self.counts,
+            "memory_peak": self.memory_peak,
+            "codegen": {
+                node_type: {"seconds": seconds, "count": self.node_counts[node_type]}
+                for node_type, seconds in self.node_times.items()
+            },
+        }
+
+    def format_text(self) -> str:
+        lines = [f"{'phase':<12}{'wall(ms)':>12}{'cpu(ms)':>12}"]
+        for name, phase in self.phases.items():
+            lines.append(
+                f"{name:<12}{phase['wall'] * 1000:>12.3f}{phase['cpu'] * 1000:>12.3f}"
+            )
+        for name, value in self.counts.items():
+            lines.append(f"{name}: {value}")
+        if self.memory_peak is not None:
+            lines.append(f"memory_peak: {self.memory_peak / 1024:.1f} KiB")
+        if self.node_times:
+            lines.append("codegen by node type (self time):")
+            for node_type, seconds in sorted(
+                self.node_times.items(), key=lambda item: item[1], reverse=True
+            ):
+                lines.append(
+                    f"  {node_type:<28}{seconds * 1000:>10.3f} ms"
+                    f"  x{self.node_counts[node_type]}"
+                )
+        return "\n".join(lines)
+
+    def publish(self) -> None:
+        data = self.to_dict()
+        for hook in stats_hooks:
+            hook(data)
+
+
+def timed(stats: Optional[Stats], name: str):
+    """stats 为 None 时不计时"""
+    return stats.phase(name) if stats is not None else nullcontext()
+
+
+def transpile(code: str, stats: Optional[Stats] = None, **options: Any) -> str:
+    """伪代码 -> Python 代码；options 传给 Pseudocode，传入 stats 时记录并发布统计信息"""
+    if stats is None:
+        tokens = Tokenizer(code).tokenize()
+        return Pseudocode(**options).ast_to_python(Parser(tokens).parse_program())
+    with stats:
+        with stats.phase("tokenize"):
+            tokens = Tokenizer(code).tokenize()
+        with stats.phase("parse"):
+            ast = Parser(tokens).parse_program()
+        with stats.phase("codegen"):
+            python_code = Pseudocode(stats, **options).ast_to_python(ast)
+    stats.count("tokens", len(tokens))
+    stats.count("ast_nodes", count_nodes(ast))
+    stats.count("output_bytes", len(python_code.encode("utf-8")))
+    stats.publish()
+    return python_code
+
+
+def check(code: str) -> tuple[dict, list[dict]]:
+    """一次解析报告所有语法错误：返回 (部分语法树, [{"line", "column", "message"}])
+
+    词法错误无法恢复，只报告第一个（line / column 为 None，位置在 message 中）。
+    """
+    try:
+        tokens = Tokenizer(code).tokenize()
+    except SyntaxError as error:
+        return {"type": "Program", "statements": []}, [
+            {"line": None, "column": None, "message": str(error)}
+        ]
+    parser = Parser(tokens, recover=True)
+    ast = parser.parse_program()
+    return ast, parser.diagnostics
+
+
 if __name__ == "__main__":
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="IGCSE 伪代码转 Python")
+    arg_parser.add_argument("file", nargs="?", default="tests/test16.txt")
+    arg_parser.add_argument(
+        "--stats",
+        nargs="?",
+        const="text",
+        choices=("text", "json"),
+        help="输出各阶段耗时与计数（默认文本格式）",
+    )
+    arg_parser.add_argument(
+        "--trace-memory", action="store_true", help="配合 --stats 记录 tracemalloc 峰值"
+    )
+    arg_parser.add_argument(
+        "--source-map",
+        action="store_true",
+        help="同时写出 <file>.py.map.json：生成代码行号 -> 伪代码行号",
+    )
+    arg_parser.add_argument(
+        "--memoize", action="store_true", help="为纯 FUNCTION 加 functools.lru_cache"
+    )
+    arg_parser.add_argument("--memo-cache-size", type=int, default=1024)
+    arg_parser.add_argument(
+        "--tail-calls", action="store_true", help="把过程/函数的自身尾调用改写为循环"
+    )
+    arg_parser.add_argument(
+        "--case-dispatch", action="store_true", help="字面量标签的 CASE 改为查表分派"
+    )
+    arg_parser.add_argument(
+        "--memo-stats", action="store_true", help="程序结束时把缓存命中情况输出到 stderr"
+    )
+    arg_parser.add_argument(
+        "--licm", action="store_true", help="把循环不变的 LENGTH/UCASE/LCASE/SUBSTRING 调用移出循环"
+    )
+    arg_parser.add_argument(
+        "--string-builders", action="store_true", help="循环内的字符串累加改用列表与 ''.join"
+    )
+    arg_parser.add_argument(
+        "--vectorize", action="store_true", help="数组求和/填充/最值/计数循环改为整段操作"
+    )
+    arg_parser.add_argument(
+        "--counter-loops",
+        action="store_true",
+        help="计数器驱动的 WHILE/REPEAT 循环改为 range 上的 for 循环",
+    )
+    arg_parser.add_argument(
+        "--share-subtrees",
+        action="store_true",
+        help="结构相同的表达式共用一个节点（不记录位置），其代码只生成一次",
+    )
+    arg_parser.add_argument(
+        "--resolve",
+        action="store_true",
+        help="生成代码前解析所有名字，INPUT 按符号表中的类型转换（与 --share-subtrees 互斥）",
+    )
+    arg_parser.add_argument(
+        "--dump-ast", metavar="PATH", help="把语法树以 JSON 格式写入 PATH"
+    )
+    arg_parser.add_argument(
+        "--emit-ast", metavar="PATH", help="把语法树以二进制格式写入 PATH（见 astio.py）"
+    )
+    arg_parser.add_argument(
+        "--ast-in", metavar="PATH", help="读取 --emit-ast 写出的语法树，跳过词法与语法分析"
+    )
+    arg_parser.add_argument(
+        "--check", action="store_true", help="只检查语法，一次列出所有错误（有错误时退出码为 1）"
+    )
+    args = arg_parser.parse_args()
+    if args.share_subtrees and args.resolve:
+        arg_parser.error("--share-subtrees cannot be combined with --resolve")
+    stats = Stats(trace_memory=args.trace_memory) if args.stats else None
+
+    if args.check:
+        import sys
+
+        with open(args.file, "r", encoding="utf8") as file:
+            _, diagnostics = check(file.read())
+        for diagnostic in diagnostics:
+            where = f"{diagnostic['line']}:{diagnostic['column']}: " if diagnostic["line"] else ""
+            print(f"{args.file}:{where}{diagnostic['message']}")
+        sys.exit(1 if diagnostics else 0)
 
     def run_test(code):
-        tokens = Tokenizer(code).tokenize()
-        ast = Parser(tokens).parse_program()
-        print(json.dumps(ast, indent=2))
-        python_code = Pseudocode().ast_to_python(ast)
+        tokens = None
+        if args.ast_in:
+            with timed(stats, "load"):
+                ast = load_binary(args.ast_in)
+        else:
+            with timed(stats, "tokenize"):
+                tokens = Tokenizer(code).tokenize()
+            with timed(stats, "parse"):
+                ast = Parser(tokens, share_subtrees=args.share_subtrees).parse_program()
+        if args.dump_ast:
+            with timed(stats, "dump"):
+                with open(args.dump_ast, "w", encoding="utf-8") as fp:
+                    dump_json(ast, fp)
+        if args.emit_ast:
+            with timed(stats, "emit_ast"):
+                dump_binary(ast, args.emit_ast)
+        with timed(stats, "codegen"):
+            generator = Pseudocode(
+                stats,
+                source_map=args.source_map,
+                memoize=args.memoize,
+                memo_cache_size=args.memo_cache_size,
+                memo_stats=args.memo_stats,
+                tail_calls=args.tail_calls,
+                case_dispatch=args.case_dispatch,
+                hoist_invariants=args.licm,
+                string_builders=args.string_builders,
+                vectorize=args.vectorize,
+                counter_loops=args.counter_loops,
+                share_subtrees=args.share_subtrees,
+                resolve_symbols=args.resolve,
+            )
+            python_code = generator.ast_to_python(ast)
+        if args.source_map:
+            with open(f + ".py.map.json", "w", encoding="utf-8") as fp:
+                json.dump({"source": f, "lines": generator.source_map}, fp)
+        if stats is not None:
+            if tokens is not None:
+                stats.count("tokens", len(tokens))
+            stats.count("ast_nodes", count_nodes(ast))
         return python_code
 
-    import sys
-
-    f = "tests/test16.txt" if len(sys.argv) < 2 else  sys.argv[1]
-    with open(f, "r", encoding="utf8") as file:
+    f = args.ast_in or args.file
+    with open(args.file, "r", encoding="utf8") if not args.ast_in else nullcontext() as file:
         print(f"--- {f} ---")
-        code = run_test(file.read())
-        with open(f + ".py", "w", encoding="utf-8") as fp:
-            fp.write(code)
+        with stats if stats is not None else nullcontext():
+            code = run_test(file.read() if file else "")
+            with timed(stats, "write"):
+                with open(f + ".py", "w", encoding="utf-8") as fp:
+                    fp.write(code)
         print()
+    if stats is not None:
+        stats.count("output_bytes", len(code.encode("utf-8")))
+        stats.publish()
+        if args.stats == "json":
+            print(json.dumps(stats.to_dict(), indent=2))
+        else:
+            print(stats.format_text())
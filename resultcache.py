@@ -0,0 +1,258 @@
+"""程序运行结果缓存
+
+自动评分会反复运行相同的 (程序, 输入)：重新提交、重新评分、教师复查。
+run_cached() 先查缓存，命中时直接返回保存的标准输出、退出状态与运行时间。
+缓存键由以下内容的哈希组成：
+
+- 生成的 Python 代码（转换选项不同时代码不同）与 Python 版本
+- 标准输入（没有给出 stdin 而程序有 INPUT 时，先读入进程的全部标准输入）
+- 程序打开的每个文件的内容（文件名在伪代码中是字面量，运行前即可确定；
+  文件不存在也是键的一部分）
+- 随机数种子与栈大小、递归深度上限（它们决定深递归的程序是否出错）
+
+调用 RANDOM 的程序只在给出固定种子时使用缓存；写文件的程序（OPENFILE FOR
+WRITE、WRITEFILE）总是直接运行，因为缓存无法重现它写出的文件。
+
+结果保存在 SQLite 数据库中，条目数与标准输出总字节数超过上限时按最近使用
+时间淘汰（LRU）。命中、未命中、绕过与淘汰次数也保存在数据库中，多个评分
+进程共享同一份统计。
+
+    python runner.py submission.txt --stdin input.txt --cache results.db
+    python resultcache.py results.db    # 输出统计
+"""
+from __future__ import annotations
+import hashlib
+import io
+import os
+import random
+import sqlite3
+import sys
+import time
+import traceback
+from typing import Any, Optional
+
+from analysis import walk
+from pseudocode import Parser, Pseudocode, Tokenizer
+from runner import execute
+
+# 保存格式或键的组成变化时加一，旧的条目不再命中
+CACHE_VERSION = 1
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# 多个进程同时写数据库时等待锁的秒数
+LOCK_TIMEOUT = 30.0
+COUNTERS = ("hits", "misses", "bypasses", "evictions")
+FILE_STATEMENTS = ("OpenFile", "ReadFile", "WriteFile")
+
+
+def program_files(program: dict) -> tuple[set[str], set[str]]:
+    """程序读取的文件名与写入的文件名"""
+    read: set[str] = set()
+    written: set[str] = set()
+    for node in walk(program):
+        if node["type"] not in FILE_STATEMENTS:
+            continue
+        if node["type"] == "ReadFile" or (node["type"] == "OpenFile" and node["mode"] == "READ"):
+            read.add(node["file"])
+        else:
+            written.add(node["file"])
+    return read, written
+
+
+def content_hash(data: Optional[bytes]) -> str:
+    return hashlib.sha256(data).hexdigest() if data is not None else "missing"
+
+
+def file_contents(path: str) -> Optional[bytes]:
+    try:
+        with open(path, "rb") as fp:
+            return fp.read()
+    except OSError:
+        return None
+
+
+class ResultCache:
+    """SQLite 中的 LRU 结果缓存；结果为字典：stdout、status、error、seconds"""
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.db = sqlite3.connect(path, timeout=LOCK_TIMEOUT, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, stdout TEXT, status INTEGER, error TEXT, "
+            "seconds REAL, size INTEGER, used REAL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)")
+
+    def get(self, key: str) -> Optional[dict]:
+        row = self.db.execute(
+            "SELECT stdout, status, error, seconds FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.count("misses")
+            return None
+        self.db.execute("UPDATE results SET used = ? WHERE key = ?", (time.time(), key))
+        self.count("hits")
+        return dict(zip(("stdout", "status", "error", "seconds"), row))
+
+    def put(self, key: str, result: dict) -> None:
+        size = len(result["stdout"].encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            self.db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, result["stdout"], result["status"], result["error"], result["seconds"], size, time.time()),
+            )
+            self.evict()
+
+    def evict(self) -> None:
+        """删除最久未使用的条目，直到条目数与字节数都不超过上限"""
+        entries, total = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        if entries <= self.max_entries and total <= self.max_bytes:
+            return
+        victims = []
+        for key, size in self.db.execute("SELECT key, size FROM results ORDER BY used").fetchall():
+            if entries <= self.max_entries and total <= self.max_bytes:
+                break
+            victims.append((key,))
+            entries -= 1
+            total -= size
+        self.db.executemany("DELETE FROM results WHERE key = ?", victims)
+        self.count("evictions", len(victims))
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.db.execute(
+            "INSERT INTO counters VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + ?",
+            (name, amount, amount),
+        )
+
+    def metrics(self) -> dict[str, Any]:
+        """{"hits", "misses", "bypasses", "evictions", "hit_rate", "entries", "bytes"}"""
+        metrics: dict[str, Any] = dict.fromkeys(COUNTERS, 0)
+        metrics.update(self.db.execute("SELECT name, value FROM counters").fetchall())
+        lookups = metrics["hits"] + metrics["misses"]
+        metrics["hit_rate"] = metrics["hits"] / lookups if lookups else 0.0
+        metrics["entries"], metrics["bytes"] = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+        ).fetchone()
+        return metrics
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __enter__(self) -> ResultCache:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def cache_key(python_code: str, stdin: Optional[str], settings: tuple, files: set[str]) -> str:
+    digest = hashlib.sha256()
+    parts = [
+        str(CACHE_VERSION),
+        "%d.%d" % sys.version_info[:2],
+        content_hash(python_code.encode("utf-8")),
+        content_hash(stdin.encode("utf-8") if stdin is not None else None),
+        repr(settings),
+    ]
+    # 文件名相对于当前目录解析，与程序运行时打开的文件相同
+    parts += [f"{name}:{content_hash(file_contents(name))}" for name in sorted(files)]
+    digest.update("\0".join(parts).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def run_program(
+    python_code: str,
+    stdin: Optional[str] = None,
+    seed: Optional[int] = None,
+    stack_size: Optional[int] = None,
+    recursion_limit: Optional[int] = None,
+) -> dict:
+    """执行生成的代码，返回 {"stdout", "status", "error", "seconds"}
+
+    未捕获的异常不再抛出：status 为 1，error 为异常信息（最后一行 traceback）。
+    """
+    stdout = io.StringIO()
+    status, error = 0, None
+    if seed is not None:
+        random.seed(seed)
+    started = time.perf_counter()
+    try:
+        execute(python_code, stdin, stdout, stack_size, recursion_limit)
+    except SystemExit as exit_error:
+        code = exit_error.code
+        status = code if isinstance(code, int) else int(code is not None)
+    except Exception as exception:
+        status = 1
+        error = "".join(traceback.format_exception_only(type(exception), exception)).strip()
+    return {
+        "stdout": stdout.getvalue(),
+        "status": status,
+        "error": error,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def run_cached(
+    cache: ResultCache,
+    code: str,
+    stdin: Optional[str] = None,
+    seed: Optional[int] = None,
+    stack_size: Optional[int] = None,
+    recursion_limit: Optional[int] = None,
+    **options: Any,
+) -> dict:
+    """转换并运行伪代码（options 传给 Pseudocode），能用缓存时先查缓存
+
+    返回 run_program 的结果，另加 "cached"：结果是否来自缓存。
+    """
+    program = Parser(Tokenizer(code).tokenize()).parse_program()
+    generator = Pseudocode(**options)
+    python_code = generator.ast_to_python(program)
+    read, written = program_files(program)
+    uses_random = Pseudocode.random_pre_string in generator.pre_string
+    if written or (uses_random and seed is None):
+        cache.count("bypasses")
+        result = run_program(python_code, stdin, seed, stack_size, recursion_limit)
+        return {**result, "cached": False}
+
+    if stdin is None and any(node["type"] == "InputStatement" for node in walk(program)):
+        # 程序会读进程的标准输入：先全部读入，键才对应这次的输入
+        stdin = sys.stdin.read()
+    # 不用 RANDOM 的程序与种子无关，不同的种子共用一个条目
+    settings = (seed if uses_random else None, stack_size, recursion_limit)
+    key = cache_key(python_code, stdin, settings, read)
+    result = cache.get(key)
+    if result is not None:
+        return {**result, "cached": True}
+    result = run_program(python_code, stdin, seed, stack_size, recursion_limit)
+    cache.put(key, result)
+    return {**result, "cached": False}
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    arg_parser = argparse.ArgumentParser(description="输出运行结果缓存的统计")
+    arg_parser.add_argument("cache", help="缓存数据库")
+    arg_parser.add_argument("--clear", action="store_true", help="清空缓存与统计")
+    args = arg_parser.parse_args()
+    if not os.path.exists(args.cache):
+        sys.exit(f"{args.cache}: no such cache")
+    with ResultCache(args.cache) as result_cache:
+        if args.clear:
+            result_cache.db.execute("DELETE FROM results")
+            result_cache.db.execute("DELETE FROM counters")
+        print(json.dumps(result_cache.metrics(), indent=2))
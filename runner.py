@@ -0,0 +1,483 @@
+"""运行生成的 Python 程序
+
+profile_program() 逐行统计生成代码的命中次数与耗时，并通过 source map
+折算回伪代码行号，方便直接在原伪代码上找到热点循环。
+
+check_program() 把 OUTPUT 的输出直接交给 StreamingChecker 与期望输出逐行
+比较，不保存全部输出，第一处不符或输出超过字节预算时立即结束程序。
+
+    python runner.py tests/test3.txt --profile
+    python runner.py tests/test3.txt --cache results.db    # 见 resultcache.py
+    python runner.py tests/test3.txt --stdin in.txt --expect out.txt --tolerance 1e-6
+"""
+from __future__ import annotations
+import io
+import math
+import sys
+import threading
+import time
+from typing import Any, Callable, Optional, TextIO
+
+from pseudocode import Tokenizer, Parser, Pseudocode
+
+PROGRAM_FILENAME = "<pseudocode>"
+# 深递归模式下执行线程的栈大小，以及与之匹配的递归深度上限
+DEFAULT_STACK_SIZE = 512 * 1024 * 1024
+FRAME_BYTES = 1024
+
+
+def compile_source(code: str, **options: Any) -> tuple[str, list[Optional[int]]]:
+    """伪代码 -> (Python 代码, source map)，options 传给 Pseudocode"""
+    ast = Parser(Tokenizer(code).tokenize()).parse_program()
+    generator = Pseudocode(source_map=True, **options)
+    python_code = generator.ast_to_python(ast)
+    return python_code, generator.source_map
+
+
+def run_with_stack(
+    func: Callable[[], Any],
+    stack_size: int = DEFAULT_STACK_SIZE,
+    recursion_limit: Optional[int] = None,
+) -> Any:
+    """在栈空间为 stack_size 的新线程中运行 func，并相应放宽递归深度上限
+
+    func 抛出的异常会在调用线程中重新抛出。
+    """
+    if recursion_limit is None:
+        recursion_limit = stack_size // FRAME_BYTES
+    result: dict[str, Any] = {}
+
+    def target() -> None:
+        try:
+            result["value"] = func()
+        except BaseException as error:
+            result["error"] = error
+
+    saved_limit = sys.getrecursionlimit()
+    saved_size = threading.stack_size(stack_size)
+    sys.setrecursionlimit(max(saved_limit, recursion_limit))
+    try:
+        thread = threading.Thread(target=target, name="pseudocode-main")
+        thread.start()
+        thread.join()
+    finally:
+        threading.stack_size(saved_size)
+        sys.setrecursionlimit(saved_limit)
+    if "error" in result:
+        raise result["error"]
+    return result.get("value")
+
+
+def execute(
+    python_code: str,
+    stdin: Optional[str] = None,
+    stdout: Optional[TextIO] = None,
+    stack_size: Optional[int] = None,
+    recursion_limit: Optional[int] = None,
+) -> None:
+    """在独立的全局命名空间中执行生成的代码，可替换标准输入输出
+
+    给出 stack_size 时在大栈线程中执行，避免深递归触发 RecursionError。
+    """
+    program = compile(python_code, PROGRAM_FILENAME, "exec")
+    saved = sys.stdin, sys.stdout
+    if stdin is not None:
+        sys.stdin = io.StringIO(stdin)
+    if stdout is not None:
+        sys.stdout = stdout
+    try:
+        if stack_size:
+            run_with_stack(
+                lambda: exec(program, {"__name__": "__main__"}),
+                stack_size,
+                recursion_limit,
+            )
+        else:
+            exec(program, {"__name__": "__main__"})
+    finally:
+        sys.stdin, sys.stdout = saved
+
+
+# 比较输出时的空白处理：exact 逐字符比较；trailing 忽略行尾空白与末尾的空行；
+# collapse 另把行内连续的空白视为一个空格，并忽略行首空白
+WHITESPACE_MODES = ("exact", "trailing", "collapse")
+DEFAULT_OUTPUT_BUDGET = 64 * 1024 * 1024
+
+
+class OutputCheckFailed(Exception):
+    """输出与期望不符或超出字节预算，从 print 中抛出以立即结束程序"""
+
+    def __init__(self, reason: str, line: int, expected: Optional[str], actual: Optional[str]) -> None:
+        super().__init__(f"{reason} at line {line}: expected {expected!r}, got {actual!r}")
+        self.reason = reason
+        self.line = line
+        self.expected = expected
+        self.actual = actual
+
+
+class StreamingChecker:
+    """代替 sys.stdout：程序每输出完整的一行就与期望输出的下一行比较
+
+    期望输出逐行从文件读取，实际输出不保存，内存占用与输出量无关。
+    第一处不符（reason 为 "mismatch"、多出的 "extra"）或输出超过 budget 字节
+    （"budget"）时抛出 OutputCheckFailed；finish() 检查缺少的行（"missing"）。
+    给出 tolerance 时按空白分词比较，两边都是数字的词按 math.isclose
+    （rel_tol 与 abs_tol 均为 tolerance）比较，其余的词要求相同。
+    """
+
+    def __init__(
+        self,
+        expected: TextIO,
+        tolerance: Optional[float] = None,
+        whitespace: str = "trailing",
+        budget: int = DEFAULT_OUTPUT_BUDGET,
+    ) -> None:
+        if whitespace not in WHITESPACE_MODES:
+            raise ValueError(f"Unknown whitespace mode: {whitespace}")
+        self.expected = expected
+        self.tolerance = tolerance
+        self.whitespace = whitespace
+        self.budget = budget
+        self.written = 0
+        self.line = 0
+        self.pending: list[str] = []
+
+    def write(self, text: str) -> int:
+        self.written += len(text.encode("utf-8"))
+        if self.written > self.budget:
+            raise OutputCheckFailed("budget", self.line + 1, None, f"more than {self.budget} bytes")
+        self.pending.append(text)
+        if "\n" in text:
+            *lines, rest = "".join(self.pending).split("\n")
+            self.pending = [rest] if rest else []
+            for actual in lines:
+                self.compare(actual)
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+    def normalize(self, line: str) -> str:
+        if self.whitespace == "collapse":
+            return " ".join(line.split())
+        if self.whitespace == "trailing":
+            return line.rstrip()
+        return line
+
+    def compare(self, actual: str) -> None:
+        self.line += 1
+        expected = self.expected.readline()
+        if not expected:
+            # 期望输出已结束：非 exact 模式下多出的空行不算错
+            if self.whitespace == "exact" or actual.strip():
+                raise OutputCheckFailed("extra", self.line, None, actual)
+            return
+        expected = expected[:-1] if expected.endswith("\n") else expected
+        if not self.same(expected, actual):
+            raise OutputCheckFailed("mismatch", self.line, expected, actual)
+
+    def same(self, expected: str, actual: str) -> bool:
+        expected, actual = self.normalize(expected), self.normalize(actual)
+        if expected == actual:
+            return True
+        if self.tolerance is None:
+            return False
+        expected_words, actual_words = expected.split(), actual.split()
+        if len(expected_words) != len(actual_words):
+            return False
+        for want, got in zip(expected_words, actual_words):
+            if want == got:
+                continue
+            try:
+                want_value, got_value = float(want), float(got)
+            except ValueError:
+                return False
+            if not math.isclose(got_value, want_value, rel_tol=self.tolerance, abs_tol=self.tolerance):
+                return False
+        return True
+
+    def finish(self) -> None:
+        """程序结束后调用：比较没有换行结尾的最后一行，并检查期望输出是否还有剩余"""
+        if self.pending:
+            self.compare("".join(self.pending))
+            self.pending = []
+        for expected in self.expected:
+            self.line += 1
+            expected = expected.rstrip("\n")
+            if self.whitespace == "exact" or expected.strip():
+                raise OutputCheckFailed("missing", self.line, expected, None)
+
+
+def check_program(
+    python_code: str,
+    expected_path: str,
+    stdin: Optional[str] = None,
+    tolerance: Optional[float] = None,
+    whitespace: str = "trailing",
+    budget: int = DEFAULT_OUTPUT_BUDGET,
+    stack_size: Optional[int] = None,
+    recursion_limit: Optional[int] = None,
+) -> dict:
+    """运行生成的代码，边运行边与 expected_path 的内容比较
+
+    返回 {"passed", "reason", "line", "expected", "actual", "bytes"}；
+    程序出错时 reason 为 "error"，actual 为异常信息。
+    """
+    report: dict[str, Any] = {"passed": True, "reason": None, "line": None, "expected": None, "actual": None}
+    with open(expected_path, "r", encoding="utf8") as expected:
+        checker = StreamingChecker(expected, tolerance, whitespace, budget)
+        try:
+            execute(python_code, stdin, checker, stack_size, recursion_limit)
+            checker.finish()
+        except OutputCheckFailed as failure:
+            report.update(
+                passed=False,
+                reason=failure.reason,
+                line=failure.line,
+                expected=failure.expected,
+                actual=failure.actual,
+            )
+        except Exception as error:
+            report.update(
+                passed=False,
+                reason="error",
+                line=checker.line + 1,
+                actual=f"{type(error).__name__}: {error}",
+            )
+    report["bytes"] = checker.written
+    return report
+
+
+class LineProfiler:
+    """按生成代码的行记录命中次数与耗时（从该行开始到下一个行事件之间的时间）
+
+    Python 3.12+ 使用 sys.monitoring，更早的版本退回到只跟踪生成代码帧的 sys.settrace。
+    """
+
+    tool_id = 3  # sys.monitoring.PROFILER_ID
+
+    def __init__(self) -> None:
+        self.hits: dict[int, int] = {}
+        self.times: dict[int, float] = {}
+        self._last_line: Optional[int] = None
+        self._last_time = 0.0
+
+    def _record(self, line: int) -> None:
+        now = time.perf_counter()
+        if self._last_line is not None:
+            self.times[self._last_line] = (
+                self.times.get(self._last_line, 0.0) + now - self._last_time
+            )
+        self.hits[line] = self.hits.get(line, 0) + 1
+        self._last_line = line
+        self._last_time = time.perf_counter()
+
+    def _flush(self) -> None:
+        if self._last_line is not None:
+            self.times[self._last_line] = (
+                self.times.get(self._last_line, 0.0)
+                + time.perf_counter()
+                - self._last_time
+            )
+            self._last_line = None
+
+    def _monitor_line(self, code: Any, line: int) -> Any:
+        if code.co_filename != PROGRAM_FILENAME:
+            return sys.monitoring.DISABLE
+        self._record(line)
+
+    def _trace(self, frame: Any, event: str, arg: Any) -> Any:
+        if frame.f_code.co_filename != PROGRAM_FILENAME:
+            return None
+        if event == "line":
+            self._record(frame.f_lineno)
+        return self._trace
+
+    def run(
+        self,
+        python_code: str,
+        stdin: Optional[str] = None,
+        stdout: Optional[TextIO] = None,
+        stack_size: Optional[int] = None,
+        recursion_limit: Optional[int] = None,
+    ) -> None:
+        """stack_size 见 execute；sys.settrace 只作用于当前线程，大栈线程由 threading.settrace 跟踪"""
+        monitoring = getattr(sys, "monitoring", None)
+        if monitoring is not None:
+            monitoring.use_tool_id(self.tool_id, "pseudocode-profiler")
+            monitoring.register_callback(
+                self.tool_id, monitoring.events.LINE, self._monitor_line
+            )
+            monitoring.set_events(self.tool_id, monitoring.events.LINE)
+        else:
+            sys.settrace(self._trace)
+            threading.settrace(self._trace)
+        try:
+            execute(python_code, stdin, stdout, stack_size, recursion_limit)
+        finally:
+            if monitoring is not None:
+                monitoring.set_events(self.tool_id, 0)
+                monitoring.register_callback(self.tool_id, monitoring.events.LINE, None)
+                monitoring.free_tool_id(self.tool_id)
+            else:
+                sys.settrace(None)
+                threading.settrace(None)
+            self._flush()
+
+
+def profile_program(
+    python_code: str,
+    source_map: list[Optional[int]],
+    stdin: Optional[str] = None,
+    stdout: Optional[TextIO] = None,
+    stack_size: Optional[int] = None,
+    recursion_limit: Optional[int] = None,
+) -> dict[int, dict]:
+    """执行生成的代码，返回 {伪代码行号: {"hits": 次数, "seconds": 耗时}}
+
+    一条伪代码语句可能生成多行 Python 代码：耗时累加，命中次数取其中最大的一行。
+    """
+    profiler = LineProfiler()
+    profiler.run(python_code, stdin, stdout, stack_size, recursion_limit)
+    report: dict[int, dict] = {}
+    for line, hits in profiler.hits.items():
+        source_line = source_map[line - 1] if 0 < line <= len(source_map) else None
+        if source_line is None:
+            continue
+        entry = report.setdefault(source_line, {"hits": 0, "seconds": 0.0})
+        entry["hits"] = max(entry["hits"], hits)
+        entry["seconds"] += profiler.times.get(line, 0.0)
+    return dict(sorted(report.items()))
+
+
+def format_profile(report: dict[int, dict], source: str) -> str:
+    source_lines = source.split("\n")
+    lines = [f"{'line':>6}{'hits':>10}{'time(ms)':>12}  source"]
+    for line, entry in report.items():
+        text = source_lines[line - 1].strip() if line <= len(source_lines) else ""
+        lines.append(
+            f"{line:>6}{entry['hits']:>10}{entry['seconds'] * 1000:>12.3f}  {text}"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="运行伪代码程序")
+    arg_parser.add_argument("file")
+    arg_parser.add_argument("--stdin", help="作为标准输入的文件")
+    arg_parser.add_argument(
+        "--profile", action="store_true", help="按伪代码行输出命中次数与耗时"
+    )
+    arg_parser.add_argument(
+        "--tail-calls", action="store_true", help="把自身尾调用改写为循环"
+    )
+    arg_parser.add_argument(
+        "--stack-size",
+        type=int,
+        metavar="MIB",
+        help="在栈大小为 MIB 的线程中运行，并放宽递归深度上限",
+    )
+    arg_parser.add_argument("--recursion-limit", type=int)
+    arg_parser.add_argument(
+        "--cache", metavar="PATH", help="运行结果缓存（SQLite 数据库），相同的程序与输入直接取结果"
+    )
+    arg_parser.add_argument("--seed", type=int, help="RANDOM 的随机数种子（使用 RANDOM 的程序有种子时才缓存）")
+    arg_parser.add_argument(
+        "--expect", metavar="PATH", help="边运行边与 PATH 中的期望输出比较，第一处不符时结束"
+    )
+    arg_parser.add_argument(
+        "--tolerance", type=float, help="--expect：数字按该绝对/相对误差比较（REAL 的舍入）"
+    )
+    arg_parser.add_argument(
+        "--whitespace",
+        choices=WHITESPACE_MODES,
+        default="trailing",
+        help="--expect：exact 逐字符；trailing 忽略行尾空白与末尾空行；collapse 另合并行内空白",
+    )
+    arg_parser.add_argument(
+        "--max-output",
+        type=int,
+        default=DEFAULT_OUTPUT_BUDGET,
+        metavar="BYTES",
+        help="--expect：输出超过该字节数时结束程序",
+    )
+    arg_parser.add_argument(
+        "--backend",
+        choices=("python", "c"),
+        default="python",
+        help="c：数值程序编译成本地代码运行，不支持时退回 Python（见 cbackend.py）",
+    )
+    args = arg_parser.parse_args()
+    if args.backend == "c" and not args.profile and (args.expect or args.cache):
+        arg_parser.error("--backend c cannot be combined with --expect or --cache")
+
+    with open(args.file, "r", encoding="utf8") as fp:
+        source = fp.read()
+    stdin = None
+    if args.stdin:
+        with open(args.stdin, "r", encoding="utf8") as fp:
+            stdin = fp.read()
+    stack_size = args.stack_size * 1024 * 1024 if args.stack_size else None
+    if args.seed is not None:
+        import random
+
+        random.seed(args.seed)
+    if args.backend == "c" and not args.profile:
+        from cbackend import run
+
+        run(
+            source,
+            stdin=stdin,
+            stack_size=stack_size,
+            recursion_limit=args.recursion_limit,
+            tail_calls=args.tail_calls,
+        )
+        sys.exit(0)
+    if args.expect and not args.profile:
+        python_code, _ = compile_source(source, tail_calls=args.tail_calls)
+        report = check_program(
+            python_code,
+            args.expect,
+            stdin,
+            args.tolerance,
+            args.whitespace,
+            args.max_output,
+            stack_size,
+            args.recursion_limit,
+        )
+        if report["passed"]:
+            print(f"passed ({report['bytes']} bytes)", file=sys.stderr)
+        else:
+            print(
+                f"{report['reason']} at line {report['line']}: "
+                f"expected {report['expected']!r}, got {report['actual']!r}",
+                file=sys.stderr,
+            )
+        sys.exit(0 if report["passed"] else 1)
+    if args.cache and not args.profile:
+        from resultcache import ResultCache, run_cached
+
+        with ResultCache(args.cache) as cache:
+            result = run_cached(
+                cache,
+                source,
+                stdin,
+                args.seed,
+                stack_size,
+                args.recursion_limit,
+                tail_calls=args.tail_calls,
+            )
+        sys.stdout.write(result["stdout"])
+        if result["error"]:
+            print(result["error"], file=sys.stderr)
+        sys.exit(result["status"])
+    python_code, source_map = compile_source(source, tail_calls=args.tail_calls)
+    if args.profile:
+        report = profile_program(
+            python_code, source_map, stdin, stack_size=stack_size, recursion_limit=args.recursion_limit
+        )
+        print(format_profile(report, source), file=sys.stderr)
+    else:
+        execute(python_code, stdin, stack_size=stack_size, recursion_limit=args.recursion_limit)
@@ -0,0 +1,215 @@
+"""名字解析
+
+resolve() 为整个程序建立符号表：全局变量、常量、数组（含各维上下界）、
+过程/函数，以及每个过程/函数的参数、局部变量与 FOR 循环变量，并在语法树的
+每个 Identifier / ArrayAccess（以及用户过程/函数的调用、各个声明）上记下
+符号编号 "symbol" 与类型 "symbol_type"。之后的遍或代码生成按编号查表即可，
+不必再逐层查找作用域。
+
+与 Parser.get_identifier_type 不同，解析不依赖声明的先后：一个作用域中的
+声明在整个作用域内可见。过程/函数内部的名字先在本过程的局部名中查找
+（与 analysis.local_names 相同：参数、内部声明、FOR 循环变量），再查外层。
+同一作用域中重复声明的名字只有一个符号（取第一次声明的类型）。
+
+类型的写法与 Parser 的作用域相同："INTEGER"、"ARRAY[] OF INTEGER"
+（二维为 "ARRAY[[]] OF INTEGER"）；数组元素的类型是元素类型。
+
+    python semantic.py tests/test1.txt    # 输出符号表
+"""
+from __future__ import annotations
+from typing import Any, Iterator, Optional
+
+from analysis import DECLARATION_TYPES, const_value, iter_children
+
+GLOBAL_SCOPE = ""
+VARIABLE_DECLARATIONS = ("SimpleVariableDeclaration", "ArrayDeclaration")
+CONSTANT_TYPES = {bool: "BOOLEAN", int: "INTEGER", float: "REAL", str: "STRING"}
+
+
+def array_type(data_type: str, dimensions: int) -> str:
+    return f"ARRAY{'[' * dimensions + ']' * dimensions} OF {data_type}"
+
+
+class SymbolTable:
+    """符号编号 -> 符号；符号为字典：
+
+    id、name、kind（variable / array / constant / parameter / loop / procedure / function）、
+    scope（所在过程/函数的名称，全局为 ""）、data_type、line；数组另有
+    dimensions（声明中的维度表达式）与 bounds（各维常量上下界，无法确定时为 None）。
+    """
+
+    def __init__(self) -> None:
+        self.symbols: list[dict] = []
+        # 作用域名 -> {名字: 符号编号}
+        self.scopes: dict[str, dict[str, int]] = {GLOBAL_SCOPE: {}}
+        self.constants: dict[str, Any] = {}
+
+    def __getitem__(self, symbol: int) -> dict:
+        return self.symbols[symbol]
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self.symbols)
+
+    def define(self, scope: str, name: str, kind: str, data_type: Optional[str], node: dict) -> int:
+        """在 scope 中定义 name，已定义时返回原来的编号"""
+        names = self.scopes.setdefault(scope, {})
+        if name in names:
+            return names[name]
+        symbol = {
+            "id": len(self.symbols),
+            "name": name,
+            "kind": kind,
+            "scope": scope,
+            "data_type": data_type,
+            "line": node.get("line"),
+        }
+        self.symbols.append(symbol)
+        names[name] = symbol["id"]
+        return symbol["id"]
+
+    def lookup(self, chain: list[str], name: str) -> Optional[int]:
+        """在作用域链中由内向外查找"""
+        for scope in reversed(chain):
+            symbol = self.scopes[scope].get(name)
+            if symbol is not None:
+                return symbol
+        return None
+
+    def symbol_type(self, node: dict) -> Optional[str]:
+        """已解析节点的类型"""
+        symbol = node.get("symbol")
+        return self.symbols[symbol]["data_type"] if symbol is not None else None
+
+
+class Resolver:
+    """先收集一个作用域中的全部声明，再解析其中的引用，遇到过程/函数时进入新作用域"""
+
+    def __init__(self, table: SymbolTable) -> None:
+        self.table = table
+
+    def scope_nodes(self, nodes: list[dict]) -> Iterator[dict]:
+        """作用域内的全部节点（前序），不进入嵌套的过程/函数体"""
+        stack = list(reversed(nodes))
+        while stack:
+            node = stack.pop()
+            yield node
+            if node["type"] in DECLARATION_TYPES:
+                continue
+            stack.extend(reversed(list(iter_children(node))))
+
+    def declare(self, scope: str, node: dict, kind: Optional[str] = None) -> None:
+        table = self.table
+        node_type = node["type"]
+        if node_type in VARIABLE_DECLARATIONS and node.get("identifier"):
+            if node["is_array"]:
+                dimensions = node.get("dimensions", [])
+                data_type = array_type(node["data_type"], len(dimensions)) if dimensions else node["data_type"]
+                symbol = table.define(scope, node["identifier"], kind or "array", data_type, node)
+                if dimensions and "dimensions" not in table[symbol]:
+                    table[symbol]["dimensions"] = dimensions
+                    table[symbol]["bounds"] = [
+                        self.bounds(dimension["lower"], dimension["upper"]) for dimension in dimensions
+                    ]
+            else:
+                symbol = table.define(scope, node["identifier"], kind or "variable", node["data_type"], node)
+            node["symbol"] = symbol
+        elif node_type == "ConstantDeclaration":
+            data_type = CONSTANT_TYPES.get(type(node["value"]))
+            node["symbol"] = table.define(scope, node["identifier"], "constant", data_type, node)
+            if scope == GLOBAL_SCOPE:
+                table.constants.setdefault(node["identifier"], node["value"])
+        elif node_type == "ForLoop":
+            node["symbol"] = table.define(scope, node["variable"], "loop", "INTEGER", node)
+        elif node_type in DECLARATION_TYPES:
+            if node_type == "FunctionDeclaration":
+                returned = node["return_type"]
+                data_type = returned["data_type"]
+                kind = "function"
+            else:
+                data_type, kind = None, "procedure"
+            node["symbol"] = table.define(scope, node["name"], kind, data_type, node)
+
+    def bounds(self, lower: dict, upper: dict) -> Optional[tuple[Any, Any]]:
+        constants = {
+            name: value
+            for name, value in self.table.constants.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)
+        }
+        low, high = const_value(lower, constants), const_value(upper, constants)
+        return None if low is None or high is None else (low, high)
+
+    def resolve_scope(self, chain: list[str], body: list[dict], parameters: list[dict]) -> None:
+        scope = chain[-1]
+        self.table.scopes.setdefault(scope, {})
+        for param in parameters:
+            self.declare(scope, param, "parameter")
+        nodes = list(self.scope_nodes(body))
+        # 常量先于数组声明登记，数组上下界可以引用后面的 CONSTANT
+        for node in nodes:
+            if node["type"] == "ConstantDeclaration":
+                self.declare(scope, node)
+        for node in nodes:
+            if node["type"] != "ConstantDeclaration":
+                self.declare(scope, node)
+        for node in nodes:
+            self.resolve_reference(chain, node)
+            if node["type"] in DECLARATION_TYPES:
+                self.resolve_scope(chain + [node["name"]], node["body"], node["parameters"])
+
+    def resolve_reference(self, chain: list[str], node: dict) -> None:
+        table = self.table
+        node_type = node["type"]
+        if node_type == "Identifier":
+            symbol = table.lookup(chain, node["name"])
+            if symbol is not None:
+                node["symbol"] = symbol
+                node["symbol_type"] = table[symbol]["data_type"]
+        elif node_type == "ArrayAccess" and node["array"] != "-":
+            symbol = table.lookup(chain, node["array"])
+            if symbol is not None:
+                node["symbol"] = symbol
+                node["symbol_type"] = self.element_type(table[symbol], len(node["indices"]))
+        elif node_type in ("FunctionCall", "ProcedureCall"):
+            symbol = table.lookup(chain, node["function"])
+            if symbol is not None and table[symbol]["kind"] in ("procedure", "function"):
+                node["symbol"] = symbol
+                node["symbol_type"] = table[symbol]["data_type"]
+
+    @staticmethod
+    def element_type(symbol: dict, indices: int) -> Optional[str]:
+        """数组按 indices 个下标访问得到的类型"""
+        data_type = symbol["data_type"]
+        if not data_type or not data_type.startswith("ARRAY"):
+            return data_type
+        dimensions = data_type.count("[")
+        element = data_type.split()[-1]
+        remaining = dimensions - indices
+        return array_type(element, remaining) if remaining > 0 else element
+
+
+def resolve(program: dict) -> SymbolTable:
+    """解析 program 中的所有名字（就地在节点上记下 symbol / symbol_type），返回符号表"""
+    table = SymbolTable()
+    Resolver(table).resolve_scope([GLOBAL_SCOPE], program["statements"], [])
+    return table
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    from pseudocode import Tokenizer, Parser
+
+    arg_parser = argparse.ArgumentParser(description="输出伪代码程序的符号表")
+    arg_parser.add_argument("file")
+    args = arg_parser.parse_args()
+    with open(args.file, "r", encoding="utf8") as fp:
+        ast = Parser(Tokenizer(fp.read()).tokenize()).parse_program()
+    symbols = [
+        {key: value for key, value in symbol.items() if key != "dimensions"}
+        for symbol in resolve(ast)
+    ]
+    print(json.dumps(symbols, indent=2, ensure_ascii=False))
@@ -0,0 +1,262 @@
+"""提交之间的相似度索引
+
+把 Tokenizer.tokenize 得到的 Token 类型序列作为程序的规范形式（标识符
+统一为 VARIDENTIFIER，字面量统一为 NUMBER / STRING / BOOLEAN，改名与
+改常量不影响结果），对其中长度为 K 的片段计算哈希，再用 winnowing
+在每个长度为 WINDOW 的窗口中取最小的哈希作为指纹：两个程序只要有
+K + WINDOW - 1 个 Token 以上的相同片段，就一定有相同的指纹。
+
+指纹保存在 SQLite 倒排索引（指纹 -> 提交）中。查询只读取查询程序自身
+指纹的倒排表，按共享指纹数选出候选，再对候选计算 Jaccard 相似度，
+与已有提交的总数无关；出现在超过 max_df 比例提交中的指纹（样板代码）
+在查询时忽略。提交少于 MAX_DF_MIN_DOCUMENTS 份时比例没有意义（三份提交中
+两份相同就超过一半），不做过滤；查询已入库的提交（exclude）时，它自己的
+倒排不计入频率。
+
+    python similarity.py index.db --add submissions/*.txt    # 多进程批量建索引
+    python similarity.py index.db --query new.txt --top 10
+"""
+from __future__ import annotations
+import os
+import sqlite3
+import sys
+import zlib
+from multiprocessing import Pool
+from typing import Iterable, Optional
+
+from pseudocode import LineTokenCache, Tokenizer
+
+K = 5
+WINDOW = 4
+# 多项式滚动哈希：模数为梅森素数 2^61 - 1，结果能放进 SQLite 的 64 位有符号整数
+HASH_MODULUS = (1 << 61) - 1
+HASH_BASE = 1_000_003
+# 查询时忽略出现在超过该比例的提交中的指纹，提交数达到 MAX_DF_MIN_DOCUMENTS 才生效
+DEFAULT_MAX_DF = 0.5
+MAX_DF_MIN_DOCUMENTS = 20
+# 去掉被排除的提交自己的倒排后的文档频率
+FREQUENCY = "(f.count - EXISTS (SELECT 1 FROM postings AS e WHERE e.hash = f.hash AND e.document IS ?))"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    hash INTEGER NOT NULL,
+    document INTEGER NOT NULL,
+    PRIMARY KEY (hash, document)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_document ON postings (document);
+CREATE TABLE IF NOT EXISTS frequencies (
+    hash INTEGER PRIMARY KEY,
+    count INTEGER NOT NULL
+);
+"""
+
+
+def token_stream(code: str) -> list[str]:
+    """规范化的 Token 类型序列"""
+    return [token.type for token in Tokenizer(code).tokenize()]
+
+
+def kgram_hashes(types: list[str], k: int = K) -> list[int]:
+    """每个长度为 k 的片段的哈希（Token 类型先取 CRC32，结果与进程和 Token 表顺序无关）"""
+    if len(types) < k:
+        return []
+    codes = [zlib.crc32(t.encode()) for t in types]
+    top = pow(HASH_BASE, k - 1, HASH_MODULUS)
+    value = 0
+    for code in codes[:k]:
+        value = (value * HASH_BASE + code) % HASH_MODULUS
+    hashes = [value]
+    for i in range(k, len(codes)):
+        value = ((value - codes[i - k] * top) * HASH_BASE + codes[i]) % HASH_MODULUS
+        hashes.append(value)
+    return hashes
+
+
+def winnow(hashes: list[int], window: int = WINDOW) -> set[int]:
+    """每个窗口取最小哈希（相同时取最右边的一个），同一位置只记一次"""
+    if len(hashes) <= window:
+        return {min(hashes)} if hashes else set()
+    fingerprints = set()
+    chosen = -1
+    for start in range(len(hashes) - window + 1):
+        if chosen < start:
+            # 上次选中的位置已移出窗口，重新找最小值
+            chosen = start
+            for i in range(start, start + window):
+                if hashes[i] <= hashes[chosen]:
+                    chosen = i
+        elif hashes[start + window - 1] <= hashes[chosen]:
+            chosen = start + window - 1
+        else:
+            continue
+        fingerprints.add(hashes[chosen])
+    return fingerprints
+
+
+def fingerprint(code: str, k: int = K, window: int = WINDOW) -> set[int]:
+    return winnow(kgram_hashes(token_stream(code), k), window)
+
+
+def _enable_line_cache() -> None:
+    """工作进程初始化：同一作业的提交共享大量相同的行，复用这些行的 Token"""
+    Tokenizer.line_cache = LineTokenCache()
+
+
+def _fingerprint_file(path: str) -> tuple[str, Optional[set[int]], Optional[str]]:
+    """多进程建索引的工作函数：(路径, 指纹, 错误信息)"""
+    try:
+        with open(path, "r", encoding="utf8") as fp:
+            return path, fingerprint(fp.read()), None
+    except (OSError, UnicodeDecodeError, SyntaxError) as error:
+        return path, None, str(error)
+
+
+class SimilarityIndex:
+    """SQLite 上的指纹倒排索引"""
+
+    def __init__(self, path: str, max_df: float = DEFAULT_MAX_DF) -> None:
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+        self.max_df = max_df
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> SimilarityIndex:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def add(self, name: str, code: str) -> None:
+        """加入（或替换）一份提交"""
+        with self.connection:
+            self._insert(name, fingerprint(code))
+
+    def add_files(self, paths: Iterable[str], workers: Optional[int] = None) -> list[tuple[str, str]]:
+        """多进程计算指纹，在一个事务中写入；返回无法处理的 (路径, 错误信息)"""
+        paths = list(paths)
+        failed = []
+        with Pool(workers or os.cpu_count(), _enable_line_cache) as pool, self.connection:
+            chunksize = max(1, len(paths) // (4 * (workers or os.cpu_count() or 1)))
+            for path, fingerprints, error in pool.imap_unordered(_fingerprint_file, paths, chunksize):
+                if fingerprints is None:
+                    failed.append((path, error))
+                else:
+                    self._insert(path, fingerprints)
+        return failed
+
+    def remove(self, name: str) -> None:
+        with self.connection:
+            self._delete(name)
+
+    def _delete(self, name: str) -> None:
+        row = self.connection.execute("SELECT id FROM documents WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return
+        self.connection.execute(
+            "UPDATE frequencies SET count = count - 1 "
+            "WHERE hash IN (SELECT hash FROM postings WHERE document = ?)",
+            row,
+        )
+        self.connection.execute("DELETE FROM postings WHERE document = ?", row)
+        self.connection.execute("DELETE FROM documents WHERE id = ?", row)
+
+    def _insert(self, name: str, fingerprints: set[int]) -> None:
+        self._delete(name)
+        cursor = self.connection.execute(
+            "INSERT INTO documents (name, size) VALUES (?, ?)", (name, len(fingerprints))
+        )
+        document = cursor.lastrowid
+        rows = [(value,) for value in fingerprints]
+        self.connection.executemany(
+            "INSERT INTO postings (hash, document) VALUES (?, ?)",
+            ((value, document) for value in fingerprints),
+        )
+        self.connection.executemany(
+            "INSERT INTO frequencies (hash, count) VALUES (?, 1) "
+            "ON CONFLICT (hash) DO UPDATE SET count = count + 1",
+            rows,
+        )
+
+    def query(self, code: str, top: int = 10, exclude: Optional[str] = None) -> list[tuple[str, float]]:
+        """与 code 最相似的 top 份提交：[(名称, Jaccard 相似度)]，按相似度降序"""
+        return self.query_fingerprints(fingerprint(code), top, exclude)
+
+    def query_fingerprints(
+        self, fingerprints: set[int], top: int = 10, exclude: Optional[str] = None
+    ) -> list[tuple[str, float]]:
+        if not fingerprints:
+            return []
+        connection = self.connection
+        row = connection.execute("SELECT id FROM documents WHERE name = ?", (exclude,)).fetchone()
+        excluded = row[0] if row else None
+        documents = len(self) - (excluded is not None)
+        limit = documents if documents < MAX_DF_MIN_DOCUMENTS else max(1, int(self.max_df * documents))
+        connection.execute("CREATE TEMP TABLE IF NOT EXISTS query (hash INTEGER PRIMARY KEY)")
+        connection.execute("DELETE FROM temp.query")
+        connection.executemany("INSERT INTO temp.query VALUES (?)", ((value,) for value in fingerprints))
+        # 样板指纹不参与计算：查询程序余下的指纹数
+        common = connection.execute(
+            f"SELECT COUNT(*) FROM temp.query AS q JOIN frequencies AS f "
+            f"ON f.hash = q.hash AND {FREQUENCY} > ?",
+            (excluded, limit),
+        ).fetchone()[0]
+        size = len(fingerprints) - common
+        # 只读取查询指纹的倒排表，按共享指纹数取候选
+        candidates = connection.execute(
+            f"""
+            SELECT p.document, d.name, COUNT(*) AS shared
+            FROM temp.query AS q
+            JOIN frequencies AS f ON f.hash = q.hash AND {FREQUENCY} <= ?
+            JOIN postings AS p ON p.hash = q.hash AND p.document IS NOT ?
+            JOIN documents AS d ON d.id = p.document
+            GROUP BY p.document
+            ORDER BY shared DESC
+            LIMIT ?
+            """,
+            (excluded, limit, excluded, 4 * top),
+        ).fetchall()
+        results = []
+        for document, name, shared in candidates:
+            # 候选提交去掉样板指纹后的指纹数
+            other = connection.execute(
+                f"SELECT COUNT(*) FROM postings AS p JOIN frequencies AS f "
+                f"ON f.hash = p.hash AND {FREQUENCY} <= ? WHERE p.document = ?",
+                (excluded, limit, document),
+            ).fetchone()[0]
+            results.append((name, shared / (size + other - shared)))
+        results.sort(key=lambda item: (-item[1], item[0]))
+        return results[:top]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description="提交之间的相似度索引")
+    arg_parser.add_argument("db", help="SQLite 索引文件")
+    arg_parser.add_argument("--add", nargs="+", metavar="FILE", help="把文件加入索引（多进程）")
+    arg_parser.add_argument("--workers", type=int, help="建索引的进程数（默认 CPU 核数）")
+    arg_parser.add_argument("--query", metavar="FILE", help="列出与 FILE 最相似的提交")
+    arg_parser.add_argument("--top", type=int, default=10)
+    arg_parser.add_argument("--max-df", type=float, default=DEFAULT_MAX_DF)
+    args = arg_parser.parse_args()
+
+    with SimilarityIndex(args.db, max_df=args.max_df) as index:
+        if args.add:
+            for path, error in index.add_files(args.add, args.workers):
+                print(f"skipped {path}: {error}", file=sys.stderr)
+            print(f"{len(index)} documents indexed", file=sys.stderr)
+        if args.query:
+            with open(args.query, "r", encoding="utf8") as fp:
+                code = fp.read()
+            for name, score in index.query(code, args.top, exclude=args.query):
+                print(f"{score:.3f}  {name}")
@@ -0,0 +1,47 @@
+Data: list = [int()] * 10
+Total: int = int()
+Largest: int = int()
+Smallest: int = int()
+Count: int = int()
+N: int = int()
+Other: list = [int()] * 3
+Tenths: list = [float()] * 10
+Sum: float = float()
+for K in range(0, 10):
+    Data[K] = 3
+N = -(1)
+for K in range(0, N):
+    Data[K] = 7
+Total = 0
+for K in range(0, N):
+    Total = Total + Data[K]
+Largest = 0
+for K in range(0, N):
+    if Data[K] > Largest:
+        Largest = Data[K]
+        
+Smallest = 100
+for K in range(0, N):
+    if Data[K] < Smallest:
+        Smallest = Data[K]
+        
+Count = 0
+for K in range(0, N):
+    if Data[K] == 3:
+        Count = Count + 1
+        
+for K in range(5, 2):
+    Total = Total + Data[K]
+for K in range(5, 2):
+    Data[K] = Other[99]
+for K in range(5, 2):
+    if Data[K] == Other[99]:
+        Count = Count + 1
+        
+for K in range(0, 10):
+    Tenths[K] = 0.1
+Sum = 0.0
+for K in range(0, 10):
+    Sum = Sum + Tenths[K]
+print(Total, Largest, Smallest, Count, Data[0])
+print(Sum)
\ No newline at end of file
@@ -0,0 +1,54 @@
+def __array_fill(a: list, lo: int, hi: int, value) -> None:
+    if lo >= hi:
+        return
+    value = value()
+    if 0 <= lo <= hi <= len(a):
+        a[lo:hi] = [value] * (hi - lo)
+    else:
+        for i in range(lo, hi):
+            a[i] = value
+
+
+def __array_slice(a: list, lo: int, hi: int) -> list:
+    if 0 <= lo <= hi <= len(a):
+        return a[lo:hi]
+    return [a[i] for i in range(lo, hi)]
+
+
+def __array_count(a: list, lo: int, hi: int, value) -> int:
+    elements = __array_slice(a, lo, hi)
+    return elements.count(value()) if elements else 0
+
+
+import functools
+import operator
+
+
+Data: list = [int()] * 10
+Total: int = int()
+Largest: int = int()
+Smallest: int = int()
+Count: int = int()
+N: int = int()
+Other: list = [int()] * 3
+Tenths: list = [float()] * 10
+Sum: float = float()
+__array_fill(Data, 0, 10, lambda: 3)
+N = -(1)
+__array_fill(Data, 0, N, lambda: 7)
+Total = 0
+Total = sum(__array_slice(Data, 0, N), Total)
+Largest = 0
+Largest = max(Largest, max(__array_slice(Data, 0, N), default=Largest))
+Smallest = 100
+Smallest = min(Smallest, min(__array_slice(Data, 0, N), default=Smallest))
+Count = 0
+Count = Count + __array_count(Data, 0, N, lambda: 3)
+Total = sum(__array_slice(Data, 5, 2), Total)
+__array_fill(Data, 5, 2, lambda: Other[99])
+Count = Count + __array_count(Data, 5, 2, lambda: Other[99])
+__array_fill(Tenths, 0, 10, lambda: 0.1)
+Sum = 0.0
+Sum = functools.reduce(operator.add, __array_slice(Tenths, 0, 10), Sum)
+print(Total, Largest, Smallest, Count, Data[0])
+print(Sum)
\ No newline at end of file
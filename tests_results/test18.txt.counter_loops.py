@@ -0,0 +1,50 @@
+from typing import Sequence
+def LENGTH(s: Sequence) -> int:
+    return len(s)
+
+
+I: int = int()
+J: int = int()
+N: int = int()
+Total: int = int()
+Word: str = str()
+H: int = int()
+Names: list = [str()] * 3
+def Nxt() -> str:
+    print('call')
+    return 'abc'
+N = 10
+Total = 0
+I = 1
+__counter1 = range(I, N + 1)
+for I in __counter1:
+    Total = Total + I
+I = __counter1.start + len(__counter1) * __counter1.step
+print(I, Total)
+Word = 'pseudo'
+J = 0
+__counter2 = range(J, max(LENGTH(Word), J + 1), 2)
+for J in __counter2:
+    pass
+J = __counter2.start + len(__counter2) * __counter2.step
+print(J)
+I = 0
+while I < LENGTH(Nxt()):
+    I = I + 1
+print(I)
+J = 0
+while True:
+    print('body ', J)
+    J = J + 1
+    if J >= LENGTH(Names[0]) + 1:
+        break
+H = N / 4
+while H < N:
+    H = H + 3
+print(H)
+I = 5
+__counter3 = range(I, 2, -1)
+for I in __counter3:
+    pass
+I = __counter3.start + len(__counter3) * __counter3.step
+print(I)
\ No newline at end of file
@@ -0,0 +1,47 @@
+from typing import Sequence
+def LENGTH(s: Sequence) -> int:
+    return len(s)
+
+
+I: int = int()
+J: int = int()
+N: int = int()
+Total: int = int()
+Word: str = str()
+H: int = int()
+Names: list = [str()] * 3
+def Nxt() -> str:
+    print('call')
+    return 'abc'
+N = 10
+Total = 0
+I = 1
+while I <= N:
+    Total = Total + I
+    I = I + 1
+print(I, Total)
+Word = 'pseudo'
+J = 0
+while True:
+    J = J + 2
+    if J >= LENGTH(Word):
+        break
+print(J)
+I = 0
+while I < LENGTH(Nxt()):
+    I = I + 1
+print(I)
+J = 0
+while True:
+    print('body ', J)
+    J = J + 1
+    if J >= LENGTH(Names[0]) + 1:
+        break
+H = N / 4
+while H < N:
+    H = H + 3
+print(H)
+I = 5
+while 2 < I:
+    I = I - 1
+print(I)
\ No newline at end of file